@@ -0,0 +1,54 @@
+"""
+Throughput of the asyncio emitters against a local asyncio sink that
+discards what it reads: messages are emitted in bursts of BURST, draining
+after each burst.
+
+Usage: PYTHONPATH=. python bench/bench_aioemitter.py (requires trollius)
+"""
+import socket
+import time
+from datetime import datetime
+
+import trollius as asyncio
+from trollius import From
+
+from loggerglue.aioemitter import AsyncTCPSyslogEmitter, AsyncUDPSyslogEmitter
+from loggerglue.rfc5424 import SyslogEntry
+
+COUNT = 50000
+BURST = 1000
+
+@asyncio.coroutine
+def discard(reader, writer):
+    while True:
+        data = yield From(reader.read(65536))
+        if not data:
+            break
+
+@asyncio.coroutine
+def run(emitter):
+    entry = SyslogEntry(prival=165, timestamp=datetime.utcnow(),
+                        hostname='mymachine.example.com', app_name='evntslog',
+                        procid=42, msgid='ID47', msg='An application event log entry...')
+    for i in xrange(COUNT // BURST):
+        for j in xrange(BURST):
+            emitter.emit(entry)
+        yield From(emitter.drain())
+
+def bench(name, loop, emitter):
+    start = time.time()
+    loop.run_until_complete(run(emitter))
+    elapsed = time.time() - start
+    emitter.close()
+    print '%-30s %10.0f messages/s' % (name, COUNT / elapsed)
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(discard, '127.0.0.1', 0))
+    address = server.sockets[0].getsockname()
+    bench('TCP, octet framing', loop, AsyncTCPSyslogEmitter(address))
+    bench('TCP, LF framing', loop, AsyncTCPSyslogEmitter(address, octet_based_framing=False))
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    bench('UDP', loop, AsyncUDPSyslogEmitter(receiver.getsockname()))
+    server.close()
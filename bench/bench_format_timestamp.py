@@ -0,0 +1,26 @@
+"""
+Micro-benchmark of loggerglue.util.format_timestamp against strftime, for
+each kind of timestamp it accepts.
+
+Usage: PYTHONPATH=. python bench/bench_format_timestamp.py
+"""
+from timeit import Timer
+
+setup = '''
+from datetime import datetime, timedelta
+from loggerglue.util.format_timestamp import format_timestamp
+start = datetime(2003, 10, 11, 22, 14, 15)
+datetimes = [start + timedelta(microseconds=i * 1000) for i in range(1000)]
+floats = [1065910455 + i / 1000.0 for i in range(1000)]
+nanoseconds = [1065910455000000000 + i * 1000000 for i in range(1000)]
+'''
+
+def bench(name, stmt, number=20):
+    best = min(Timer(stmt, setup).repeat(3, number))
+    # each statement formats 1000 timestamps
+    print '%-40s %8.2f usec/timestamp' % (name, best / number / 1000 * 1e6)
+
+if __name__ == '__main__':
+    bench('strftime, datetimes', 'for ts in datetimes: ts.strftime("%Y-%m-%dT%H:%M:%S.%fZ")')
+    for data in ('datetimes', 'floats', 'nanoseconds'):
+        bench('format_timestamp, %s' % data, 'for ts in %s: format_timestamp(ts)' % data)
@@ -0,0 +1,94 @@
+"""
+Memory held by parsed entries, in bytes per entry. Each case runs in a
+fresh interpreter, as freed memory is not given back to the system.
+
+The 'baseline' case builds entries as loggerglue did before SyslogEntry
+and its structured data had __slots__: instance dicts, an OrderedMultiDict
+per SD-ELEMENT plus a Params object copying it, and no interning.
+
+Usage: PYTHONPATH=. python bench/bench_memory.py [count]
+"""
+import gc
+import resource
+import subprocess
+import sys
+
+line = '<165>1 2003-10-11T22:14:15.003Z mymachine.example.com evntslog - ID47 ' \
+       '[exampleSDID@32473 iut="3" eventSource="Application" eventID="1011"]' \
+       '[origin ip="192.0.2.1"] An application event log entry...'
+
+cases = ('baseline', 'from_line', 'from_line, interned')
+
+class Params(object):
+    def __init__(self, d):
+        for k, v in d.items():
+            setattr(self, k, v)
+
+class BaselineSDElement(object):
+    def __init__(self, sd_id, sd_params):
+        from loggerglue.util.MultiDict import OrderedMultiDict
+        self.id = sd_id
+        self.sd_params = OrderedMultiDict(sd_params)
+        self.params = Params(self.sd_params)
+
+class BaselineStructuredData(object):
+    def __init__(self, elements):
+        self.elements = elements
+
+class BaselineSyslogEntry(object):
+    def __init__(self, prival, version, timestamp, hostname, app_name,
+                 procid, msgid, structured_data, msg):
+        self.prival = prival
+        self.version = version
+        self.timestamp = timestamp
+        self.hostname = hostname
+        self.app_name = app_name
+        self.procid = procid
+        self.msgid = msgid
+        self.structured_data = structured_data
+        self.msg = msg
+
+    @classmethod
+    def from_line(cls, line):
+        from loggerglue.rfc5424 import decode_field, decode_msg
+        from loggerglue.scanner import scan
+        from loggerglue.util.parse_timestamp import parse_timestamp
+        (prival, version, ts, hostname, app_name, procid, msgid,
+         sd, msg) = scan(line)
+        if sd is not None:
+            sd = BaselineStructuredData(
+                [BaselineSDElement(sd_id, [(name, value.decode('utf-8'))
+                                           for (name, value) in params])
+                 for (sd_id, params) in sd])
+        return cls(int(prival), int(version), parse_timestamp(ts),
+                   decode_field(hostname), decode_field(app_name),
+                   decode_field(procid), decode_field(msgid), sd,
+                   decode_msg(msg))
+
+def maxrss():
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def measure(case, count):
+    import loggerglue.rfc5424
+    from loggerglue.rfc5424 import SyslogEntry
+    from loggerglue.util.intern_table import InternTable
+    if case == 'baseline':
+        SyslogEntry = BaselineSyslogEntry
+    elif case == 'from_line, interned':
+        loggerglue.rfc5424.INTERN_TABLE = InternTable()
+    SyslogEntry.from_line(line)
+    gc.collect()
+    before = maxrss()
+    entries = [SyslogEntry.from_line(line) for i in xrange(count)]
+    after = maxrss()
+    return (after - before) / float(len(entries))
+
+if __name__ == '__main__':
+    count = len(sys.argv) > 1 and sys.argv[1] or '200000'
+    if len(sys.argv) > 2:
+        print measure(sys.argv[2], int(count))
+    else:
+        for case in cases:
+            out = subprocess.check_output([sys.executable, __file__, count, case])
+            print '%-40s %8.0f bytes/entry' % (case, float(out))
@@ -0,0 +1,25 @@
+"""
+Micro-benchmark of loggerglue.util.parse_timestamp against the strptime
+based implementation.
+
+Usage: PYTHONPATH=. python bench/bench_parse_timestamp.py
+"""
+from timeit import Timer
+
+setup = '''
+from loggerglue.util.parse_timestamp import parse_timestamp, parse_timestamp_strptime
+same_second = ['2003-10-11T22:14:15.%06iZ' % i for i in range(0, 1000000, 1000)]
+offsets = ['2003-10-11T22:14:15.%03i-07:00' % i for i in range(1000)]
+new_seconds = ['2003-10-11T%02i:%02i:%02i.003Z' % (i // 3600, i // 60 % 60, i % 60)
+               for i in range(1000)]
+'''
+
+def bench(name, stmt, number=20):
+    best = min(Timer(stmt, setup).repeat(3, number))
+    # each statement parses 1000 timestamps
+    print '%-40s %8.2f usec/timestamp' % (name, best / number / 1000 * 1e6)
+
+if __name__ == '__main__':
+    for data in ('same_second', 'offsets', 'new_seconds'):
+        bench('strptime, %s' % data, 'for ts in %s: parse_timestamp_strptime(ts)' % data)
+        bench('parse_timestamp, %s' % data, 'for ts in %s: parse_timestamp(ts)' % data)
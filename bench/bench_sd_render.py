@@ -0,0 +1,37 @@
+"""
+Benchmark of STRUCTURED-DATA rendering with realistic payloads: SD-ELEMENTs
+describing the service, identical on every message, and per-message ones
+with values that rarely need escaping.
+
+Usage: PYTHONPATH=. python bench/bench_sd_render.py
+"""
+from timeit import Timer
+
+setup = '''
+import re
+from loggerglue.rfc5424 import SDElement, StructuredData
+from loggerglue.util.escape_value import escape_param_value, escape_re
+service = [('service', 'billing-api'), ('region', 'eu-west-1'),
+           ('build', '2011.03.20-r4511'), ('host', 'app-07.example.com')]
+request = [('method', 'GET'), ('path', '/v1/invoices/18812'), ('status', '200'),
+           ('agent', 'Mozilla/5.0 (X11; Linux x86_64) "quoted" [beta]')]
+element = SDElement('origin@32473', service)
+frozen = element.freeze()
+values = [v for (k, v) in service + request]
+def escape_always(s):
+    return escape_re.sub(r'\\\\\\1', s)
+'''
+
+def bench(name, stmt, number=100000):
+    best = min(Timer(stmt, setup).repeat(3, number))
+    print '%-45s %8.2f usec' % (name, best / number * 1e6)
+
+if __name__ == '__main__':
+    bench('escape 8 values, always substituting', 'for v in values: escape_always(v)')
+    bench('escape 8 values, check first', 'for v in values: escape_param_value(v)')
+    bench('service element', 'str(element)')
+    bench('frozen service element', 'str(frozen)')
+    bench('service + request, new elements',
+          "str(StructuredData([SDElement('origin@32473', service), SDElement('req@32473', request)]))")
+    bench('frozen service + request, new element',
+          "str(StructuredData([frozen, SDElement('req@32473', request)]))")
@@ -0,0 +1,45 @@
+"""
+Cost of SpoolSyslogEmitter.emit for the producer, compared with
+QueueSyslogEmitter, while the downstream emitter is unreachable so that
+nothing is sent.
+
+Usage: PYTHONPATH=. python bench/bench_spool.py
+"""
+import shutil
+import socket
+import tempfile
+import time
+from datetime import datetime
+
+from loggerglue.emitter import SyslogEmitter, QueueSyslogEmitter
+from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.spool import SpoolSyslogEmitter
+
+COUNT = 100000
+
+class DownEmitter(SyslogEmitter):
+    def emit(self, msg):
+        raise socket.error('unreachable')
+
+def bench(name, emitter, msg):
+    start = time.time()
+    for i in xrange(COUNT):
+        emitter.emit(msg)
+    elapsed = time.time() - start
+    print '%-30s %8.2f us/message' % (name, elapsed * 1e6 / COUNT)
+
+if __name__ == '__main__':
+    entry = SyslogEntry(prival=165, timestamp=datetime.utcnow(),
+                        hostname='mymachine.example.com', app_name='evntslog',
+                        procid=42, msgid='ID47', msg='An application event log entry...')
+    q = QueueSyslogEmitter(DownEmitter(), maxsize=COUNT)
+    bench('QueueSyslogEmitter', q, entry)
+    q.close(0)
+    path = tempfile.mkdtemp()
+    try:
+        spool = SpoolSyslogEmitter(path, DownEmitter(), retry_interval=60)
+        bench('SpoolSyslogEmitter', spool, entry)
+        bench('SpoolSyslogEmitter (str)', spool, str(entry))
+        spool.close(0)
+    finally:
+        shutil.rmtree(path)
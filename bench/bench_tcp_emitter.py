@@ -0,0 +1,45 @@
+"""
+Throughput of TCPSyslogEmitter over loopback, writing every message as it
+is emitted and with batching. The receiver discards what it reads.
+
+Usage: PYTHONPATH=. python bench/bench_tcp_emitter.py
+"""
+import socket
+import threading
+import time
+from datetime import datetime
+
+from loggerglue.emitter import TCPSyslogEmitter
+from loggerglue.rfc5424 import SyslogEntry
+
+COUNT = 50000
+
+def sink(listener):
+    conn, addr = listener.accept()
+    while conn.recv(65536):
+        pass
+    conn.close()
+
+def bench(name, **kwargs):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    thread = threading.Thread(target=sink, args=(listener,))
+    thread.start()
+    emitter = TCPSyslogEmitter(listener.getsockname(), **kwargs)
+    entry = SyslogEntry(prival=165, timestamp=datetime.utcnow(),
+                        hostname='mymachine.example.com', app_name='evntslog',
+                        procid=42, msgid='ID47', msg='An application event log entry...')
+    start = time.time()
+    for i in xrange(COUNT):
+        emitter.emit(entry)
+    emitter.close()
+    elapsed = time.time() - start
+    thread.join()
+    listener.close()
+    print '%-30s %10.0f messages/s' % (name, COUNT / elapsed)
+
+if __name__ == '__main__':
+    bench('unbatched')
+    bench('batch_size=64k', batch_size=65536)
+    bench('batch_size=64k, 10ms latency', batch_size=65536, batch_latency=0.01)
@@ -0,0 +1,97 @@
+"""
+TLS connections accepted per second by SyslogServer, with many clients
+connecting at once: each one completes the handshake, sends a message and
+disconnects. It is measured with the handshake in the handling thread,
+with idle clients that never start their handshake also connected, and
+with the former handshake on the accepting thread. A throwaway
+certificate is generated with the openssl command.
+
+Usage: PYTHONPATH=. python bench/bench_tls_accept.py
+"""
+import os
+import shutil
+import socket
+import SocketServer
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.server import SyslogServer, SyslogHandler, CONCURRENCY_THREAD
+
+CLIENTS = 50
+CONNECTIONS = 10
+MESSAGE = '%i %s' % (len(str(SyslogEntry(msg='bench'))), SyslogEntry(msg='bench'))
+
+class CountHandler(SyslogHandler):
+    def handle_entry(self, syslog_entry):
+        self.server.count += 1
+
+class QuietServer(SyslogServer):
+    # let the handling threads finish before exiting
+    daemon_threads = False
+
+    def handle_error(self, request, client_address):
+        pass
+
+class AcceptThreadServer(QuietServer):
+    """The former get_request, handshaking before the next accept"""
+    def get_request(self):
+        conn, addr = self.socket.accept()
+        conn = ssl.wrap_socket(conn, server_side=True, **self.ssl_args)
+        return conn, addr
+
+    def finish_request(self, request, client_address):
+        SocketServer.TCPServer.finish_request(self, request, client_address)
+
+def make_cert(path):
+    keyfile = os.path.join(path, 'key.pem')
+    certfile = os.path.join(path, 'cert.pem')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                           '-nodes', '-subj', '/CN=localhost', '-days', '1',
+                           '-keyout', keyfile, '-out', certfile],
+                          stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    return keyfile, certfile
+
+def client(address):
+    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+    for i in xrange(CONNECTIONS):
+        conn = context.wrap_socket(socket.create_connection(address))
+        conn.sendall(MESSAGE)
+        conn.close()
+
+def bench(name, server_class, keyfile, certfile, idle=0):
+    serv = server_class(('127.0.0.1', 0), CountHandler, concurrency=CONCURRENCY_THREAD,
+                        keyfile=keyfile, certfile=certfile,
+                        ssl_version=ssl.PROTOCOL_TLSv1_2, handshake_timeout=60)
+    serv.count = 0
+    thread = threading.Thread(target=serv.serve_forever, args=(0.01,))
+    thread.start()
+    address = serv.server_address
+    stalled = [socket.create_connection(address) for i in xrange(idle)]
+    clients = [threading.Thread(target=client, args=(address,))
+               for i in xrange(CLIENTS)]
+    start = time.time()
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    elapsed = time.time() - start
+    for s in stalled:
+        s.close()
+    serv.shutdown()
+    serv.server_close()
+    thread.join()
+    print '%-30s %10.0f connections/s' % (name, CLIENTS * CONNECTIONS / elapsed)
+
+if __name__ == '__main__':
+    path = tempfile.mkdtemp()
+    try:
+        keyfile, certfile = make_cert(path)
+        bench('handshake in handler', QuietServer, keyfile, certfile)
+        bench('... with 20 idle clients', QuietServer, keyfile, certfile, idle=20)
+        bench('handshake in accept loop', AcceptThreadServer, keyfile, certfile)
+    finally:
+        shutil.rmtree(path)
@@ -0,0 +1,89 @@
+"""
+Frames per second received by SyslogServer over loopback TLS, with the
+buffered frame decoder and with the former byte-by-byte reads. A throwaway
+certificate is generated with the openssl command.
+
+Usage: PYTHONPATH=. python bench/bench_tls_server.py
+"""
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from loggerglue.emitter import TCPSyslogEmitter
+from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.server import SyslogServer, SyslogHandler
+
+COUNT = 20000
+
+class CountHandler(SyslogHandler):
+    def handle_entry(self, syslog_entry):
+        self.server.count += 1
+
+class ByteHandler(CountHandler):
+    """The former handle_tls, reading one byte per recv"""
+    def handle_tls(self):
+        buf = ''
+        while True:
+            r = self.request.recv(1)
+            if not r:
+                break
+            if r != ' ':
+                buf += r
+            else:
+                msg_len = int(buf)
+                buf = ''
+                for i in xrange(msg_len):
+                    buf += self.request.recv(1)
+                self.handle_entry(SyslogEntry.from_line(buf))
+                buf = ''
+
+class QuietServer(SyslogServer):
+    def handle_error(self, request, client_address):
+        # OpenSSL 3 reports the emitter closing without close_notify
+        pass
+
+def make_cert(path):
+    keyfile = os.path.join(path, 'key.pem')
+    certfile = os.path.join(path, 'cert.pem')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                           '-nodes', '-subj', '/CN=localhost', '-days', '1',
+                           '-keyout', keyfile, '-out', certfile],
+                          stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    return keyfile, certfile
+
+def bench(name, handler, keyfile, certfile, count=COUNT):
+    # TLS 1.2: the emitter never reads the session tickets a TLS 1.3
+    # server sends, and the unread data would reset the connection on close
+    serv = QuietServer(('127.0.0.1', 0), handler, keyfile=keyfile,
+                       certfile=certfile, ssl_version=ssl.PROTOCOL_TLSv1_2)
+    serv.count = 0
+    thread = threading.Thread(target=serv.handle_request)
+    thread.start()
+    emitter = TCPSyslogEmitter(serv.socket.getsockname(), keyfile=None,
+                               batch_size=65536)
+    entry = SyslogEntry(prival=165, timestamp=datetime.utcnow(),
+                        hostname='mymachine.example.com', app_name='evntslog',
+                        procid=42, msgid='ID47', msg='An application event log entry...')
+    start = time.time()
+    for i in xrange(count):
+        emitter.emit(entry)
+    emitter.close()
+    thread.join()
+    elapsed = time.time() - start
+    serv.socket.close()
+    assert serv.count == count
+    print '%-30s %10.0f frames/s' % (name, count / elapsed)
+
+if __name__ == '__main__':
+    path = tempfile.mkdtemp()
+    try:
+        keyfile, certfile = make_cert(path)
+        bench('buffered decoder', CountHandler, keyfile, certfile)
+        bench('recv(1)', ByteHandler, keyfile, certfile, COUNT // 10)
+    finally:
+        shutil.rmtree(path)
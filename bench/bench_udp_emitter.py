@@ -0,0 +1,41 @@
+"""
+Throughput of UDPSyslogEmitter over loopback: unconnected with one sendto
+per message, connected with one send per message, and connected batches
+(sendmmsg where available). Nobody reads from the receiving socket, so
+the kernel drops what does not fit in its buffer.
+
+Usage: PYTHONPATH=. python bench/bench_udp_emitter.py
+"""
+import socket
+import time
+from datetime import datetime
+
+from loggerglue.emitter import UDPSyslogEmitter
+from loggerglue.rfc5424 import SyslogEntry
+
+COUNT = 50000
+BATCH = 64
+
+def bench(name, batch=False, **kwargs):
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    emitter = UDPSyslogEmitter(('localhost', receiver.getsockname()[1]), **kwargs)
+    entry = SyslogEntry(prival=165, timestamp=datetime.utcnow(),
+                        hostname='mymachine.example.com', app_name='evntslog',
+                        procid=42, msgid='ID47', msg='An application event log entry...')
+    entries = [entry] * BATCH
+    start = time.time()
+    if batch:
+        for i in xrange(COUNT // BATCH):
+            emitter.emit_batch(entries)
+    else:
+        for i in xrange(COUNT):
+            emitter.emit(entry)
+    elapsed = time.time() - start
+    receiver.close()
+    print '%-30s %10.0f messages/s' % (name, COUNT / elapsed)
+
+if __name__ == '__main__':
+    bench('unconnected')
+    bench('connected', connected=True)
+    bench('connected, batches of %i' % BATCH, batch=True, connected=True)
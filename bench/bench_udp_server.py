@@ -0,0 +1,54 @@
+"""
+Datagrams per second read by UDPSyslogServer, with recvmmsg and with the
+recv_into loop. The datagrams are queued in the socket before the server
+drains them, and the handler discards them unparsed.
+
+Usage: PYTHONPATH=. python bench/bench_udp_server.py
+"""
+import socket
+import time
+from datetime import datetime
+
+from loggerglue import server
+from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.server import UDPSyslogServer, SyslogHandler
+
+COUNT = 20000
+
+class NullHandler(SyslogHandler):
+    def handle_datagrams(self):
+        pass
+
+def bench(name, recvmmsg):
+    have_recvmmsg = server.HAVE_RECVMMSG
+    server.HAVE_RECVMMSG = recvmmsg
+    try:
+        serv = UDPSyslogServer(('127.0.0.1', 0), NullHandler, rcvbuf=64 << 20)
+    finally:
+        server.HAVE_RECVMMSG = have_recvmmsg
+    entry = str(SyslogEntry(prival=165, timestamp=datetime.utcnow(),
+                            hostname='mymachine.example.com', app_name='evntslog',
+                            procid=42, msgid='ID47', msg='An application event log entry...'))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect(serv.server_address)
+    for i in xrange(COUNT):
+        sock.send(entry)
+    # the receive buffer may be capped (net.core.rmem_max): count what
+    # was queued, draining until the socket is empty
+    serv.timeout = 0
+    start = time.time()
+    while True:
+        received = serv.received
+        serv.handle_request()
+        if serv.received == received:
+            break
+    elapsed = time.time() - start
+    sock.close()
+    serv.server_close()
+    print '%-30s %10.0f datagrams/s (%i queued)' % (name, serv.received / elapsed,
+                                                    serv.received)
+
+if __name__ == '__main__':
+    if server.HAVE_RECVMMSG:
+        bench('recvmmsg', True)
+    bench('recv_into', False)
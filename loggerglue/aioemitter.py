@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Syslog emitters for asyncio event loops.
+
+These emitters mirror those of :mod:`loggerglue.emitter`, but never block
+the event loop: :meth:`~AsyncSyslogEmitter.emit` only queues the message,
+and a task of the loop writes the queue out, (re)connecting with an
+exponential backoff when needed. Wait for queued messages to be written
+with the :meth:`~AsyncSyslogEmitter.drain` coroutine.
+
+This module requires Trollius, the asyncio port for Python 2:
+
+    >>> emitter = AsyncTCPSyslogEmitter(('logs.example.com', 514))
+    >>> emitter.emit(entry)
+    >>> yield From(emitter.drain())
+
+Copyright © 2011 Evax Software <contact@evax.fr>
+"""
+import errno
+import socket
+from collections import deque
+
+from loggerglue.emitter import SyslogEmitter, SYSLOG_DEFAULT_PORT
+from loggerglue.rfc5424 import serialize_batch, FRAMING_NONE, FRAMING_OCTET, \
+    FRAMING_LF, FRAMING_NUL
+from loggerglue.util.ssl_context import make_ssl_context
+
+try:
+    import trollius as asyncio
+    from trollius import From
+
+    class AsyncSyslogEmitter(SyslogEmitter):
+        """
+        Base class for asyncio syslog emitters.
+
+        Subclasses implement the :meth:`_connect` coroutine, which either opens
+        a stream (setting `_writer` to an :class:`asyncio.StreamWriter`) or
+        connects a non-blocking datagram socket (setting `_socket`).
+
+        **attributes**
+            *sent*
+                Number of messages written.
+
+            *dropped*
+                Number of messages dropped because `max_pending` messages were
+                already waiting, or because the emitter was closed.
+
+            *failures*
+                Number of failed attempts to connect or write, each followed
+                by a backoff delay.
+        """
+        framing = FRAMING_NONE
+
+        def __init__(self, loop=None, max_pending=10000, batch_size=256,
+                     min_backoff=0.1, max_backoff=30.0):
+            """
+            **arguments**
+                *loop*
+                    Event loop to run on, defaults to the current one.
+
+                *max_pending*
+                    Maximum number of messages waiting to be written; more are
+                    dropped, as :meth:`emit` cannot wait for room.
+
+                *batch_size*
+                    Maximum number of messages written at once.
+
+                *min_backoff*, *max_backoff*
+                    Delays in seconds before trying again when connecting or
+                    writing fails: `min_backoff` after the first failure, then
+                    doubled after each one up to `max_backoff`.
+            """
+            if loop is None:
+                loop = asyncio.get_event_loop()
+            self.loop = loop
+            self.max_pending = max_pending
+            self.batch_size = batch_size
+            self.min_backoff = min_backoff
+            self.max_backoff = max_backoff
+            self.sent = 0
+            self.dropped = 0
+            self.failures = 0
+            self._pending = deque()
+            self._idle = asyncio.Event(loop=loop)
+            self._idle.set()
+            self._task = None
+            self._writer = None
+            self._socket = None
+            self._closed = False
+
+        def emit(self, msg):
+            """
+            Queue a record, to be written by a task of the event loop. This
+            never blocks.
+            """
+            if self._closed or len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(msg)
+            if self._task is None:
+                self._idle.clear()
+                self._task = self.loop.create_task(self._run())
+
+        def emit_batch(self, msgs):
+            """
+            Queue several records.
+            """
+            for msg in msgs:
+                self.emit(msg)
+
+        @asyncio.coroutine
+        def drain(self):
+            """
+            Coroutine that waits until all queued messages have been written.
+            """
+            yield From(self._idle.wait())
+
+        @asyncio.coroutine
+        def _connect(self):
+            raise NotImplementedError('Subclasses must implement this method')
+
+        def _disconnect(self):
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+        @asyncio.coroutine
+        def _send(self, batch):
+            """
+            Write the list `batch`. Datagrams that were sent are removed
+            from it, so that only the others are written again on failure.
+            """
+            if self._writer is not None:
+                self._writer.write(serialize_batch(batch, self.framing))
+                yield From(self._writer.drain())
+                return
+            i = 0
+            try:
+                for msg in batch:
+                    data = serialize_batch((msg,), self.framing)
+                    try:
+                        self._socket.send(data)
+                    except socket.error, e:
+                        if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                            raise
+                        yield From(self.loop.sock_sendall(self._socket, data))
+                    i += 1
+            finally:
+                del batch[:i]
+
+        @asyncio.coroutine
+        def _run(self):
+            """Task writing the queue, reconnecting when needed"""
+            pending = self._pending
+            delay = self.min_backoff
+            try:
+                while pending:
+                    try:
+                        if self._writer is None and self._socket is None:
+                            yield From(self._connect())
+                        batch = [pending.popleft()
+                                 for i in xrange(min(len(pending), self.batch_size))]
+                        count = len(batch)
+                        try:
+                            yield From(self._send(batch))
+                        except EnvironmentError:
+                            # write what is left of the batch again on a new
+                            # connection
+                            self.sent += count - len(batch)
+                            pending.extendleft(reversed(batch))
+                            raise
+                    except EnvironmentError:
+                        self._disconnect()
+                        self.failures += 1
+                        yield From(asyncio.sleep(delay, loop=self.loop))
+                        delay = min(delay * 2, self.max_backoff)
+                    else:
+                        self.sent += count
+                        delay = self.min_backoff
+            finally:
+                self._task = None
+                self._idle.set()
+
+        def close(self):
+            """
+            Closes the connection. Messages still queued are dropped; use
+            :meth:`drain` first to write them.
+            """
+            self._closed = True
+            if self._task is not None:
+                # a task that has not started yet will not run its cleanup
+                self._task.cancel()
+                self._task = None
+                self._idle.set()
+            self.dropped += len(self._pending)
+            self._pending.clear()
+            self._disconnect()
+
+    class AsyncUDPSyslogEmitter(AsyncSyslogEmitter):
+        """
+        Syslog emitter through UDP for asyncio, see
+        :class:`~loggerglue.emitter.UDPSyslogEmitter`. The address is resolved
+        once and the socket connected to it.
+        """
+        def __init__(self, address=('localhost', SYSLOG_DEFAULT_PORT), **kwargs):
+            """
+            **arguments**
+                *address*
+                    Address to send messages to, as `(host, port)` tuple.
+
+                *loop*, *max_pending*, *batch_size*, *min_backoff*, *max_backoff*
+                    See :class:`AsyncSyslogEmitter`.
+            """
+            AsyncSyslogEmitter.__init__(self, **kwargs)
+            self.address = address
+
+        @asyncio.coroutine
+        def _connect(self):
+            infos = yield From(self.loop.getaddrinfo(
+                self.address[0], self.address[1], type=socket.SOCK_DGRAM))
+            family, socktype, proto, canonname, sockaddr = infos[0]
+            sock = socket.socket(family, socktype, proto)
+            sock.setblocking(False)
+            try:
+                yield From(self.loop.sock_connect(sock, sockaddr))
+            except:
+                sock.close()
+                raise
+            self._socket = sock
+
+    class AsyncTCPSyslogEmitter(AsyncSyslogEmitter):
+        """
+        Syslog emitter through TCP for asyncio, optionally with TLS, see
+        :class:`~loggerglue.emitter.TCPSyslogEmitter`.
+        """
+        def __init__(self, address=('localhost', SYSLOG_DEFAULT_PORT),
+                     octet_based_framing=True, loop=None, max_pending=10000,
+                     batch_size=256, min_backoff=0.1, max_backoff=30.0,
+                     **ssl_args):
+            """
+            **arguments**
+                *address*
+                    Address to send messages to, as `(host, port)` tuple.
+
+                *octet_based_framing*
+                    Use RFC5425 octet-based framing instead of line-based framing.
+
+                *loop*, *max_pending*, *batch_size*, *min_backoff*, *max_backoff*
+                    See :class:`AsyncSyslogEmitter`.
+
+                *keyfile*, *certfile*, *cert_reqs*, *ssl_version*, *ca_certs*, *ciphers*
+                    As for :func:`ssl.wrap_socket`. Providing any of these arguments
+                    enables TLS.
+            """
+            AsyncSyslogEmitter.__init__(self, loop, max_pending, batch_size,
+                                        min_backoff, max_backoff)
+            self.address = address
+            self.octet_based_framing = octet_based_framing
+            if octet_based_framing:
+                self.framing = FRAMING_OCTET
+            else:
+                self.framing = FRAMING_LF
+            if ssl_args:
+                self.ssl_context = make_ssl_context(**ssl_args)
+            else:
+                self.ssl_context = None
+
+        @asyncio.coroutine
+        def _connect(self):
+            reader, self._writer = yield From(asyncio.open_connection(
+                self.address[0], self.address[1], ssl=self.ssl_context,
+                loop=self.loop))
+
+    class AsyncUNIXSyslogEmitter(AsyncSyslogEmitter):
+        """
+        Syslog emitter through a UNIX socket for asyncio, see
+        :class:`~loggerglue.emitter.UNIXSyslogEmitter`: datagrams if the socket
+        accepts them, a stream otherwise.
+        """
+        framing = FRAMING_NUL
+
+        def __init__(self, address='/dev/log', **kwargs):
+            """
+            **arguments**
+                *address*
+                    Address to send messages to, as string. Defaults to '/dev/log'.
+
+                *loop*, *max_pending*, *batch_size*, *min_backoff*, *max_backoff*
+                    See :class:`AsyncSyslogEmitter`.
+            """
+            AsyncSyslogEmitter.__init__(self, **kwargs)
+            self.address = address
+
+        @asyncio.coroutine
+        def _connect(self):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                # connecting to a local path does not block
+                sock.connect(self.address)
+            except socket.error:
+                sock.close()
+                reader, self._writer = yield From(asyncio.open_unix_connection(
+                    self.address, loop=self.loop))
+            else:
+                sock.setblocking(False)
+                self._socket = sock
+
+except ImportError:
+    pass
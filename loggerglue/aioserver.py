@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+A syslog server for asyncio event loops.
+
+:class:`AsyncSyslogServer` listens on any number of TCP (optionally TLS),
+UDP and UNIX datagram sockets from a single event loop, so that thousands
+of mostly idle senders cost a file descriptor and a small protocol object
+each, rather than a thread. Messages are parsed with
+:meth:`SyslogEntry.from_line <loggerglue.rfc5424.SyslogEntry.from_line>`
+and passed to an :class:`AsyncSyslogHandler`, whose `handle_entry` may be
+a plain method or a coroutine.
+
+This module requires Trollius, the asyncio port for Python 2:
+
+    >>> class Handler(AsyncSyslogHandler):
+    ...     @asyncio.coroutine
+    ...     def handle_entry(self, syslog_entry):
+    ...         yield From(store(syslog_entry))
+    >>> server = AsyncSyslogServer(Handler)
+    >>> loop.run_until_complete(server.start_tcp('0.0.0.0', 514))
+    >>> loop.run_until_complete(server.start_udp('0.0.0.0', 514))
+    >>> loop.run_forever()
+
+Copyright © 2011 Evax Software <contact@evax.fr>
+"""
+import errno
+import os
+import socket
+import stat
+from collections import deque
+
+from loggerglue.emitter import SYSLOG_DEFAULT_PORT
+from loggerglue.rfc5424 import SyslogEntry, FRAMING_NONE, FRAMING_OCTET, FRAMING_LF
+from loggerglue.util.frame_decoder import OctetFrameDecoder, LineFrameDecoder, FrameError
+from loggerglue.util.ssl_context import make_ssl_context
+
+try:
+    import trollius as asyncio
+    from trollius import From, Return
+
+    class AsyncSyslogHandler(object):
+        """
+        Handler for the messages of an :class:`AsyncSyslogServer`. An instance
+        is created for each stream connection, and one for each datagram
+        listener.
+
+        Subclasses must implement `handle_entry` and may implement `handle_error`.
+
+        **attributes**
+            *server*
+                The :class:`AsyncSyslogServer`.
+
+            *peer*
+                Address of the sender for a stream connection, None for a
+                datagram listener.
+        """
+        def __init__(self, server, peer):
+            self.server = server
+            self.peer = peer
+
+        def handle_entry(self, syslog_entry):
+            """Handle an incoming syslog entry. Subclasses must implement this.
+
+            It may return a coroutine or a future: the next messages of the
+            same connection are only handled once it is done, and reading
+            from the connection is paused meanwhile.
+            """
+            raise NotImplementedError('Subclasses must implement this method')
+
+        def handle_error(self, data):
+            """Handle a message that could not be parsed, or the data that
+            broke the framing of a connection before it is closed.
+
+            Implementing this method is optional.
+            """
+            pass
+
+    class _StreamProtocol(asyncio.Protocol):
+        """A stream connection"""
+        def __init__(self, server, framing):
+            self.server = server
+            self.framing = framing
+            self.decoder = None
+            self.transport = None
+            self.handler = None
+            self._frames = deque()
+            self._waiting = None
+            self._paused = False
+            self._closed = False
+
+        def connection_made(self, transport):
+            self.transport = transport
+            self.handler = self.server.handler_class(
+                self.server, transport.get_extra_info('peername'))
+            self.server._connections.add(self)
+            if self.framing is not FRAMING_NONE:
+                self._make_decoder(self.framing)
+
+        def _make_decoder(self, framing):
+            if framing == FRAMING_OCTET:
+                self.decoder = OctetFrameDecoder(self.server.max_frame_size)
+            else:
+                self.decoder = LineFrameDecoder(self.server.max_frame_size)
+
+        def data_received(self, data):
+            if self.decoder is None:
+                # RFC6587: octet counting starts with a digit, a message with '<'
+                if data[:1].isdigit():
+                    self._make_decoder(FRAMING_OCTET)
+                else:
+                    self._make_decoder(FRAMING_LF)
+            try:
+                frames = self.decoder.feed(data)
+            except FrameError:
+                self.handler.handle_error(data)
+                self.transport.close()
+                return
+            self._frames.extend(frames)
+            if self._waiting is None:
+                self._process()
+
+        def _process(self):
+            frames = self._frames
+            while frames:
+                waiting = self.server._dispatch(self.handler, frames.popleft())
+                if waiting is not None:
+                    self._waiting = waiting
+                    if not self._paused and not self._closed:
+                        self.transport.pause_reading()
+                        self._paused = True
+                    waiting.add_done_callback(self._resume)
+                    return
+            if self._paused and not self._closed:
+                self.transport.resume_reading()
+                self._paused = False
+
+        def _resume(self, future):
+            self._waiting = None
+            self.server._check_result(future)
+            self._process()
+
+        def connection_lost(self, exc):
+            # frames already received are still handled
+            self._closed = True
+            self.server._connections.discard(self)
+
+    class _DatagramListener(object):
+        """A datagram socket, drained whenever it is readable"""
+        def __init__(self, server, sock, path=None):
+            self.server = server
+            self.socket = sock
+            self.sockets = [sock]
+            self.path = path
+            self.handler = server.handler_class(server, None)
+            sock.setblocking(False)
+            server.loop.add_reader(sock.fileno(), self._read_ready)
+
+        def _read_ready(self):
+            server = self.server
+            recv = self.socket.recv
+            for i in xrange(server.datagram_batch):
+                try:
+                    data = recv(server.max_frame_size)
+                except socket.error, e:
+                    if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                        break
+                    raise
+                # trailing LF or NUL left by some senders
+                data = data.rstrip('\n\000')
+                if not data:
+                    continue
+                waiting = server._dispatch(self.handler, data)
+                if waiting is not None:
+                    # datagrams are unordered anyway: do not wait
+                    waiting.add_done_callback(server._check_result)
+
+        def close(self):
+            if self.socket is None:
+                return
+            self.server.loop.remove_reader(self.socket.fileno())
+            self.socket.close()
+            self.socket = None
+            if self.path is not None:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+
+        @asyncio.coroutine
+        def wait_closed(self):
+            pass
+
+    class AsyncSyslogServer(object):
+        """
+        Syslog server for asyncio. Create it with a handler class, then start
+        listeners with the :meth:`start_tcp`, :meth:`start_udp` and
+        :meth:`start_unix` coroutines.
+
+        **attributes**
+            *entries*
+                Number of messages parsed and passed to `handle_entry`.
+
+            *errors*
+                Number of messages that could not be parsed, and of
+                connections closed because of invalid framing.
+
+            *failures*
+                Number of `handle_entry` calls and coroutines that raised an
+                exception; the exception is passed to the exception handler
+                of the loop, and the next messages are still handled.
+        """
+        def __init__(self, handler_class, loop=None, max_frame_size=65536,
+                     datagram_batch=64, rcvbuf=None):
+            """
+            **arguments**
+                *handler_class*
+                    Subclass of :class:`AsyncSyslogHandler` to instantiate for
+                    each connection and datagram listener.
+
+                *loop*
+                    Event loop to run on, defaults to the current one.
+
+                *max_frame_size*
+                    Largest message accepted; longer ones close stream
+                    connections, and datagrams are truncated to it.
+
+                *datagram_batch*
+                    Maximum number of datagrams read from a socket each time
+                    it is readable, before letting other events run.
+
+                *rcvbuf*
+                    `SO_RCVBUF` of the datagram sockets, in bytes; the system
+                    default if None.
+            """
+            if loop is None:
+                loop = asyncio.get_event_loop()
+            self.handler_class = handler_class
+            self.loop = loop
+            self.max_frame_size = max_frame_size
+            self.datagram_batch = datagram_batch
+            self.rcvbuf = rcvbuf
+            self.entries = 0
+            self.errors = 0
+            self.failures = 0
+            self._servers = []
+            self._connections = set()
+
+        def __len__(self):
+            """Number of open stream connections."""
+            return len(self._connections)
+
+        def _dispatch(self, handler, frame):
+            """
+            Parse and handle a message; returns a future if `handle_entry`
+            returned a coroutine or a future, None otherwise.
+            """
+            try:
+                entry = SyslogEntry.from_line(frame, consume_error=False)
+            except Exception:
+                self.errors += 1
+                handler.handle_error(frame)
+                return None
+            self.entries += 1
+            try:
+                result = handler.handle_entry(entry)
+            except Exception, e:
+                self.failures += 1
+                self.loop.call_exception_handler({
+                    'message': 'handle_entry failed',
+                    'exception': e,
+                })
+                return None
+            if result is None:
+                return None
+            if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                return asyncio.ensure_future(result, loop=self.loop)
+            return None
+
+        def _check_result(self, future):
+            if future.cancelled():
+                return
+            exc = future.exception()
+            if exc is not None:
+                self.failures += 1
+                self.loop.call_exception_handler({
+                    'message': 'handle_entry failed',
+                    'exception': exc,
+                    'future': future,
+                })
+
+        @asyncio.coroutine
+        def start_tcp(self, host=None, port=SYSLOG_DEFAULT_PORT, framing=FRAMING_NONE,
+                      backlog=1024, **ssl_args):
+            """
+            Coroutine listening for stream connections on `host` and `port`
+            (all interfaces if `host` is None). Returns the
+            :class:`asyncio.Server`.
+
+            **arguments**
+                *framing*
+                    `FRAMING_LF`, `FRAMING_OCTET`, or `FRAMING_NONE` to detect
+                    the framing of each connection from its first byte.
+
+                *backlog*
+                    Length of the listen queue.
+
+                *keyfile*, *certfile*, *cert_reqs*, *ssl_version*, *ca_certs*, *ciphers*
+                    As for :func:`ssl.wrap_socket`. Providing any of these arguments
+                    enables TLS.
+            """
+            if framing not in (FRAMING_NONE, FRAMING_LF, FRAMING_OCTET):
+                raise ValueError('unsupported framing: %r' % (framing,))
+            if ssl_args:
+                context = make_ssl_context(server_side=True, **ssl_args)
+            else:
+                context = None
+            server = yield From(self.loop.create_server(
+                lambda: _StreamProtocol(self, framing), host, port,
+                backlog=backlog, ssl=context))
+            self._servers.append(server)
+            raise Return(server)
+
+        def _datagram_socket(self, family, socktype=socket.SOCK_DGRAM, proto=0):
+            sock = socket.socket(family, socktype, proto)
+            if self.rcvbuf is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            return sock
+
+        @asyncio.coroutine
+        def start_udp(self, host=None, port=SYSLOG_DEFAULT_PORT):
+            """
+            Coroutine listening for UDP datagrams on `host` and `port` (all
+            IPv4 interfaces if `host` is None). Returns the listener, whose
+            `socket` attribute is the bound socket.
+            """
+            infos = yield From(self.loop.getaddrinfo(
+                host or '0.0.0.0', port, type=socket.SOCK_DGRAM,
+                flags=socket.AI_PASSIVE))
+            family, socktype, proto, canonname, sockaddr = infos[0]
+            sock = self._datagram_socket(family, socktype, proto)
+            try:
+                sock.bind(sockaddr)
+            except:
+                sock.close()
+                raise
+            listener = _DatagramListener(self, sock)
+            self._servers.append(listener)
+            raise Return(listener)
+
+        @asyncio.coroutine
+        def start_unix(self, path='/dev/log'):
+            """
+            Coroutine listening for datagrams on the UNIX socket `path`, which
+            is replaced if it is a stale socket, and removed when the server
+            is closed. Returns the listener.
+            """
+            try:
+                if stat.S_ISSOCK(os.stat(path).st_mode):
+                    os.unlink(path)
+            except OSError:
+                pass
+            sock = self._datagram_socket(socket.AF_UNIX)
+            try:
+                sock.bind(path)
+            except:
+                sock.close()
+                raise
+            listener = _DatagramListener(self, sock, path)
+            self._servers.append(listener)
+            raise Return(listener)
+
+        def close(self):
+            """
+            Stop listening and close the open connections.
+            """
+            for server in self._servers:
+                server.close()
+            for protocol in list(self._connections):
+                protocol.transport.close()
+
+        @asyncio.coroutine
+        def wait_closed(self):
+            """
+            Coroutine waiting until the listeners are closed.
+            """
+            for server in self._servers:
+                yield From(server.wait_closed())
+            self._servers = []
+
+except ImportError:
+    pass
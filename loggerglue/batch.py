@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar batches of parsed syslog entries, for analytics.
+
+An :class:`EntryBatch` parses many lines straight into columns: numeric
+fields go into NumPy arrays and HEADER strings are dictionary-encoded, so
+that filters and group-by counts are vectorized and never build one Python
+object per row. This module requires NumPy.
+
+Example:
+
+    >>> batch = EntryBatch.from_lines(open('/var/log/archive.log'))
+    >>> errors = batch.select((batch.severity <= LOG_ERR) & (batch.app_name == u'su'))
+    >>> errors.count_by('hostname')
+    {u'mymachine.example.com': 12}
+
+Copyright © 2011 Evax Software <contact@evax.fr>
+"""
+from array import array
+from datetime import datetime, timedelta
+
+from loggerglue.rfc5424 import SyslogEntry, StructuredData, ParseFailure, \
+    decode_field, decode_msg
+from loggerglue.scanner import scan_spans, scan_structured_data, ScanError
+from loggerglue.util.parse_timestamp import parse_timestamp
+
+EPOCH = datetime(1970, 1, 1)
+
+def timestamp_ns(ts):
+    '''
+    Convert a raw TIMESTAMP to nanoseconds since the epoch (UTC). NILVALUE
+    is replaced with the current time, as when parsing entries.
+    '''
+    timestamp = parse_timestamp(ts)
+    if timestamp is None:
+        timestamp = datetime.utcnow()
+    d = timestamp - EPOCH
+    return (d.days * 86400 + d.seconds) * 1000000000 + d.microseconds * 1000
+
+# Dictionary-encoded columns
+STRING_COLUMNS = ('hostname', 'app_name', 'procid', 'msgid')
+
+try:
+    import numpy
+
+    class DictColumn(object):
+        """
+        A dictionary-encoded string column: `values` holds each distinct value
+        once, and `codes` the index into `values` of every row.
+
+        Comparing the column with a value returns a boolean NumPy mask.
+        """
+        def __init__(self, codes, values):
+            self.codes = codes
+            self.values = values
+            self._index = dict([(v, i) for (i, v) in enumerate(values)])
+
+        def __len__(self):
+            return len(self.codes)
+
+        def __getitem__(self, i):
+            return self.values[self.codes[i]]
+
+        def __eq__(self, value):
+            code = self._index.get(value)
+            if code is None:
+                return numpy.zeros(len(self.codes), dtype=bool)
+            return self.codes == code
+
+        def __ne__(self, value):
+            return ~(self == value)
+
+        def isin(self, values):
+            """Mask of the rows whose value is one of `values`."""
+            codes = [self._index[v] for v in values if v in self._index]
+            return numpy.in1d(self.codes, codes)
+
+        def counts(self):
+            """Returns a dict mapping each value to its number of rows."""
+            counts = numpy.bincount(self.codes, minlength=len(self.values))
+            return dict([(v, int(c)) for (v, c) in zip(self.values, counts) if c])
+
+        def take(self, indices):
+            return DictColumn(self.codes[indices], self.values)
+
+    class _Encoder(object):
+        """Dictionary-encodes raw HEADER strings while parsing"""
+        def __init__(self):
+            self.codes = array('i')
+            self.values = []
+            self.raw = {}
+            self.decoded = {}
+
+        def add(self, raw):
+            code = self.raw.get(raw)
+            if code is None:
+                value = decode_field(raw)
+                code = self.decoded.get(value)
+                if code is None:
+                    code = self.decoded[value] = len(self.values)
+                    self.values.append(value)
+                self.raw[raw] = code
+            self.codes.append(code)
+
+        def column(self):
+            return DictColumn(numpy.frombuffer(self.codes, dtype=numpy.int32),
+                              self.values)
+
+    class EntryBatch(object):
+        """
+        A batch of syslog entries stored by column.
+
+        **attributes**
+            *prival*, *version*
+                NumPy integer arrays.
+
+            *timestamp*
+                NumPy int64 array of nanoseconds since the epoch (UTC).
+
+            *hostname*, *app_name*, *procid*, *msgid*
+                :class:`DictColumn` objects.
+
+            *structured_data*, *msg*
+                Lists of the raw STRUCTURED-DATA and MSG of each row (None
+                for NILVALUE or a missing MSG), only decoded for row access,
+                like the fields of a :class:`~loggerglue.rfc5424.LazySyslogEntry`.
+
+            *failures*
+                :data:`~loggerglue.rfc5424.ParseFailure` records for the
+                lines that could not be parsed.
+        """
+        def __init__(self, prival, version, timestamp, hostname, app_name,
+                     procid, msgid, structured_data, msg, failures=None):
+            self.prival = prival
+            self.version = version
+            self.timestamp = timestamp
+            self.hostname = hostname
+            self.app_name = app_name
+            self.procid = procid
+            self.msgid = msgid
+            self.structured_data = structured_data
+            self.msg = msg
+            self.failures = failures or []
+
+        @classmethod
+        def from_lines(cls, lines):
+            """
+            Parse an iterable of syslog lines, such as a file object, into a
+            batch. Blank lines are skipped and invalid lines are recorded in
+            `failures`, as with :meth:`SyslogEntry.parse_stream
+            <loggerglue.rfc5424.SyslogEntry.parse_stream>`.
+            """
+            prival = array('H')
+            version = array('H')
+            timestamp = []
+            encoders = [_Encoder() for name in STRING_COLUMNS]
+            structured_data = []
+            msg = []
+            failures = []
+            offset = 0
+            lineno = 0
+            for line in lines:
+                lineno += 1
+                stripped = line.strip()
+                if stripped:
+                    try:
+                        spans = scan_spans(stripped)
+                        p = int(stripped[spans[0][0]:spans[0][1]])
+                        v = int(stripped[spans[1][0]:spans[1][1]])
+                        t = timestamp_ns(stripped[spans[2][0]:spans[2][1]])
+                    except (ScanError, ValueError), e:
+                        failures.append(ParseFailure(lineno, offset, str(e), line))
+                    else:
+                        prival.append(p)
+                        version.append(v)
+                        timestamp.append(t)
+                        for (encoder, (start, end)) in zip(encoders, spans[3:7]):
+                            encoder.add(stripped[start:end])
+                        start, end = spans[7]
+                        if stripped[start:end] == '-':
+                            structured_data.append(None)
+                        else:
+                            structured_data.append(stripped[start:end])
+                        if spans[8] is None:
+                            msg.append(None)
+                        else:
+                            msg.append(stripped[spans[8][0]:])
+                offset += len(line)
+            return cls(numpy.frombuffer(prival, dtype=numpy.uint16),
+                       numpy.frombuffer(version, dtype=numpy.uint16),
+                       numpy.array(timestamp, dtype=numpy.int64),
+                       *[encoder.column() for encoder in encoders] +
+                       [structured_data, msg, failures])
+
+        def __len__(self):
+            return len(self.prival)
+
+        @property
+        def severity(self):
+            """Severity of each row, comparable with the `LOG_*` priorities."""
+            return self.prival & 7
+
+        @property
+        def facility(self):
+            """Facility of each row, comparable with the `LOG_*` facility codes."""
+            return self.prival & ~7
+
+        def select(self, mask):
+            """
+            Returns a new batch with the rows selected by `mask`, a boolean
+            mask or an array of row indices.
+            """
+            indices = numpy.asarray(mask)
+            if indices.dtype == bool:
+                indices = numpy.flatnonzero(indices)
+            return EntryBatch(
+                self.prival[indices], self.version[indices],
+                self.timestamp[indices],
+                *[getattr(self, name).take(indices) for name in STRING_COLUMNS] +
+                [[self.structured_data[i] for i in indices],
+                 [self.msg[i] for i in indices]])
+
+        def count_by(self, name):
+            """
+            Returns a dict mapping each value of column `name` (or of the
+            `severity` and `facility` properties) to its number of rows.
+            """
+            column = getattr(self, name)
+            if isinstance(column, DictColumn):
+                return column.counts()
+            values, counts = numpy.unique(column, return_counts=True)
+            return dict(zip(values.tolist(), counts.tolist()))
+
+        def __getitem__(self, i):
+            """Returns row `i` as a :class:`~loggerglue.rfc5424.SyslogEntry`."""
+            sd = self.structured_data[i]
+            if sd is not None:
+                sd = StructuredData.from_elements(scan_structured_data(sd)[0])
+            return SyslogEntry(
+                prival=int(self.prival[i]), version=int(self.version[i]),
+                timestamp=EPOCH + timedelta(microseconds=int(self.timestamp[i]) // 1000),
+                hostname=self.hostname[i], app_name=self.app_name[i],
+                procid=self.procid[i], msgid=self.msgid[i],
+                structured_data=sd, msg=decode_msg(self.msg[i]))
+
+        def __iter__(self):
+            for i in xrange(len(self)):
+                yield self[i]
+
+except ImportError:
+    pass
@@ -3,7 +3,14 @@
 An rfc5424/rfc5425 syslog server implementation
 Copyright © 2011 Evax Software <contact@evax.fr>
 """
-import socket, ssl
+import socket, ssl, threading, time
+from collections import deque
+from zlib import crc32
+
+from loggerglue.rfc5424 import serialize_batch, FRAMING_OCTET, FRAMING_LF, \
+    FRAMING_NUL
+from loggerglue.constants import LOG_WARNING
+from loggerglue.util.mmsg import sendmmsg, HAVE_SENDMMSG
 
 # Default UDP port to send syslog messages
 SYSLOG_DEFAULT_PORT             = 514
@@ -33,6 +40,17 @@ class SyslogEmitter(object):
         """
         pass
 
+    def emit_batch(self, msgs):
+        """
+        Emit several log records. Emitters that can, send them all at once.
+        """
+        for msg in msgs:
+            self.emit(msg)
+
+# Size of the IP and UDP headers of a datagram, subtracted from the MTU
+_IPV4_UDP_HEADERS = 20 + 8
+_IPV6_UDP_HEADERS = 40 + 8
+
 class UDPSyslogEmitter(SyslogEmitter):
     """
     Syslog emitter through UDP.
@@ -41,20 +59,55 @@ class UDPSyslogEmitter(SyslogEmitter):
     use of this class is discouraged. The only use-case would be
     sending messages to a syslog server that does not support TCP.
     """
-    def __init__(self, address=('localhost', SYSLOG_DEFAULT_PORT)):
+    def __init__(self, address=('localhost', SYSLOG_DEFAULT_PORT),
+                 connected=False, mtu=None):
         """Create a Syslog emitter that sends messages through UDP.
 
         **Arguments**
 
             *address*
                 address to send messages to, as `(host,port)` tuple
+
+            *connected*
+                Resolve `address` once and connect the socket to it, instead
+                of looking it up for every datagram. :meth:`emit_batch` then
+                sends many datagrams per system call where `sendmmsg` is
+                available. On a connected socket, the errors reported by the
+                receiving host make the next send fail; the emitter then
+                resolves `address` again and retries once.
+
+            *mtu*
+                Path MTU to the receiver, for example 1500. Messages are
+                truncated so that datagrams fit and are never fragmented.
+                By default, messages are not truncated.
+
+        **Attributes**
+
+            *truncated*
+                Number of messages truncated to fit the MTU.
         """
         self.address = address
+        self.connected = connected
+        self.mtu = mtu
+        self.truncated = 0
         self._connect(address)
 
     def _connect(self, address):
         """(Re-)connect to socket"""
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if not self.connected:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            family = socket.AF_INET
+        else:
+            family, socktype, proto, canonname, sockaddr = \
+                socket.getaddrinfo(address[0], address[1], 0, socket.SOCK_DGRAM)[0]
+            self.socket = socket.socket(family, socktype, proto)
+            self.socket.connect(sockaddr)
+        if self.mtu is None:
+            self._max_size = None
+        elif family == socket.AF_INET6:
+            self._max_size = self.mtu - _IPV6_UDP_HEADERS
+        else:
+            self._max_size = self.mtu - _IPV4_UDP_HEADERS
 
     def close(self):
         """
@@ -62,11 +115,48 @@ class UDPSyslogEmitter(SyslogEmitter):
         """
         pass
 
+    def _datagram(self, msg):
+        """The datagram to send for `msg`, truncated to the MTU"""
+        msg = str(msg)
+        if self._max_size is not None and len(msg) > self._max_size:
+            self.truncated += 1
+            msg = msg[:self._max_size]
+        return msg
+
     def emit(self, msg):
         """
         Emit a record.
         """
-        self.socket.sendto(str(msg), self.address)
+        if not self.connected:
+            self.socket.sendto(self._datagram(msg), self.address)
+            return
+        msg = self._datagram(msg)
+        try:
+            self.socket.send(msg)
+        except socket.error:
+            self._connect(self.address)
+            self.socket.send(msg)
+
+    def emit_batch(self, msgs):
+        """
+        Emit several records, with a single system call if the socket is
+        connected and `sendmmsg` is available.
+        """
+        if not (self.connected and HAVE_SENDMMSG):
+            for msg in msgs:
+                self.emit(msg)
+            return
+        datagrams = [self._datagram(msg) for msg in msgs]
+        sent = 0
+        retried = False
+        while sent < len(datagrams):
+            try:
+                sent += sendmmsg(self.socket, datagrams[sent:])
+            except socket.error:
+                if retried:
+                    raise
+                retried = True
+                self._connect(self.address)
 
 class UNIXSyslogEmitter(SyslogEmitter):
     def __init__(self, address='/dev/log'):
@@ -102,18 +192,30 @@ class UNIXSyslogEmitter(SyslogEmitter):
         """
         Emit a record.
         """
+        buf = serialize_batch((msg,), FRAMING_NUL)
         try:
-            self.socket.send(str(msg)+'\000')
+            self.socket.send(buf)
         except socket.error:
             self._connect(self.address)
-            self.socket.send(str(msg)+'\000')
+            self.socket.send(buf)
 
 class TCPSyslogEmitter(SyslogEmitter):
     """
     Syslog emitter that sends messages through a TCP socket. Optionally supports TLS.
+
+    By default every call to :meth:`emit` writes its message to the socket.
+    With `batch_size`, messages are framed into a buffer that is written
+    with a single :meth:`socket.sendall` once it holds `batch_size` bytes,
+    or when its oldest message has waited for `batch_latency` seconds.
+
+    When a write fails, the emitter reconnects once and writes the messages
+    that were not completely written yet; messages already written to the
+    failed connection are not written again, even if the receiver did not
+    get them.
     """
     def __init__(self, address=('localhost', SYSLOG_DEFAULT_PORT),\
-        octet_based_framing=True, **ssl_args):
+        octet_based_framing=True, batch_size=0, batch_latency=None,
+        connect_timeout=None, **ssl_args):
         """
         **Arguments**
             *address*
@@ -123,48 +225,631 @@ class TCPSyslogEmitter(SyslogEmitter):
                 Use RFC5425 octet-based framing instead of line-based framing. Use
                 this when sending multiline messages.
 
+            *batch_size*
+                Number of bytes to buffer before writing them to the socket, 0
+                (the default) to write every message as it is emitted.
+
+            *batch_latency*
+                Maximum number of seconds a message stays in the buffer. A
+                background thread writes the buffer when it expires. Without
+                it, the buffer is only written when full, or by :meth:`flush`.
+
+            *connect_timeout*
+                Seconds to wait for the connection (and the TLS handshake)
+                to be established, when connecting and reconnecting; no
+                limit if None.
+
             *keyfile*, *certfile*, *server_side*, *cert_reqs*, *ssl_version*, *ca_certs*, *ciphers*
                 Arguments to pass through to :func:`ssl.wrap_socket`. Providing any of these arguments
                 enables TLS.
         """
         self.address = address
         self.octet_based_framing = octet_based_framing
+        if octet_based_framing:
+            self._framing = FRAMING_OCTET
+        else:
+            self._framing = FRAMING_LF
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+        self.connect_timeout = connect_timeout
         self.ssl_args = ssl_args
         self._connect(address, ssl_args)
+        self._buffer = bytearray()
+        # time at which the oldest buffered message was emitted
+        self._since = None
+        # socket error raised while flushing from the background thread
+        self._error = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        if batch_size and batch_latency is not None:
+            thread = threading.Thread(target=self._run, name='TCPSyslogEmitter')
+            thread.setDaemon(True)
+            thread.start()
 
     def _connect(self, address, ssl_args):
         """(Re-)connect to socket"""
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.settimeout(self.connect_timeout)
         self.socket.connect(address)
         if ssl_args:
             self.socket = ssl.wrap_socket(self.socket, server_side=False,
                                    **ssl_args)
+        self.socket.settimeout(None)
 
     def close(self):
         """
-        Closes the socket.
+        Writes buffered messages, then closes the socket.
         """
         try:
-            self.socket.close()
+            self.flush()
+        finally:
+            self._lock.acquire()
+            try:
+                self._closed = True
+                self._pending.notify()
+            finally:
+                self._lock.release()
+            try:
+                self.socket.close()
+            except socket.error:
+                pass
+
+    def _send(self, buf):
+        """
+        Write `buf`, reconnecting once if the connection fails. After a
+        reconnection, only the messages that were not completely written to
+        the previous connection are written again.
+        """
+        sent = 0
+        try:
+            # loop over short writes, which would otherwise cut messages
+            # in the middle of the stream
+            while sent < len(buf):
+                sent += self.socket.send(buffer(buf, sent))
+        except socket.error:
+            self._connect(self.address, self.ssl_args)
+            self.socket.sendall(buffer(buf, self._message_start(buf, sent)))
+
+    def _message_start(self, buf, offset):
+        """Offset in `buf` of the framed message that holds byte `offset`"""
+        if self._framing == FRAMING_LF:
+            return buf.rfind('\n', 0, offset) + 1
+        start = 0
+        while True:
+            space = buf.index(' ', start)
+            end = space + 1 + int(str(buf[start:space]))
+            if end > offset:
+                return start
+            start = end
+
+    def _flush(self):
+        """Write the buffer; called with the lock held"""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self._buffer:
+            buf = self._buffer
+            self._buffer = bytearray()
+            self._since = None
+            self._send(buf)
+
+    def flush(self):
+        """
+        Write buffered messages to the socket.
+        """
+        self._lock.acquire()
+        try:
+            self._flush()
+        finally:
+            self._lock.release()
+
+    def emit(self, msg):
+        """
+        Emit a record.
+        """
+        self.emit_batch((msg,))
+
+    def emit_batch(self, msgs):
+        """
+        Emit several records, serialized into a single buffer.
+        """
+        if not self.batch_size:
+            self._send(serialize_batch(msgs, self._framing))
+            return
+        self._lock.acquire()
+        try:
+            if self._error is not None:
+                self._flush()
+            serialize_batch(msgs, self._framing, self._buffer)
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+            elif self._since is None:
+                self._since = time.time()
+                self._pending.notify()
+        finally:
+            self._lock.release()
+
+    def _run(self):
+        """Background thread: write the buffer once batch_latency expires"""
+        self._lock.acquire()
+        try:
+            while not self._closed:
+                if self._since is None:
+                    self._pending.wait()
+                    continue
+                delay = self._since + self.batch_latency - time.time()
+                if delay > 0:
+                    self._pending.wait(delay)
+                    continue
+                try:
+                    self._flush()
+                except socket.error, e:
+                    # the messages are lost, report it to the next caller
+                    self._error = e
+        finally:
+            self._lock.release()
+
+# How PooledTCPSyslogEmitter picks a receiver for each message
+ROUTING_ROUND_ROBIN = 'round-robin'
+ROUTING_HASH = 'hash'
+
+class _Receiver(object):
+    """A receiver of a PooledTCPSyslogEmitter, and its connection when up"""
+    def __init__(self, address):
+        self.address = address
+        self.emitter = None
+        self.sent = 0
+        self.ejections = 0
+
+class PooledTCPSyslogEmitter(SyslogEmitter):
+    """
+    Syslog emitter that spreads messages over several receivers, keeping
+    a :class:`TCPSyslogEmitter` connection open to each of them.
+
+    A receiver whose connection fails is ejected from the pool: the messages
+    are sent to another receiver instead, and a background thread probes it
+    by reconnecting every `probe_interval` seconds until it is back.
+    :exc:`socket.error` is only raised when no receiver is available.
+
+    Example:
+
+        >>> emitter = PooledTCPSyslogEmitter([('logs1.example.com', 514),
+        ...                                   ('logs2.example.com', 514)],
+        ...                                  routing=ROUTING_HASH)
+    """
+    def __init__(self, addresses, routing=ROUTING_ROUND_ROBIN,
+                 hash_fields=('app_name', 'hostname'), probe_interval=5.0,
+                 connect_timeout=5.0, **tcp_args):
+        """
+        **Arguments**
+            *addresses*
+                List of `(host, port)` tuples of the receivers.
+
+            *routing*
+                `ROUTING_ROUND_ROBIN` to send messages (or batches) to each
+                receiver in turn, `ROUTING_HASH` to always send the messages
+                that have the same `hash_fields` to the same receiver while
+                it is up.
+
+            *hash_fields*
+                Attributes of the messages hashed by `ROUTING_HASH`.
+
+            *probe_interval*
+                Seconds between two attempts to reconnect to ejected receivers.
+
+            *connect_timeout*
+                Seconds to wait for a connection to a receiver, so that a
+                receiver that does not answer cannot stall probing.
+
+            *octet_based_framing*, *batch_size*, *batch_latency*, *keyfile*, *certfile*, ...
+                Arguments to pass through to :class:`TCPSyslogEmitter`.
+        """
+        if routing not in (ROUTING_ROUND_ROBIN, ROUTING_HASH):
+            raise ValueError('unknown routing: %r' % (routing,))
+        self.routing = routing
+        self.hash_fields = hash_fields
+        self.probe_interval = probe_interval
+        self.connect_timeout = connect_timeout
+        self.tcp_args = tcp_args
+        self.receivers = [_Receiver(address) for address in addresses]
+        self._next = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        for receiver in self.receivers:
+            self._probe(receiver)
+        self._thread = threading.Thread(target=self._run,
+                                        name='PooledTCPSyslogEmitter')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _probe(self, receiver):
+        """Try to (re)connect to an ejected receiver"""
+        try:
+            emitter = TCPSyslogEmitter(receiver.address,
+                                       connect_timeout=self.connect_timeout,
+                                       **self.tcp_args)
+        except (socket.error, ssl.SSLError):
+            return
+        self._lock.acquire()
+        try:
+            receiver.emitter = emitter
+        finally:
+            self._lock.release()
+
+    def _eject(self, receiver, emitter):
+        self._lock.acquire()
+        try:
+            if receiver.emitter is not emitter:
+                return
+            receiver.emitter = None
+            receiver.ejections += 1
+        finally:
+            self._lock.release()
+        try:
+            emitter.close()
         except socket.error:
             pass
 
-    def _send(self, msg):
-        msg = str(msg)
-        if self.octet_based_framing:
-            self.socket.send("%i %s" % (len(msg), msg))
-        else:
-            self.socket.send(msg + '\n')
+    def _run(self):
+        """Background thread: probe ejected receivers"""
+        while not self._closed.isSet():
+            self._closed.wait(self.probe_interval)
+            if self._closed.isSet():
+                break
+            for receiver in self.receivers:
+                if receiver.emitter is None:
+                    self._probe(receiver)
+
+    def _hash(self, msg):
+        key = '\0'.join([str(getattr(msg, name, '')) for name in self.hash_fields])
+        return crc32(key) & 0xffffffff
+
+    def _route(self, msg):
+        """Index of the first receiver to try for `msg`"""
+        if self.routing == ROUTING_HASH:
+            return self._hash(msg) % len(self.receivers)
+        self._lock.acquire()
+        try:
+            self._next = (self._next + 1) % len(self.receivers)
+            return self._next
+        finally:
+            self._lock.release()
+
+    def _send(self, start, msgs):
+        """
+        Send `msgs` to the receiver at index `start`, or to the next one
+        that is up, ejecting those that fail.
+        """
+        count = len(self.receivers)
+        for i in xrange(start, start + count):
+            receiver = self.receivers[i % count]
+            emitter = receiver.emitter
+            if emitter is None:
+                continue
+            try:
+                emitter.emit_batch(msgs)
+            except (socket.error, ssl.SSLError):
+                self._eject(receiver, emitter)
+            else:
+                receiver.sent += len(msgs)
+                return
+        raise socket.error('no syslog receiver available')
 
     def emit(self, msg):
         """
         Emit a record.
         """
+        self._send(self._route(msg), (msg,))
+
+    def emit_batch(self, msgs):
+        """
+        Emit several records. With round-robin routing, the whole batch goes
+        to one receiver; with hash routing, it is split by receiver.
+        """
+        if self.routing == ROUTING_ROUND_ROBIN:
+            self._send(self._route(None), msgs)
+            return
+        groups = {}
+        for msg in msgs:
+            groups.setdefault(self._route(msg), []).append(msg)
+        for (start, group) in groups.items():
+            self._send(start, group)
+
+    def close(self):
+        """
+        Stop probing, and close the connections to all receivers.
+        """
+        self._closed.set()
+        self._thread.join()
+        for receiver in self.receivers:
+            emitter, receiver.emitter = receiver.emitter, None
+            if emitter is not None:
+                try:
+                    emitter.close()
+                except socket.error:
+                    pass
+
+    def stats(self):
+        """
+        Returns a dict mapping the address of each receiver to a dict with
+        whether it is `up`, and its `sent` and `ejections` counters.
+        """
+        return dict([(r.address, {'up': r.emitter is not None, 'sent': r.sent,
+                                  'ejections': r.ejections})
+                     for r in self.receivers])
+
+# What QueueSyslogEmitter.emit does when the queue is full
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_NEWEST = 'drop-newest'
+OVERFLOW_DROP_OLDEST = 'drop-oldest'
+OVERFLOW_DROP_BELOW_SEVERITY = 'drop-below-severity'
+OVERFLOWS = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST,
+             OVERFLOW_DROP_BELOW_SEVERITY)
+
+def _severity(msg):
+    """Severity of a queued message; messages without a prival count as LOG_EMERG"""
+    return getattr(msg, 'prival', 0) & 7
+
+class QueueSyslogEmitter(SyslogEmitter):
+    """
+    Syslog emitter that sends messages through another emitter from a
+    background thread.
+
+    :meth:`emit` only puts messages into a bounded queue, so a slow or
+    unreachable syslog receiver does not hold up the threads that log.
+    The background thread takes all the queued messages (up to `batch_size`)
+    at once and hands them to :meth:`SyslogEmitter.emit_batch` of the wrapped
+    emitter.
+
+    Example:
+
+        >>> emitter = QueueSyslogEmitter(TCPSyslogEmitter(('logs.example.com', 514)),
+        ...                              overflow=OVERFLOW_DROP_OLDEST)
+    """
+    def __init__(self, emitter, maxsize=10000, batch_size=256,
+                 overflow=OVERFLOW_BLOCK, min_severity=LOG_WARNING):
+        """
+        **Arguments**
+            *emitter*
+                Emitter to send messages through.
+
+            *maxsize*
+                Maximum number of messages waiting in the queue.
+
+            *batch_size*
+                Maximum number of messages handed to `emitter` at once.
+
+            *overflow*
+                What to do with a new message when the queue is full:
+
+                - `OVERFLOW_BLOCK`: wait until there is room in the queue.
+                - `OVERFLOW_DROP_NEWEST`: drop the new message.
+                - `OVERFLOW_DROP_OLDEST`: drop the oldest queued message.
+                - `OVERFLOW_DROP_BELOW_SEVERITY`: drop the new message if it is
+                  less severe than `min_severity`. Otherwise drop the oldest
+                  queued message that is, or wait as with `OVERFLOW_BLOCK` if
+                  there is none.
+
+            *min_severity*
+                Least severe priority that `OVERFLOW_DROP_BELOW_SEVERITY` keeps,
+                `LOG_WARNING` by default. Messages that have no `prival` (such as
+                preformatted strings) are never dropped for their severity.
+
+        **Attributes**
+            *enqueued*
+                Number of messages put into the queue.
+
+            *sent*
+                Number of messages handed to `emitter` successfully.
+
+            *dropped*
+                Number of messages dropped by the overflow policy, or emitted
+                after :meth:`close`.
+
+            *failed*
+                Number of messages lost because `emitter` raised an exception,
+                see :meth:`handle_error`.
+        """
+        if overflow not in OVERFLOWS:
+            raise ValueError('unknown overflow policy: %r' % (overflow,))
+        self.emitter = emitter
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.min_severity = min_severity
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        # number of enqueued messages that have left the queue, see flush()
+        self._done = 0
+        self._queue = deque()
+        self._closed = False
+        # set once the background thread is done, see close()
+        self._stopped = False
+        self._close_on_exit = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run,
+                                        name='QueueSyslogEmitter')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def __len__(self):
+        """Number of messages waiting in the queue"""
+        return len(self._queue)
+
+    def _make_room(self, msg):
+        """
+        Apply the overflow policy to `msg` while the queue is full. Returns
+        False if `msg` must be dropped, True once it can be queued.
+        """
+        queue = self._queue
+        while len(queue) >= self.maxsize and not self._closed:
+            if self.overflow == OVERFLOW_DROP_NEWEST:
+                return False
+            elif self.overflow == OVERFLOW_DROP_OLDEST:
+                queue.popleft()
+                self._dropped_queued(1)
+            elif self.overflow == OVERFLOW_DROP_BELOW_SEVERITY:
+                if _severity(msg) > self.min_severity:
+                    return False
+                for (i, queued) in enumerate(queue):
+                    if _severity(queued) > self.min_severity:
+                        del queue[i]
+                        self._dropped_queued(1)
+                        break
+                else:
+                    self._not_full.wait()
+            else:
+                self._not_full.wait()
+        return not self._closed
+
+    def _dropped_queued(self, count):
+        self.dropped += count
+        self._done += count
+        self._all_done.notifyAll()
+
+    def emit(self, msg):
+        """
+        Queue a record. Depending on the overflow policy, this blocks while
+        the queue is full.
+        """
+        self._lock.acquire()
         try:
-            self._send(msg)
-        except socket.error:
-            self._connect(self.address, self.ssl_args)
-            self._send(msg)
+            if len(self._queue) >= self.maxsize and not self._make_room(msg):
+                self.dropped += 1
+                return
+            if self._closed:
+                self.dropped += 1
+                return
+            self._queue.append(msg)
+            self.enqueued += 1
+            self._not_empty.notify()
+        finally:
+            self._lock.release()
+
+    def _run(self):
+        """Background thread: send queued messages in batches"""
+        queue = self._queue
+        while True:
+            self._lock.acquire()
+            try:
+                while not queue and not self._closed:
+                    self._not_empty.wait()
+                if not queue:
+                    self._stopped = True
+                    close = self._close_on_exit
+                    break
+                batch = [queue.popleft()
+                         for i in xrange(min(len(queue), self.batch_size))]
+                self._not_full.notifyAll()
+            finally:
+                self._lock.release()
+            try:
+                self.emitter.emit_batch(batch)
+            except Exception, e:
+                sent = False
+                self.handle_error(batch, e)
+            else:
+                sent = True
+            self._lock.acquire()
+            try:
+                if sent:
+                    self.sent += len(batch)
+                else:
+                    self.failed += len(batch)
+                self._done += len(batch)
+                self._all_done.notifyAll()
+            finally:
+                self._lock.release()
+        if close:
+            # close() gave up waiting for this thread
+            self.emitter.close()
+
+    def handle_error(self, batch, exc):
+        """
+        Called in the background thread when the wrapped emitter fails to
+        send `batch`, with the exception it raised. The messages are counted
+        as failed and not retried; the wrapped emitter has already tried to
+        reconnect. Override to log or retry elsewhere.
+        """
+        pass
+
+    def flush(self, timeout=None):
+        """
+        Wait until every message queued before the call has been handed to
+        the wrapped emitter (or dropped), at most `timeout` seconds if given.
+        Returns False if the timeout expired first.
+        """
+        self._lock.acquire()
+        try:
+            target = self.enqueued
+            if timeout is not None:
+                deadline = time.time() + timeout
+            while self._done < target:
+                if timeout is None:
+                    self._all_done.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._all_done.wait(remaining)
+            return True
+        finally:
+            self._lock.release()
+
+    def close(self, timeout=None):
+        """
+        Stop accepting messages, send the queued ones, then close the wrapped
+        emitter. Messages emitted from now on are dropped. If they cannot all
+        be sent within `timeout` seconds, the rest are dropped.
+
+        Returns True once the wrapped emitter is closed. Returns False if the
+        background thread is still sending a batch when `timeout` expires:
+        the wrapped emitter is then closed by that thread when it is done.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        self._lock.acquire()
+        try:
+            self._closed = True
+            self._not_empty.notify()
+            self._not_full.notifyAll()
+        finally:
+            self._lock.release()
+        if timeout is None:
+            self.flush()
+        else:
+            self.flush(max(deadline - time.time(), 0))
+        self._lock.acquire()
+        try:
+            self._dropped_queued(len(self._queue))
+            self._queue.clear()
+        finally:
+            self._lock.release()
+        if timeout is None:
+            self._thread.join()
+        else:
+            self._thread.join(max(deadline - time.time(), 0))
+        self._lock.acquire()
+        try:
+            if not self._stopped:
+                self._close_on_exit = True
+                return False
+        finally:
+            self._lock.release()
+        self.emitter.close()
+        return True
+
+    def stats(self):
+        """Returns a dict with the counters and the current queue length"""
+        return {'enqueued': self.enqueued, 'sent': self.sent,
+                'dropped': self.dropped, 'failed': self.failed,
+                'queued': len(self._queue)}
 
 try:
     from twisted.internet.protocol import DatagramProtocol
@@ -3,11 +3,33 @@
 An rfc5424/rfc5425 syslog server implementation
 Copyright © 2011 Evax Software <contact@evax.fr>
 """
-import socket,os,sys
-from datetime import datetime
+import socket,os,sys,time
 
 from loggerglue.rfc5424 import DEFAULT_PRIVAL,SyslogEntry
 from loggerglue.emitter import UNIXSyslogEmitter
+from loggerglue.util.escape_value import str_or_nil
+
+class LoggerEntry(SyslogEntry):
+    """
+    A :class:`~loggerglue.rfc5424.SyslogEntry` sent by a :class:`Logger`,
+    serialized with the header template its Logger rendered once for
+    the fixed fields.
+
+    The template is only used while the header fields still hold the
+    values it was rendered from; once one of them is changed, or the
+    entry is unpickled (the template is not pickled), the entry is
+    serialized as any other.
+    """
+    __slots__ = ('template',)
+
+    def parts(self):
+        template = getattr(self, 'template', None)
+        if template is None or template[2] != (self.prival, self.version,
+                self.hostname, self.app_name, self.procid):
+            return SyslogEntry.parts(self)
+        prefix, middle, fields = template
+        return [prefix, self._timestamp_part(), middle, str_or_nil(self.msgid),
+                ' ', str_or_nil(self.structured_data)] + self._msg_parts()
 
 class Logger(object):
     """
@@ -52,6 +74,24 @@ class Logger(object):
         self.procid = procid
         self.emitter = emitter
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in ('hostname', 'app_name', 'procid'):
+            # header templates are rendered from these
+            self._templates = {}
+
+    def _template(self, prival):
+        """
+        Render the fixed parts of the header for `prival`: what comes
+        before the TIMESTAMP, and " HOSTNAME APP-NAME PROCID " after it,
+        along with the field values they were rendered from.
+        """
+        template = ('<%i>1 ' % prival, ' %s %s %s ' % (str_or_nil(self.hostname),
+                    str_or_nil(self.app_name), str_or_nil(self.procid)),
+                    (prival, 1, self.hostname, self.app_name, self.procid))
+        self._templates[prival] = template
+        return template
+
     def log(self, msg=None, msgid=None, structured_data=None, prival=DEFAULT_PRIVAL,
             timestamp=None):
         """
@@ -71,17 +111,24 @@ class Logger(object):
             *prival*
                 Priority and facility of message (defaults to INFO|USER)
             *timestamp*
-                UTC time of log message (default to current time)
+                UTC time of log message, as a datetime object, a float number
+                of seconds or an integer number of nanoseconds since the epoch
+                (default to current time, from :func:`time.time`)
         """
         if timestamp is None:
-            timestamp = datetime.utcnow()
+            timestamp = time.time()
+
+        template = self._templates.get(prival)
+        if template is None:
+            template = self._template(prival)
 
-        msg = SyslogEntry(
-                    prival=prival, timestamp=datetime.utcnow(),
+        msg = LoggerEntry(
+                    prival=prival, timestamp=timestamp,
                     hostname=self.hostname, app_name=self.app_name, procid=self.procid, msgid=msgid,
                     structured_data=structured_data,
                     msg=msg
             )
+        msg.template = template
 
         self.emitter.emit(msg)
 
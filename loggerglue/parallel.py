@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel parsing of large syslog archives.
+
+Parsing is pure CPU work, so a single process is bound to one core. This
+module splits a file into line-aligned chunks and parses them in a pool
+of worker processes, each reading its own chunk from the file, while
+results are handed back in the original order.
+
+Copyright © 2011 Evax Software <contact@evax.fr>
+"""
+import os
+from collections import deque
+from cStringIO import StringIO
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+from loggerglue.rfc5424 import SyslogEntry, ParseFailure
+
+# Default size of the chunks handed to worker processes, in bytes
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+def split_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns the `(start, end)` offsets of consecutive chunks of the file at
+    `path`. Chunks are about `chunk_size` bytes long, and only end at line
+    boundaries (or at the end of the file).
+    """
+    size = os.path.getsize(path)
+    chunks = []
+    f = open(path, 'rb')
+    try:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = f.tell()
+            chunks.append((start, end))
+            start = end
+    finally:
+        f.close()
+    return chunks
+
+def compact(entry):
+    """
+    Turns a :class:`~loggerglue.rfc5424.SyslogEntry` into a tuple of plain
+    values, which is much cheaper to send back from a worker process than
+    the entry itself. Pass it as `transform` to :func:`parse_file`.
+
+    The tuple holds `(prival, version, timestamp, hostname, app_name, procid,
+    msgid, structured_data, msg)`, where `structured_data` is None or a list of
+    `(sd_id, [(param_name, param_value), ...])` tuples.
+    """
+    sd = entry.structured_data
+    if sd is not None:
+        sd = [(e.id, list(e.sd_params.allitems())) for e in sd.elements]
+    return (entry.prival, entry.version, entry.timestamp, entry.hostname,
+            entry.app_name, entry.procid, entry.msgid, sd, entry.msg)
+
+def _parse_chunk(args):
+    """Parse one chunk in a worker process"""
+    path, start, end, engine, transform = args
+    f = open(path, 'rb')
+    try:
+        f.seek(start)
+        # split like iterating over the file would
+        lines = StringIO(f.read(end - start)).readlines()
+    finally:
+        f.close()
+    results = []
+    for entry in SyslogEntry.parse_stream(lines, engine=engine):
+        if isinstance(entry, ParseFailure):
+            entry = entry._replace(offset=entry.offset + start)
+        elif transform is not None:
+            entry = transform(entry)
+        results.append(entry)
+    return len(lines), results
+
+def parse_file(path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+               engine=None, transform=None):
+    """
+    Parse the syslog file at `path` in a pool of processes, and yield the
+    results in file order, as :meth:`SyslogEntry.parse_stream
+    <loggerglue.rfc5424.SyslogEntry.parse_stream>` does: one entry per
+    non-blank line, or a :data:`~loggerglue.rfc5424.ParseFailure` for lines
+    that cannot be parsed.
+
+    At most two chunks per worker are parsed ahead of the consumer, so
+    that memory use does not grow with the file when results are consumed
+    slowly. The pool is terminated when the generator is exhausted or
+    closed.
+
+    **Arguments**
+        *workers*
+            Number of worker processes, defaults to the number of CPUs.
+
+        *chunk_size*
+            Approximate size in bytes of the chunks each worker parses at
+            a time, see :func:`split_file`.
+
+        *engine*
+            Parser engine, see :meth:`SyslogEntry.from_line
+            <loggerglue.rfc5424.SyslogEntry.from_line>`.
+
+        *transform*
+            Function applied to each entry in the worker, whose result is
+            yielded instead of the entry, for example :func:`compact`. It must
+            be a module-level function so that it can be pickled.
+    """
+    if workers is None:
+        workers = cpu_count()
+    tasks = iter([(path, start, end, engine, transform)
+                  for (start, end) in split_file(path, chunk_size)])
+    pool = Pool(workers)
+    try:
+        pending = deque(pool.apply_async(_parse_chunk, (task,))
+                        for task in islice(tasks, 2 * workers))
+        lineno = 0
+        while pending:
+            nlines, results = pending.popleft().get()
+            task = next(tasks, None)
+            if task is not None:
+                pending.append(pool.apply_async(_parse_chunk, (task,)))
+            for entry in results:
+                if isinstance(entry, ParseFailure):
+                    entry = entry._replace(lineno=entry.lineno + lineno)
+                yield entry
+            lineno += nlines
+    finally:
+        pool.terminate()
+        pool.join()
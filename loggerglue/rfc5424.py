@@ -5,17 +5,19 @@ A parser for the Syslog Protocol (RFC5424 - http://tools.ietf.org/search/rfc542)
 Copyright © 2011 Evax Software <contact@evax.fr>
 """
 
-import calendar
+from collections import namedtuple
 from datetime import datetime
-from pyparsing import Word, Regex, Group, White, Combine, CharsNotIn, \
+from pyparsing import Word, Regex, Group, White, Combine, \
     ZeroOrMore, OneOrMore, QuotedString, Or, Optional, LineStart, LineEnd, \
-    printables
+    printables, ParseException
 from loggerglue.util.MultiDict import OrderedMultiDict
 from loggerglue.util.escape_value import escape_param_value, str_or_nil
 from loggerglue.util.parse_timestamp import parse_timestamp
-
-# Support SYSLOG_SyslogProtocol23Format which can send an empty APP-NAME.
-SUPPORT_MISSING_VALUES = True
+from loggerglue.util.format_timestamp import format_timestamp, format_timestamp_float
+from loggerglue.util.sd_params import SDParams, FrozenSDParams
+from loggerglue.scanner import scan, scan_spans, scan_header, \
+    scan_structured_data, unescape_param_value, FIELDS, HEADER_FIELDS, \
+    NAME_CHARS, SUPPORT_MISSING_VALUES
 
 # from the RFCs ABNF description
 nilvalue = Word("-")
@@ -30,7 +32,7 @@ bom = Regex(BOM)
 msg_utf8 = bom + utf_8_string
 msg_any = utf_8_string
 msg = Combine(Or([msg_utf8, msg_any])).setResultsName('MSG')
-sd_name = CharsNotIn('= ]"', 1, 32)
+sd_name = Regex(NAME_CHARS + '{1,32}')
 param_name = sd_name.setResultsName('SD_PARAM_NAME')
 param_value = QuotedString(quoteChar='"', escChar='\\', multiline=True)
 param_value = param_value.setResultsName('SD_PARAM_VALUE')
@@ -58,43 +60,151 @@ date_fullyear = Regex('[0-9]{4}')
 full_date = date_fullyear + '-' + date_month + '-' + date_mday
 timestamp = Combine(Or([nilvalue, full_date + 'T' + full_time]))
 timestamp = timestamp.setResultsName('TIMESTAMP')
-msgid = Or([nilvalue, CharsNotIn('= ]"', 1, 32)])
-if SUPPORT_MISSING_VALUES:
-    msgid = Optional(msgid)
-msgid = msgid.setResultsName('MSGID')
-procid = Or([nilvalue,CharsNotIn('= ]"', 1, 128)])
-if SUPPORT_MISSING_VALUES:
-    procid = Optional(procid)
-procid = procid.setResultsName('PROCID')
-app_name = Or([nilvalue, CharsNotIn('= ]"', 1, 48)])
-if SUPPORT_MISSING_VALUES:
-    app_name = Optional(app_name)
-app_name= app_name.setResultsName('APP_NAME')
-hostname = Or([nilvalue, CharsNotIn('= ]"', 1, 255)])
-if SUPPORT_MISSING_VALUES:
-    hostname = Optional(hostname)
-hostname = hostname.setResultsName('HOSTNAME')
+def header_field(maxlen, name):
+    field = Or([nilvalue, Regex(NAME_CHARS + '{1,%i}' % maxlen)]).setResultsName(name)
+    if SUPPORT_MISSING_VALUES:
+        # a missing value, unless the next field is a NILVALUE, which is
+        # then taken as the value (see loggerglue.scanner)
+        field = (Optional(Regex(' +(?=-+ )').suppress()) + field) | ~Regex(' +-')
+    return field
+msgid = header_field(32, 'MSGID')
+procid = header_field(128, 'PROCID')
+app_name = header_field(48, 'APP_NAME')
+hostname = header_field(255, 'HOSTNAME')
 version = Regex('[1-9][0-9]{0,2}').setResultsName('VERSION')
 prival = Regex("[0-9]{1,3}").setResultsName('PRIVAL')
 pri = "<" + prival + ">"
 header = pri + version + sp + timestamp + sp + hostname + sp + \
          app_name + sp + procid + sp + msgid
-syslog_msg = LineStart() + header + structured_data + \
-             Optional(sp+msg) + LineEnd()
+# parts are separated by exactly one SP, whitespace is only skipped
+# before MSG
+header.leaveWhitespace()
+structured_data.leaveWhitespace()
+syslog_msg = LineStart() + header + sp.copy().leaveWhitespace() + structured_data + \
+             Optional(sp.copy().leaveWhitespace() + msg) + LineEnd()
 
 # Default Prival for new SyslogEntry instances
 from constants import LOG_INFO,LOG_USER
 DEFAULT_PRIVAL = LOG_INFO|LOG_USER
 
+# Parser engines: the hand-written scanner (see :mod:`loggerglue.scanner`)
+# and the pyparsing grammar above, kept as the reference implementation.
+ENGINE_SCANNER = 'scanner'
+ENGINE_PYPARSING = 'pyparsing'
+ENGINES = (ENGINE_SCANNER, ENGINE_PYPARSING)
+# Engine used when none is passed to from_line/from_str
+DEFAULT_ENGINE = ENGINE_SCANNER
+
+def _check_engine(engine):
+    if engine is None:
+        return DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError('unknown parser engine: %r' % (engine,))
+    return engine
+
+# Set to an :class:`~loggerglue.util.intern_table.InternTable` to share the
+# values of HOSTNAME, APP-NAME, PROCID, MSGID, SD-IDs and SD-PARAM names
+# between parsed entries (scanner engine, and HEADER fields with pyparsing)
+INTERN_TABLE = None
+
+def _decode_utf8(v):
+    return v.decode('utf-8')
+
+def decode_field(v):
+    '''
+    Decode a raw HEADER field, mapping NILVALUE and missing values to None.
+    '''
+    if v in ["", "-"]:
+        return None
+    if INTERN_TABLE is not None:
+        # str() makes bytearray slices hashable
+        return INTERN_TABLE.lookup(str(v), _decode_utf8)
+    return v.decode('utf-8')
+
+def decode_msg(m):
+    '''
+    Decode a raw MSG, honouring the UTF-8 BOM.
+    '''
+    if m is None:
+        return None
+    if m.startswith(BOM):
+        return m[3:].decode('utf-8')
+    return unicode(m)
+
+# Characters str.strip() removes
+_WHITESPACE = frozenset(' \t\n\r\x0b\x0c')
+
+# A line that could not be parsed by SyslogEntry.parse_stream: its line number
+# (starting at 1), the offset of its first character in the stream, the
+# reason it was rejected and the line itself.
+ParseFailure = namedtuple('ParseFailure', 'lineno offset reason line')
+
+# Transport framings for serialize_into: none, RFC5425/RFC6587 octet counting,
+# RFC6587 non-transparent framing with LF, and NUL-terminated messages as
+# expected by local syslog daemons.
+FRAMING_NONE = None
+FRAMING_OCTET = 'octet'
+FRAMING_LF = 'lf'
+FRAMING_NUL = 'nul'
+FRAMINGS = (FRAMING_NONE, FRAMING_OCTET, FRAMING_LF, FRAMING_NUL)
+
+def frame_into(buf, parts, framing=FRAMING_NONE):
+    """
+    Append the message made of the strings `parts` to the bytearray `buf`,
+    framed with `framing`, one of the `FRAMING_*` constants. Returns the
+    number of bytes appended.
+    """
+    start = len(buf)
+    # joining is much cheaper than appending the parts one by one
+    data = ''.join(parts)
+    if framing == FRAMING_OCTET:
+        buf += '%i ' % len(data)
+    elif framing not in FRAMINGS:
+        raise ValueError('unknown framing: %r' % (framing,))
+    buf += data
+    if framing == FRAMING_LF:
+        buf += '\n'
+    elif framing == FRAMING_NUL:
+        buf += '\000'
+    return len(buf) - start
+
+def serialize_batch(entries, framing=FRAMING_NONE, buf=None):
+    """
+    Serialize `entries` one after the other into the bytearray `buf` (a new
+    one by default), each framed with `framing`, and return it. Entries that
+    are not :class:`SyslogEntry` objects are converted with `str()`.
+    """
+    if buf is None:
+        buf = bytearray()
+    for entry in entries:
+        if isinstance(entry, SyslogEntry):
+            frame_into(buf, entry.parts(), framing)
+        else:
+            frame_into(buf, (str(entry),), framing)
+    return buf
+
 class Params(object):
+    """
+    Attribute access to the parameters of an SD-ELEMENT, without copying them:
+    `params.origin` is the last value of the `origin` parameter.
+    """
+    __slots__ = ('_params',)
+
     def __init__(self, d):
-        for k, v in d.items():
-            setattr(self, k, v)
+        self._params = d
+
+    def __getattr__(self, name):
+        try:
+            return self._params[name]
+        except KeyError:
+            raise AttributeError(name)
 
 class SDElement(object):
     """
     An SD-ELEMENT consists of a name and parameter name-value pairs.
     """
+    __slots__ = ('id', 'sd_params')
+
     def __init__(self, sd_id, sd_params):
         """
         **arguments**
@@ -113,7 +223,7 @@ class SDElement(object):
 
             *sd_params*
                 Key/value pairs attached to this SD-ELEMENT, represented as
-                a OrderedMultiDict.
+                a :class:`~loggerglue.util.sd_params.SDParams` multidict.
 
             *params*
                 Key/value pairs attached to this SD-ELEMENT, represented as
@@ -123,8 +233,17 @@ class SDElement(object):
 
         """
         self.id = sd_id
-        self.sd_params = OrderedMultiDict(sd_params)
-        self.params = Params(self.sd_params)
+        self.sd_params = SDParams(sd_params)
+
+    def __getstate__(self):
+        return (self.id, self.sd_params)
+
+    def __setstate__(self, state):
+        (self.id, self.sd_params) = state
+
+    @property
+    def params(self):
+        return Params(self.sd_params)
 
     def __str__(self):
         """Convert SDElement to formatted string"""
@@ -134,6 +253,10 @@ class SDElement(object):
         rv += [']']
         return ''.join(rv)
 
+    def freeze(self):
+        """Returns an immutable copy of this element, see :class:`FrozenSDElement`."""
+        return FrozenSDElement(self.id, self.sd_params)
+
     @classmethod
     def parse(cls, parsed):
         sd = getattr(parsed, 'STRUCTURED_DATA', None)
@@ -146,7 +269,43 @@ class SDElement(object):
                     i.SD_PARAM.SD_PARAM_VALUE.decode('utf-8')
         return StructuredData(sd_id, params)
 
+class FrozenSDElement(SDElement):
+    """
+    An immutable SD-ELEMENT, rendered once when it is created.
+
+    Elements attached to every message, such as the name, region or build
+    of a service, can be frozen and reused so that their parameters are not
+    escaped and formatted again for each message. Its attributes cannot be
+    assigned and its `sd_params` cannot be modified.
+    """
+    __slots__ = ('rendered',)
+
+    def __init__(self, sd_id, sd_params):
+        """
+        **arguments**
+            *sd_id*, *sd_params*
+                As for :class:`SDElement`.
+        """
+        self.__setstate__((sd_id, sd_params))
+
+    def __setstate__(self, state):
+        (sd_id, sd_params) = state
+        object.__setattr__(self, 'id', sd_id)
+        object.__setattr__(self, 'sd_params', FrozenSDParams(sd_params))
+        object.__setattr__(self, 'rendered', str(SDElement.__str__(self)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('FrozenSDElement attributes cannot be assigned')
+
+    def __str__(self):
+        return self.rendered
+
+    def freeze(self):
+        return self
+
 class StructuredData(object):
+    __slots__ = ('elements',)
+
     def __init__(self, elements):
         self.elements = elements
 
@@ -154,6 +313,12 @@ class StructuredData(object):
         """Convert StructuredData to string"""
         return ''.join([str(e) for e in self.elements])
 
+    def __getstate__(self):
+        return self.elements
+
+    def __setstate__(self, state):
+        self.elements = state
+
     @classmethod
     def parse(cls, parsed):
         sd = getattr(parsed, 'STRUCTURED_DATA', None)
@@ -164,15 +329,36 @@ class StructuredData(object):
             sd_id = se.SD_ID
             params = OrderedMultiDict()
             for i in se.SD_PARAMS:
+                # QuotedString only unescapes '\"', do the rest here
                 params[i.SD_PARAM.SD_PARAM_NAME] = \
-                        i.SD_PARAM.SD_PARAM_VALUE.decode('utf-8')
+                        unescape_param_value(i.SD_PARAM.SD_PARAM_VALUE).decode('utf-8')
             elements.append(SDElement(sd_id, params))
         return StructuredData(elements)
 
     @classmethod
-    def from_str(cls, line, consume_error=True):
+    def from_elements(cls, elements):
+        """Returns a StructuredData object from the raw elements returned by
+        :func:`loggerglue.scanner.scan_structured_data`."""
+        if elements is None:
+            return None
+        if INTERN_TABLE is not None:
+            intern = INTERN_TABLE.lookup
+            return StructuredData([
+                SDElement(intern(str(sd_id)),
+                          [(intern(str(k)), v.decode('utf-8')) for (k, v) in params])
+                for (sd_id, params) in elements])
+        return StructuredData([
+            # str() turns names scanned from a bytearray into plain strings
+            SDElement(str(sd_id), [(str(k), v.decode('utf-8')) for (k, v) in params])
+            for (sd_id, params) in elements])
+
+    @classmethod
+    def from_str(cls, line, consume_error=True, engine=None):
         """Returns a StructuredData object from a string"""
+        engine = _check_engine(engine)
         try:
+            if engine == ENGINE_SCANNER:
+                return cls.from_elements(scan_structured_data(line)[0])
             r = structured_data.parseString(line)
             return cls.parse(r)
         except Exception, e:
@@ -188,6 +374,10 @@ class SyslogEntry(object):
     """
     A class representing a syslog entry.
     """
+    __slots__ = ('prival', 'version', 'timestamp', 'timestamp_as_float',
+                 'hostname', 'app_name', 'procid', 'msgid', 'structured_data',
+                 'msg')
+
     def __init__(self, prival=DEFAULT_PRIVAL, version=1, timestamp=None,
             hostname=None, app_name=None, procid=None, msgid=None,
             structured_data=None, msg=None):
@@ -202,7 +392,9 @@ class SyslogEntry(object):
                 Version of syslog entry. There is usually no need to change this.
 
             *timestamp*
-                Timestamp (as a datetime object).
+                Timestamp, as a UTC datetime object. Entries to be serialized
+                can also be given a float number of seconds since the epoch,
+                or an integer number of nanoseconds since the epoch.
 
             *hostname*
                 The HOSTNAME field SHOULD contain the hostname and the domain name of the originator.
@@ -242,6 +434,13 @@ class SyslogEntry(object):
         self.structured_data = structured_data
         self.msg = msg
 
+    def __getstate__(self):
+        return dict([(k, getattr(self, k)) for k in SyslogEntry.__slots__])
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
     @classmethod
     def parse(cls, parsed):
         ts = parse_timestamp(parsed.TIMESTAMP)
@@ -254,20 +453,9 @@ class SyslogEntry(object):
         for i in ('prival', 'version', 'hostname', 'app_name',
                   'procid', 'msgid'):
             I = i.upper()
-            v = getattr(parsed, I, '-')
-            if v in ["", "-"]:
-                v = None
-            else:
-                v = v.decode('utf-8')
-            attr[i] = v
-        m = getattr(parsed, 'MSG', None)
-        if m is not None:
-            if m.startswith(BOM):
-                msg = m[3:].decode('utf-8')
-            else:
-                msg = unicode(m)
-        else:
-            msg = None
+            attr[i] = decode_field(getattr(parsed, I, '-'))
+        # ParseResults attributes default to '', which would turn a missing MSG into u''
+        msg = decode_msg(parsed.get('MSG'))
         version = int(attr['version'])
         prival = int(attr['prival'])
         structured_data = StructuredData.parse(parsed)
@@ -277,32 +465,80 @@ class SyslogEntry(object):
             structured_data=structured_data, msg=msg
         )
 
+    @classmethod
+    def from_fields(cls, fields):
+        """Returns a SyslogEntry object from the raw fields returned by
+        :func:`loggerglue.scanner.scan`."""
+        (prival, version, ts, hostname, app_name, procid, msgid,
+         structured_data, msg) = fields
+        timestamp = parse_timestamp(ts)
+        if timestamp is None:
+            # If no timestamp provided, fill in current UTC date and time
+            timestamp = datetime.utcnow()
+        return cls(
+            prival=int(prival), version=int(version), timestamp=timestamp,
+            hostname=decode_field(hostname), app_name=decode_field(app_name),
+            procid=decode_field(procid), msgid=decode_field(msgid),
+            structured_data=StructuredData.from_elements(structured_data),
+            msg=decode_msg(msg)
+        )
+
     def __str__(self):
         """Convert SyslogEntry to string"""
-        rv = ['<', str(self.prival), '>', str(self.version), ' ']
+        return ''.join(self.parts())
+
+    def serialize_into(self, buf, framing=FRAMING_NONE):
+        """
+        Append the encoded entry to the bytearray `buf`, framed with
+        `framing` (see :func:`frame_into`).
+        Returns the number of bytes appended.
+        """
+        return frame_into(buf, self.parts(), framing)
+
+    def parts(self):
+        """Returns the list of strings that make up the encoded entry"""
+        rv = ['<', str(self.prival), '>', str(self.version), ' ',
+              self._timestamp_part(), ' ',
+              str_or_nil(self.hostname), ' ', str_or_nil(self.app_name), ' ', str_or_nil(self.procid), ' ',
+              str_or_nil(self.msgid),    ' ', str_or_nil(self.structured_data)]
+        return rv + self._msg_parts()
+
+    def _timestamp_part(self):
+        """The encoded TIMESTAMP"""
         if self.timestamp is None:
-            rv.append('-')
+            return '-'
         elif self.timestamp_as_float:
-            t = calendar.timegm(self.timestamp.utctimetuple())
-            t += self.timestamp.microsecond / 1000000.0
-            rv.append(repr(t))
-        else:
-            rv.append(self.timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
-        rv += [' ',
-               str_or_nil(self.hostname), ' ', str_or_nil(self.app_name), ' ', str_or_nil(self.procid), ' ',
-               str_or_nil(self.msgid),    ' ', str_or_nil(self.structured_data)]
-        if self.msg is not None:
-            rv += [' ']
-            if type(self.msg) is unicode:
-                rv += [BOM, self.msg.encode('utf-8')]
-            else:
-                rv += [self.msg]
-        return ''.join(rv)
+            return format_timestamp_float(self.timestamp)
+        return format_timestamp(self.timestamp)
+
+    def _msg_parts(self):
+        """The strings that make up the encoded MSG and the SP before it"""
+        msg = self.msg
+        if msg is None:
+            return []
+        if type(msg) is unicode:
+            return [' ', BOM, msg.encode('utf-8')]
+        return [' ', msg]
 
     @classmethod
-    def from_line(cls, line, consume_error=True):
-        """Returns a parsed SyslogEntry object from a syslog `line`."""
+    def from_line(cls, line, consume_error=True, engine=None, lazy=False):
+        """Returns a parsed SyslogEntry object from a syslog `line`.
+
+        `engine` is one of `ENGINE_SCANNER` and `ENGINE_PYPARSING`, and
+        defaults to `DEFAULT_ENGINE`.
+
+        If `lazy` is true, a :class:`LazySyslogEntry` is returned, which
+        only decodes STRUCTURED-DATA and MSG when they are first accessed.
+        This requires the scanner engine.
+        """
+        engine = _check_engine(engine)
+        if lazy and engine != ENGINE_SCANNER:
+            raise ValueError('lazy parsing requires the %r engine' % ENGINE_SCANNER)
         try:
+            if lazy:
+                return LazySyslogEntry.from_spans(line.strip())
+            if engine == ENGINE_SCANNER:
+                return cls.from_fields(scan(line.strip()))
             r = syslog_msg.parseString(line.strip())
             return cls.parse(r)
         except Exception, e:
@@ -314,3 +550,252 @@ class SyslogEntry(object):
             else:
                 raise
 
+    @classmethod
+    def from_buffer(cls, buf, start=0, end=None):
+        """Returns a :class:`LazySyslogEntry` for the message held in
+        `buf[start:end]`, without copying it: fields are only decoded (and
+        copied) when first read.
+
+        `buf` can be a `str`, `bytearray`, `buffer` or `mmap`, so a receive
+        buffer holding many frames can be parsed in place. It must not be
+        modified until the fields needed have been read. The message is
+        not stripped. A `memoryview` is copied first, as regular expressions
+        cannot scan it.
+
+        Raises :class:`~loggerglue.scanner.ScanError` if the message is invalid.
+        """
+        if isinstance(buf, memoryview):
+            buf = buf[start:end].tobytes()
+            start, end = 0, None
+        return LazySyslogEntry.from_spans(buf, start, end, header=False)
+
+    @classmethod
+    def parse_stream(cls, lines, engine=None, lazy=False):
+        """Parse an iterable of syslog lines, such as a file object, and yield
+        one parsed SyslogEntry per non-blank line.
+
+        Nothing is printed for invalid lines: a :data:`ParseFailure` record is
+        yielded in their place instead, so a flood of malformed input costs no
+        more than valid input. `engine` and `lazy` are as for
+        :meth:`from_line`.
+
+        Example:
+
+            >>> for entry in SyslogEntry.parse_stream(open('/var/log/archive.log')):
+            ...     if isinstance(entry, ParseFailure):
+            ...         continue
+        """
+        engine = _check_engine(engine)
+        if lazy and engine != ENGINE_SCANNER:
+            raise ValueError('lazy parsing requires the %r engine' % ENGINE_SCANNER)
+        # Resolve the parser once for the whole stream; the scanner parses
+        # the line in place, between the offsets of its first and last
+        # non-whitespace characters
+        if lazy:
+            parse = LazySyslogEntry.from_spans
+        elif engine == ENGINE_SCANNER:
+            from_fields = cls.from_fields
+            parse = lambda line, start, end: from_fields(scan(line, start, end))
+        else:
+            parse_results = cls.parse
+            parse_string = syslog_msg.parseString
+            parse = lambda line, start, end: parse_results(parse_string(line[start:end]))
+        whitespace = _WHITESPACE
+        offset = 0
+        lineno = 0
+        for line in lines:
+            lineno += 1
+            start = 0
+            end = len(line)
+            while end > start and line[end - 1] in whitespace:
+                end -= 1
+            while start < end and line[start] in whitespace:
+                start += 1
+            if start < end:
+                try:
+                    entry = parse(line, start, end)
+                except (ValueError, ParseException), e:
+                    entry = ParseFailure(lineno, offset, str(e), line)
+                yield entry
+            offset += len(line)
+
+def _decode_int(buf, start, end):
+    return int(buf[start:end])
+
+def _decode_timestamp(buf, start, end):
+    timestamp = parse_timestamp(str(buf[start:end]))
+    if timestamp is None:
+        # If no timestamp provided, fill in current UTC date and time
+        timestamp = datetime.utcnow()
+    return timestamp
+
+def _decode_field(buf, start, end):
+    return decode_field(buf[start:end])
+
+def _decode_structured_data(buf, start, end):
+    return StructuredData.from_elements(scan_structured_data(buf, start, end)[0])
+
+def _decode_msg(buf, start, end):
+    return decode_msg(buf[start:end])
+
+_decoders = {
+    'prival': _decode_int,
+    'version': _decode_int,
+    'timestamp': _decode_timestamp,
+    'hostname': _decode_field,
+    'app_name': _decode_field,
+    'procid': _decode_field,
+    'msgid': _decode_field,
+    'structured_data': _decode_structured_data,
+    'msg': _decode_msg,
+}
+
+class Projection(object):
+    """
+    Extracts only some fields of syslog messages, for routing and
+    pre-filtering. Scanning stops as soon as the wanted fields have been
+    found, and only these fields are decoded. When only HEADER fields are
+    wanted, the rest of the message is not validated.
+
+    Example:
+
+        >>> route = Projection(['prival', 'timestamp', 'app_name'])
+        >>> record = route.from_line(line)
+        >>> record.app_name
+        u'su'
+    """
+    def __init__(self, fields):
+        """
+        **arguments**
+            *fields*
+                Names of the fields to extract, out of `prival`, `version`,
+                `timestamp`, `hostname`, `app_name`, `procid`, `msgid`,
+                `structured_data` and `msg`.
+
+        **attributes**
+            *fields*
+                Names of the fields extracted, in the order given.
+
+            *record*
+                Namedtuple class of the records returned.
+        """
+        for name in fields:
+            if name not in FIELDS:
+                raise ValueError('unknown field: %r' % (name,))
+        self.fields = tuple(fields)
+        self.record = namedtuple('ProjectedEntry', self.fields)
+        self._decoders = [(FIELDS.index(name), _decoders[name])
+                          for name in self.fields]
+        # Number of HEADER fields to scan, None to scan the whole message
+        self._count = max([i for (i, _) in self._decoders] + [0]) + 1
+        if self._count > len(HEADER_FIELDS):
+            self._count = None
+
+    def from_buffer(self, buf, start=0, end=None):
+        """Returns a record of the wanted fields of the message held in
+        `buf[start:end]`. The message is not stripped.
+
+        Raises :class:`~loggerglue.scanner.ScanError` if the message is invalid.
+        """
+        if self._count is None:
+            spans = scan_spans(buf, start, end)
+        else:
+            spans = scan_header(buf, self._count, start, end)
+        values = []
+        for (i, decode) in self._decoders:
+            span = spans[i]
+            if span is None:
+                values.append(None)
+            else:
+                values.append(decode(buf, *span))
+        return self.record(*values)
+
+    def from_line(self, line):
+        """Returns a record of the wanted fields of a syslog `line`.
+
+        Raises :class:`~loggerglue.scanner.ScanError` if the line is invalid.
+        """
+        return self.from_buffer(line.strip())
+
+class _LazyField(object):
+    """
+    Decodes a field of a :class:`LazySyslogEntry` from its span on first
+    access. The value is then stored in the instance dictionary, where it
+    shadows this (non-data) descriptor, so later reads and assignments
+    are plain attribute accesses.
+    """
+    def __init__(self, name, index, decode):
+        self.name = name
+        self.index = index
+        self.decode = decode
+
+    def __get__(self, entry, owner):
+        if entry is None:
+            return self
+        span = entry._spans[self.index]
+        if span is None:
+            value = None
+        else:
+            value = self.decode(entry._buf, *span)
+        entry.__dict__[self.name] = value
+        return value
+
+class LazySyslogEntry(SyslogEntry):
+    """
+    A :class:`SyslogEntry` that keeps the buffer it was parsed from and the
+    offsets of its fields, and only decodes a field when it is first read.
+
+    :meth:`SyslogEntry.from_line` with `lazy=True` decodes the HEADER fields
+    immediately and defers STRUCTURED-DATA and MSG, so handlers that route or
+    drop messages on HEADER fields never pay for decoding them.
+    :meth:`SyslogEntry.from_buffer` defers every field.
+
+    The whole message is validated while parsing, but as decoding is
+    deferred, a MSG that cannot be decoded raises :exc:`UnicodeDecodeError`
+    when `msg` is read instead of failing the parse.
+    """
+    timestamp_as_float = False
+
+    prival = _LazyField('prival', 0, _decode_int)
+    version = _LazyField('version', 1, _decode_int)
+    timestamp = _LazyField('timestamp', 2, _decode_timestamp)
+    hostname = _LazyField('hostname', 3, _decode_field)
+    app_name = _LazyField('app_name', 4, _decode_field)
+    procid = _LazyField('procid', 5, _decode_field)
+    msgid = _LazyField('msgid', 6, _decode_field)
+    structured_data = _LazyField('structured_data', 7, _decode_structured_data)
+    msg = _LazyField('msg', 8, _decode_msg)
+
+    _header = ('prival', 'version', 'timestamp', 'hostname', 'app_name',
+               'procid', 'msgid')
+
+    def __init__(self, buf, spans):
+        """
+        **arguments**
+            *buf*
+                Buffer holding the message.
+
+            *spans*
+                Offsets of the fields in `buf`, as returned by
+                :func:`loggerglue.scanner.scan_spans`.
+        """
+        self._buf = buf
+        self._spans = spans
+
+    @classmethod
+    def from_spans(cls, buf, start=0, end=None, header=True):
+        """Returns a LazySyslogEntry object for the message held in `buf[start:end]`.
+
+        If `header` is true, the HEADER fields are decoded immediately,
+        otherwise every field is decoded on first access.
+        """
+        entry = cls(buf, scan_spans(buf, start, end))
+        if header:
+            for name in cls._header:
+                getattr(entry, name)
+        else:
+            # A missing TIMESTAMP is filled in with the time of parsing
+            ts_start, ts_end = entry._spans[2]
+            if ts_end - ts_start == 1:
+                getattr(entry, 'timestamp')
+        return entry
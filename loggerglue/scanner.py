@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+A single-pass scanner for the Syslog Protocol (RFC5424).
+
+This is the default parser engine behind :meth:`loggerglue.rfc5424.SyslogEntry.from_line`.
+It accepts the same messages as the pyparsing grammar in :mod:`loggerglue.rfc5424`,
+but walks the HEADER, the SD-ELEMENTs and the MSG exactly once instead of trying
+every alternative of every field.
+
+The scanner only splits a line into its raw (undecoded) fields; building
+:class:`~loggerglue.rfc5424.SyslogEntry` objects is left to :mod:`loggerglue.rfc5424`.
+Every function takes a buffer and the `pos`/`end` offsets of the message in it,
+so messages can be scanned in place in a `str`, `bytearray`, `buffer` or `mmap`
+holding many of them.
+
+Copyright © 2011 Evax Software <contact@evax.fr>
+"""
+import re
+
+# Support SYSLOG_SyslogProtocol23Format which can send an empty APP-NAME.
+# The pyparsing grammar is built from this flag too, see loggerglue.rfc5424.
+SUPPORT_MISSING_VALUES = True
+
+NILVALUE = '-'
+
+# Fields of a message, in order
+HEADER_FIELDS = ('prival', 'version', 'timestamp', 'hostname', 'app_name',
+                 'procid', 'msgid')
+FIELDS = HEADER_FIELDS + ('structured_data', 'msg')
+
+# PRINTUSASCII except '=', ']' and '"': the characters of HEADER fields,
+# SD-IDs and PARAM-NAMEs (SD-NAME in the RFC), as a regex character class
+NAME_CHARS = r'[!#-<>-\\^-~]'
+
+def _field(maxlen):
+    if not SUPPORT_MISSING_VALUES:
+        return r'(%s{1,%i})' % (NAME_CHARS, maxlen)
+    # As the pyparsing grammar, which skips spaces before a NILVALUE: a
+    # value may be missing, unless the next field is NILVALUE, which is then
+    # taken as the value.
+    return r'(?: +(?=-+ ))?(%s{1,%i}|(?! +-))' % (NAME_CHARS, maxlen)
+
+# Whitespace skipped before MSG, as the pyparsing grammar does
+msg_skip_re = re.compile(r'[ \t\r\n]*')
+
+# from the RFCs ABNF description
+timestamp = r'[0-9]{4}-(?:0[1-9]|1[0-2])-[0-9]{2}' \
+            r'T(?:[01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9](?:\.[0-9]{1,6})?' \
+            r'(?:Z|[+-](?:[01][0-9]|2[0-3]):[0-5][0-9])'
+# One piece per HEADER field, each with the separator that ends it
+_header = [r'<([0-9]{1,3})>', r'([1-9][0-9]{0,2}) ', r'(-|' + timestamp + ') ',
+           _field(255) + ' ', _field(48) + ' ', _field(128) + ' ', _field(32) + ' ']
+header_re = re.compile(''.join(_header))
+# header_prefix_res[n] matches the first n fields of the HEADER
+header_prefix_res = [None] + [re.compile(''.join(_header[:n]))
+                              for n in range(1, len(_header) + 1)]
+sd_name_re = re.compile(NAME_CHARS + '{1,32}')
+sd_param_re = re.compile(r' (%s{1,32})="((?:[^"\\]|\\.)*)"' % NAME_CHARS, re.DOTALL)
+unescape_re = re.compile(r'\\(["\\\]])')
+# STRUCTURED-DATA as a whole, to skip over it without building elements
+sd_re = re.compile(r'-|(?:\[%s{1,32}(?: %s{1,32}="(?:[^"\\]|\\.)*")*\])+'
+                   % (NAME_CHARS, NAME_CHARS), re.DOTALL)
+
+class ScanError(ValueError):
+    """
+    Raised when a line is not a valid RFC5424 message.
+
+    **attributes**
+        *reason*
+            Short description of what was expected.
+
+        *offset*
+            Offset into the scanned string at which scanning failed.
+    """
+    def __init__(self, reason, offset):
+        ValueError.__init__(self, '%s (at char %i)' % (reason, offset))
+        self.reason = reason
+        self.offset = offset
+
+def unescape_param_value(s):
+    '''
+    Unescape PARAM-VALUE, the reverse of
+    :func:`~loggerglue.util.escape_value.escape_param_value`.
+    '''
+    if '\\' in s:
+        return unescape_re.sub(r'\1', s)
+    return s
+
+def scan_structured_data(buf, pos=0, end=None):
+    """
+    Scan STRUCTURED-DATA starting at `pos`.
+
+    Returns a tuple `(elements, pos)` where `pos` is the offset just past the
+    STRUCTURED-DATA, and `elements` is None for NILVALUE or a list of
+    `(sd_id, [(param_name, param_value), ...])` tuples. Parameter values
+    are unescaped, but not decoded.
+    """
+    if end is None:
+        end = len(buf)
+    if pos < end and buf[pos:pos + 1] == NILVALUE:
+        return None, pos + 1
+    elements = []
+    while pos < end and buf[pos:pos + 1] == '[':
+        m = sd_name_re.match(buf, pos + 1, end)
+        if m is None:
+            raise ScanError('expected SD-ID', pos + 1)
+        sd_id = m.group()
+        pos = m.end()
+        params = []
+        m = sd_param_re.match(buf, pos, end)
+        while m is not None:
+            name, value = m.groups()
+            params.append((name, unescape_param_value(value)))
+            pos = m.end()
+            m = sd_param_re.match(buf, pos, end)
+        if pos == end or buf[pos:pos + 1] != ']':
+            raise ScanError('expected SD-PARAM or "]"', pos)
+        pos += 1
+        elements.append((sd_id, params))
+    if not elements:
+        raise ScanError('expected STRUCTURED-DATA', pos)
+    return elements, pos
+
+def _msg_start(buf, pos, end):
+    """Offset of the MSG following STRUCTURED-DATA ending at `pos`, or None"""
+    if pos == end:
+        return None
+    elif buf[pos:pos + 1] == ' ':
+        return msg_skip_re.match(buf, pos + 1, end).end()
+    raise ScanError('expected SP or end of message', pos)
+
+def scan(buf, pos=0, end=None):
+    """
+    Scan a complete syslog message held in `buf[pos:end]`.
+
+    Returns a tuple of raw fields
+    `(prival, version, timestamp, hostname, app_name, procid, msgid, structured_data, msg)`.
+    Header fields are strings exactly as they appear in the message (NILVALUE included,
+    and an empty string for missing values), `structured_data` is as returned by
+    :func:`scan_structured_data` and `msg` is None if the message has no MSG part.
+
+    Raises :class:`ScanError` if the message is invalid.
+    """
+    if end is None:
+        end = len(buf)
+    m = header_re.match(buf, pos, end)
+    if m is None:
+        raise ScanError('expected HEADER', pos)
+    structured_data, pos = scan_structured_data(buf, m.end(), end)
+    pos = _msg_start(buf, pos, end)
+    if pos is None:
+        msg = None
+    else:
+        msg = buf[pos:end]
+    return m.groups() + (structured_data, msg)
+
+def scan_spans(buf, pos=0, end=None):
+    """
+    Locate the fields of the message held in `buf[pos:end]` without
+    building or copying any of them.
+
+    Returns a tuple with the `(start, end)` offsets in `buf` of the fields
+    `(prival, version, timestamp, hostname, app_name, procid, msgid, structured_data, msg)`;
+    the last one is None if the message has no MSG part. The whole message
+    is validated, but no SD-ELEMENTs are built.
+
+    Raises :class:`ScanError` if the message is invalid.
+    """
+    if end is None:
+        end = len(buf)
+    m = header_re.match(buf, pos, end)
+    if m is None:
+        raise ScanError('expected HEADER', pos)
+    sd_start = m.end()
+    sd = sd_re.match(buf, sd_start, end)
+    if sd is None:
+        raise ScanError('expected STRUCTURED-DATA', sd_start)
+    sd_end = sd.end()
+    pos = _msg_start(buf, sd_end, end)
+    if pos is None:
+        msg_span = None
+    else:
+        msg_span = (pos, end)
+    return m.regs[1:] + ((sd_start, sd_end), msg_span)
+
+def scan_header(buf, count, pos=0, end=None):
+    """
+    Scan only the first `count` HEADER fields of the message held in
+    `buf[pos:end]`, and stop there: the rest of the message is neither
+    scanned nor validated.
+
+    Returns a tuple with the `(start, end)` offsets in `buf` of these
+    fields, see :func:`scan_spans`.
+
+    Raises :class:`ScanError` if these fields are invalid.
+    """
+    if end is None:
+        end = len(buf)
+    m = header_prefix_res[count].match(buf, pos, end)
+    if m is None:
+        raise ScanError('expected HEADER', pos)
+    return m.regs[1:]
@@ -3,59 +3,88 @@
 An rfc5424/rfc5425 syslog server implementation
 Copyright © 2011 Evax Software <contact@evax.fr>
 """
+import errno
+import os
+import Queue
+import socket
 import ssl
 import SocketServer
+import stat
+import threading
 from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.util.frame_decoder import OctetFrameDecoder, FrameError
+from loggerglue.util.mmsg import MmsgReceiver, HAVE_RECVMMSG
+from loggerglue.util.ssl_context import make_ssl_context
 
 class SyslogHandler(SocketServer.BaseRequestHandler):
     """
     Handler for syslog connections. An instance of this class is created for each incoming connection.
+    With the datagram servers, an instance is created for each batch of
+    datagrams read at once, and `request` is the list of datagrams.
 
     Subclasses must implement `handle_entry` and may implement `handle_error`.
+
+    **attributes**
+        *max_frame_size*
+            Largest octet-counted frame accepted over TLS; a connection
+            announcing a longer one is closed after calling `handle_error`.
+
+        *read_size*
+            Number of bytes read from a TLS connection at once.
     """
+    max_frame_size = 65536
+    read_size = 65536
+
     def setup(self):
-        if not self.server.use_tls:
+        if not self.server.use_tls and not self.server.datagram:
             self.connection = self.request.makefile()
 
     def finish(self):
-        if not self.server.use_tls:
+        if not self.server.use_tls and not self.server.datagram:
             self.connection.close()
 
     def handle(self):
+        if self.server.datagram:
+            return self.handle_datagrams()
         if self.server.use_tls:
             return self.handle_tls()
         while True:
             line = self.connection.readline()
             if not line:
                 break
-            syslog_entry = SyslogEntry.from_line(line)
-            if syslog_entry:
-                self.handle_entry(syslog_entry)
-            else:
-                self.handle_error(line)
+            self._dispatch(line)
 
     def handle_tls(self):
-        buf = ''
+        decoder = OctetFrameDecoder(self.max_frame_size)
         while True:
-            r = self.request.recv(1)
-            if not r:
+            data = self.request.recv(self.read_size)
+            if not data:
                 break # EOF
-            if r != ' ':
-                buf += r
-            else:
-                try:
-                    msg_len = int(buf)
-                except:
-                    # Protocol error
-                    return
-                buf = ''
-                for i in xrange(msg_len):
-                    buf += self.request.recv(1)
-                syslog_entry = SyslogEntry.from_line(buf)
-                buf = ''
-                if syslog_entry is None:
-                    self.handle_error(buf)
-                self.handle_entry(syslog_entry)
+            try:
+                frames = decoder.feed(data)
+            except FrameError:
+                # Protocol error
+                self.handle_error(data)
+                return
+            for frame in frames:
+                self._dispatch(frame)
+
+    def handle_datagrams(self):
+        for data in self.request:
+            # trailing LF or NUL left by some senders
+            data = data.rstrip('\n\000')
+            if not data:
+                continue
+            self._dispatch(data)
+
+    def _dispatch(self, data):
+        """Parse a message and pass it to `handle_entry`, or to `handle_error`"""
+        try:
+            syslog_entry = SyslogEntry.from_line(data, consume_error=False)
+        except Exception:
+            self.handle_error(data)
+        else:
+            self.handle_entry(syslog_entry)
 
     def handle_entry(self, syslog_entry):
         """Handle an incoming syslog entry. Subclasses must implement this.
@@ -69,17 +98,63 @@ class SyslogHandler(SocketServer.BaseRequestHandler):
         """
         pass
 
-class SyslogServer(SocketServer.TCPServer, SocketServer.ThreadingMixIn):
+# Concurrency modes of SyslogServer
+CONCURRENCY_SERIAL = 'serial'
+CONCURRENCY_THREAD = 'thread'
+CONCURRENCY_POOL = 'pool'
+CONCURRENCIES = (CONCURRENCY_SERIAL, CONCURRENCY_THREAD, CONCURRENCY_POOL)
+
+class SyslogServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
     """
     TCP Syslog server based on SocketServer.
+
+    How connections are handled depends on `concurrency`:
+
+    `CONCURRENCY_SERIAL`
+        One connection at a time, in the thread running the server. Other
+        senders wait, in the listen backlog, until it closes: at most 1
+        connection is handled, plus `request_queue_size` waiting.
+
+    `CONCURRENCY_THREAD`
+        A new (daemon) thread for each connection. The number of connections
+        is only bounded by the threads and file descriptors the process may
+        have.
+
+    `CONCURRENCY_POOL`
+        A fixed pool of `max_workers` threads, each handling one connection
+        at a time. Up to `backlog` more accepted connections wait for a free
+        worker; beyond that, new connections are closed at once and counted
+        in `rejected`. At most `max_workers` connections are handled, plus
+        `backlog` waiting.
+
+    With TLS, the SSL context is built once, when the server is created,
+    and the handshake runs in the thread handling the connection rather
+    than in the one accepting connections, so that a slow client does not
+    hold up the others. A handshake taking more than `handshake_timeout`
+    seconds is abandoned.
+
+    **attributes**
+        *rejected*
+            Number of connections closed because the pool and its backlog
+            were full.
+
+        *handshake_failures*
+            Number of TLS connections closed because the handshake failed or
+            timed out.
+
+        *ssl_context*
+            The :class:`ssl.SSLContext` of the server, None without TLS.
     """
     allow_reuse_address = True
+    daemon_threads = True
+    datagram = False
 
     _allowed_ssl_args = ('keyfile', 'certfile', 'cert_reqs', 'ssl_version',
-                         'ca_certs', 'suppress_ragged_eofs')
+                         'ca_certs', 'ciphers', 'suppress_ragged_eofs')
 
     def __init__(self, server_address, RequestHandlerClass,
-                 bind_and_activate=True,
+                 bind_and_activate=True, concurrency=CONCURRENCY_SERIAL,
+                 max_workers=16, backlog=64, handshake_timeout=10.0,
                  **ssl_args):
         """
         **arguments**
@@ -93,25 +168,259 @@ class SyslogServer(SocketServer.TCPServer, SocketServer.ThreadingMixIn):
             *bind_and_activate*
                 Automatically  call server_bind and server_activate.
 
-            *keyfile*, *certfile*, *server_side*, *cert_reqs*, *ssl_version*, *ca_certs*, *ciphers*
-                Arguments to pass through to :func:`ssl.wrap_socket`. Providing any of these arguments
+            *concurrency*
+                One of `CONCURRENCY_SERIAL` (the default), `CONCURRENCY_THREAD`
+                and `CONCURRENCY_POOL`, see above.
+
+            *max_workers*, *backlog*
+                Number of worker threads, and of accepted connections waiting
+                for one, with `CONCURRENCY_POOL`.
+
+            *handshake_timeout*
+                Seconds allowed for a TLS handshake, None to wait forever.
+
+            *keyfile*, *certfile*, *cert_reqs*, *ssl_version*, *ca_certs*, *ciphers*, *suppress_ragged_eofs*
+                As for :func:`ssl.wrap_socket`. Providing any of these arguments
                 enables TLS.
         """
+        if concurrency not in CONCURRENCIES:
+            raise ValueError('unknown concurrency: %r' % (concurrency,))
+        if concurrency == CONCURRENCY_POOL and (max_workers < 1 or backlog < 1):
+            raise ValueError('max_workers and backlog must be at least 1')
         self.use_tls = False
+        self.ssl_context = None
         if ssl_args:
             for arg in ssl_args:
                 if arg not in self._allowed_ssl_args:
                     raise TypeError('unexpected keyword argument: %s' %arg)
             self.ssl_args = ssl_args
+            self.ssl_context = make_ssl_context(server_side=True, **ssl_args)
             self.use_tls = True
+        self.handshake_timeout = handshake_timeout
+        self.handshake_failures = 0
+        self.concurrency = concurrency
+        self.max_workers = max_workers
+        self.backlog = backlog
+        self.rejected = 0
+        self._workers = []
         SocketServer.TCPServer.__init__(self, server_address,
                                         RequestHandlerClass,
                                         bind_and_activate)
+        if concurrency == CONCURRENCY_POOL:
+            self._requests = Queue.Queue(backlog)
+            for i in xrange(max_workers):
+                worker = threading.Thread(target=self._work,
+                                          name='SyslogServer worker %i' % i)
+                worker.setDaemon(True)
+                worker.start()
+                self._workers.append(worker)
 
     def get_request(self):
         conn, addr = self.socket.accept()
         if self.use_tls:
-            conn = ssl.wrap_socket(conn, server_side=True,
-                                   **self.ssl_args)
+            # the handshake is left to finish_request
+            conn = self.ssl_context.wrap_socket(
+                conn, server_side=True, do_handshake_on_connect=False,
+                suppress_ragged_eofs=self.ssl_args.get('suppress_ragged_eofs', True))
         return (conn, addr)
 
+    def finish_request(self, request, client_address):
+        if self.use_tls:
+            request.settimeout(self.handshake_timeout)
+            try:
+                request.do_handshake()
+            except (ssl.SSLError, socket.error):
+                self.handshake_failures += 1
+                return
+            request.settimeout(None)
+        SocketServer.TCPServer.finish_request(self, request, client_address)
+
+    def process_request(self, request, client_address):
+        if self.concurrency == CONCURRENCY_THREAD:
+            SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+        elif self.concurrency == CONCURRENCY_POOL:
+            try:
+                self._requests.put_nowait((request, client_address))
+            except Queue.Full:
+                self.rejected += 1
+                self.shutdown_request(request)
+        else:
+            SocketServer.TCPServer.process_request(self, request, client_address)
+
+    def _work(self):
+        """Pool worker: handle queued connections until server_close"""
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            self.process_request_thread(*item)
+
+    def server_close(self):
+        """
+        Close the listening socket, and stop the pool workers once they are
+        done with their current connection. Connections still waiting in the
+        backlog are closed.
+        """
+        SocketServer.TCPServer.server_close(self)
+        if self.concurrency == CONCURRENCY_POOL:
+            while True:
+                try:
+                    request, client_address = self._requests.get_nowait()
+                except Queue.Empty:
+                    break
+                self.shutdown_request(request)
+            for worker in self._workers:
+                self._requests.put(None)
+
+class UDPSyslogServer(SocketServer.UDPServer):
+    """
+    UDP Syslog server based on SocketServer.
+
+    Each time the socket is readable, all the datagrams waiting (up to
+    `batch_size`) are read at once, with a single `recvmmsg` system call
+    where available, and handed to one handler instance: a
+    :class:`SyslogHandler` subclass works with both this server and
+    :class:`SyslogServer`. Datagrams are handled in the thread running the
+    server.
+
+    **attributes**
+        *received*
+            Number of datagrams read.
+
+        *truncated*
+            Number of datagrams longer than `max_size`, passed on truncated.
+    """
+    datagram = True
+    use_tls = False
+
+    def __init__(self, server_address, RequestHandlerClass,
+                 bind_and_activate=True, rcvbuf=None, batch_size=64,
+                 max_size=65536):
+        """
+        **arguments**
+            *server_address*
+                Address to bind to, as a tuple `(host,port)`. Example: `('127.0.0.1',1234)`.
+
+            *RequestHandlerClass*
+                Class to instantiate for each batch of datagrams. Pass a
+                subclass of :class:`~loggerglue.server.SyslogHandler`.
+
+            *bind_and_activate*
+                Automatically  call server_bind and server_activate.
+
+            *rcvbuf*
+                `SO_RCVBUF` of the socket, in bytes: how much the kernel queues
+                while the server is busy, before dropping datagrams. The system
+                default if None.
+
+            *batch_size*
+                Maximum number of datagrams read at once.
+
+            *max_size*
+                Longest datagram read in full.
+        """
+        self.rcvbuf = rcvbuf
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.received = 0
+        self.truncated = 0
+        if HAVE_RECVMMSG:
+            self._receiver = MmsgReceiver(batch_size, max_size)
+        else:
+            self._receiver = None
+            self._buffer = bytearray(max_size)
+        SocketServer.UDPServer.__init__(self, server_address,
+                                        RequestHandlerClass,
+                                        bind_and_activate)
+
+    def server_bind(self):
+        if self.rcvbuf is not None:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        SocketServer.UDPServer.server_bind(self)
+
+    def get_request(self):
+        if self._receiver is not None:
+            datagrams, truncated = self._receiver.recv(self.socket)
+        else:
+            datagrams, truncated = self._recv_into()
+        self.received += len(datagrams)
+        self.truncated += truncated
+        return (datagrams, None)
+
+    def _recv_into(self):
+        """Read the waiting datagrams one by one into the reusable buffer"""
+        buf = self._buffer
+        view = memoryview(buf)
+        size = len(buf)
+        recv_into = self.socket.recv_into
+        datagrams = []
+        truncated = 0
+        while len(datagrams) < self.batch_size:
+            try:
+                # with MSG_TRUNC, the full length of the datagram is returned
+                n = recv_into(buf, size, socket.MSG_DONTWAIT | socket.MSG_TRUNC)
+            except socket.error, e:
+                if datagrams and e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if n > size:
+                truncated += 1
+                n = size
+            datagrams.append(view[:n].tobytes())
+        return datagrams, truncated
+
+    def kernel_drops(self):
+        """
+        Number of datagrams the kernel dropped because the receive buffer
+        of the socket was full, or None if it is unknown. Only available on
+        Linux, from /proc/net/udp and /proc/net/udp6.
+        """
+        inode = str(os.fstat(self.socket.fileno()).st_ino)
+        for path in ('/proc/net/udp', '/proc/net/udp6'):
+            try:
+                f = open(path)
+            except IOError:
+                continue
+            try:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 12 and fields[9] == inode:
+                        return int(fields[12])
+            finally:
+                f.close()
+        return None
+
+    def stats(self):
+        """Returns a dict with the counters and the kernel drops"""
+        return {'received': self.received, 'truncated': self.truncated,
+                'kernel_drops': self.kernel_drops()}
+
+class UNIXSyslogServer(UDPSyslogServer):
+    """
+    Syslog server for datagrams on a UNIX socket, such as '/dev/log', see
+    :class:`UDPSyslogServer`. A stale socket file is replaced, and the
+    socket file is removed by `server_close`.
+    """
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        try:
+            if stat.S_ISSOCK(os.stat(self.server_address).st_mode):
+                os.unlink(self.server_address)
+        except OSError:
+            pass
+        UDPSyslogServer.server_bind(self)
+
+    def server_close(self):
+        UDPSyslogServer.server_close(self)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+    def kernel_drops(self):
+        """
+        Always None: a full UNIX datagram socket makes senders wait (or fail
+        with EAGAIN) rather than the kernel dropping datagrams.
+        """
+        return None
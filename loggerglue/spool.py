@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+A disk-backed spool in front of any emitter.
+
+:class:`SpoolSyslogEmitter` writes each message to a ring of memory-mapped
+segment files, and a background thread sends them on to another emitter,
+recording how far it got in a checkpoint file. While the receiver is down,
+messages pile up on disk (up to a configurable size) instead of in memory
+or being lost, and a restarted process resumes sending where the previous
+one stopped.
+
+Layout of the spool directory:
+
+- segment files named after their sequence number, `0000000001.seg`, each
+  `segment_size` bytes long. A segment holds records made of a 4-byte
+  little-endian length, plus one, followed by the encoded message; a zero
+  length marks the end of what has been written, so empty messages are
+  stored with a length of 1. Segments are created zero-filled and never
+  reused, so a record is complete as soon as its length is set.
+- `checkpoint`, the sequence number of the segment being sent and the
+  offset in it of the next record to send. It is synced to disk each time
+  it is written; segments are left to the system to write back, so spooled
+  messages survive the process stopping, but not necessarily a power loss.
+
+Copyright © 2011 Evax Software <contact@evax.fr>
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+
+from loggerglue.emitter import SyslogEmitter
+
+_length = struct.Struct('<I')
+_checkpoint = struct.Struct('<QI')
+
+CHECKPOINT = 'checkpoint'
+SEGMENT_SUFFIX = '.seg'
+
+class _Segment(object):
+    """A memory-mapped segment file"""
+    def __init__(self, path, seq, size):
+        self.path = path
+        self.seq = seq
+        f = open(path, 'a+b')
+        try:
+            if os.fstat(f.fileno()).st_size < size:
+                f.truncate(size)
+            self.map = mmap.mmap(f.fileno(), size)
+        finally:
+            f.close()
+        self.size = size
+
+    def record(self, offset):
+        """Returns the record at `offset`, or None if there is none (yet)"""
+        if offset + _length.size > self.size:
+            return None
+        (n,) = _length.unpack_from(self.map, offset)
+        if n == 0:
+            return None
+        start = offset + _length.size
+        return self.map[start:start + n - 1]
+
+    def end(self, offset=0):
+        """Offset just past the last record, starting from the one at `offset`"""
+        count = 0
+        while True:
+            record = self.record(offset)
+            if record is None:
+                return offset, count
+            offset += _length.size + len(record)
+            count += 1
+
+    def close(self):
+        self.map.close()
+
+    def remove(self):
+        self.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+class SpoolSyslogEmitter(SyslogEmitter):
+    """
+    Syslog emitter that spools messages on disk, and sends them through
+    another emitter from a background thread.
+
+    :meth:`emit` serializes the message and copies it into the mapped segment,
+    it never waits for the receiver. Messages are sent at least once: if the
+    process stops after a batch was sent but before the checkpoint was
+    written, that batch is sent again on restart.
+
+    Example:
+
+        >>> emitter = SpoolSyslogEmitter('/var/spool/myapp',
+        ...                              TCPSyslogEmitter(('logs.example.com', 514)))
+    """
+    def __init__(self, path, emitter, segment_size=4 * 1024 * 1024,
+                 max_size=256 * 1024 * 1024, batch_size=256, retry_interval=1.0):
+        """
+        **Arguments**
+            *path*
+                Spool directory, created if needed. Only one emitter may use
+                a directory at a time.
+
+            *emitter*
+                Emitter to send messages through. It receives the encoded
+                messages as strings, see :meth:`SyslogEmitter.emit_batch`.
+
+            *segment_size*
+                Size in bytes of each segment file. Messages longer than
+                that are dropped.
+
+            *max_size*
+                Maximum disk space used by the segments, in bytes. When it is
+                reached, the oldest segment is dropped, unsent messages included.
+
+            *batch_size*
+                Maximum number of messages handed to `emitter` at once.
+
+            *retry_interval*
+                Seconds to wait before sending again when `emitter` fails.
+
+        **Attributes**
+            *enqueued*, *sent*
+                Number of messages spooled, and sent, since the emitter was
+                created.
+
+            *dropped*
+                Number of messages dropped because they did not fit in a
+                segment or because the spool was full.
+
+            *failures*
+                Number of batches that `emitter` failed to send (and that are
+                retried).
+        """
+        self.path = path
+        self.emitter = emitter
+        self.segment_size = segment_size
+        self.max_segments = max(2, max_size // segment_size)
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._closed = threading.Event()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._open()
+        self._thread = threading.Thread(target=self._run, name='SpoolSyslogEmitter')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, '%010d%s' % (seq, SEGMENT_SUFFIX))
+
+    def _open(self):
+        """Map the existing segments and resume from the checkpoint"""
+        seqs = sorted([int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.path)
+                       if name.endswith(SEGMENT_SUFFIX)])
+        try:
+            f = open(os.path.join(self.path, CHECKPOINT), 'rb')
+            try:
+                seq, offset = _checkpoint.unpack(f.read(_checkpoint.size))
+            finally:
+                f.close()
+        except (IOError, struct.error):
+            seq, offset = 0, 0
+        # segments before the checkpoint have been sent
+        for s in seqs:
+            if s < seq:
+                os.unlink(self._segment_path(s))
+        seqs = [s for s in seqs if s >= seq]
+        if not seqs or seqs[0] != seq:
+            offset = 0
+        if not seqs:
+            seqs = [max(seq, 1)]
+        self._segments = [_Segment(self._segment_path(s), s, self.segment_size)
+                          for s in seqs]
+        self._read_offset = offset
+        self._write_offset = self._segments[-1].end()[0]
+        self._pending = 0
+        for segment in self._segments:
+            self._pending += segment.end(offset)[1]
+            offset = 0
+
+    def _add_segment(self):
+        """Start writing a new segment; called with the lock held"""
+        if len(self._segments) >= self.max_segments:
+            # the spool is full: drop the oldest segment
+            oldest = self._segments.pop(0)
+            count = oldest.end(self._read_offset)[1]
+            self.dropped += count
+            self._pending -= count
+            oldest.remove()
+            self._read_offset = 0
+        seq = self._segments[-1].seq + 1
+        self._segments.append(_Segment(self._segment_path(seq), seq, self.segment_size))
+        self._write_offset = 0
+
+    def emit(self, msg):
+        """
+        Spool a record.
+        """
+        data = str(msg)
+        size = _length.size + len(data)
+        self._lock.acquire()
+        try:
+            if size > self.segment_size or self._closed.isSet():
+                self.dropped += 1
+                return
+            if self._write_offset + size > self.segment_size:
+                self._add_segment()
+            segment = self._segments[-1]
+            offset = self._write_offset
+            start = offset + _length.size
+            segment.map[start:start + len(data)] = data
+            # setting the length commits the record
+            segment.map[offset:start] = _length.pack(len(data) + 1)
+            self._write_offset = start + len(data)
+            self.enqueued += 1
+            self._pending += 1
+            self._written.notify()
+        finally:
+            self._lock.release()
+
+    def _read_batch(self):
+        """
+        The next records to send, with the segment and offset following
+        them; called with the lock held.
+        """
+        segment = self._segments[0]
+        offset = self._read_offset
+        batch = []
+        while len(batch) < self.batch_size:
+            record = segment.record(offset)
+            if record is None:
+                break
+            batch.append(record)
+            offset += _length.size + len(record)
+        return batch, segment, offset
+
+    def _save_checkpoint(self):
+        tmp = os.path.join(self.path, CHECKPOINT + '.tmp')
+        f = open(tmp, 'wb')
+        try:
+            f.write(_checkpoint.pack(self._segments[0].seq, self._read_offset))
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        os.rename(tmp, os.path.join(self.path, CHECKPOINT))
+
+    def _run(self):
+        """Background thread: send the spooled records"""
+        while not self._closed.isSet():
+            self._lock.acquire()
+            try:
+                batch, segment, offset = self._read_batch()
+                if not batch:
+                    if len(self._segments) > 1:
+                        # the writer has moved on, this segment is done
+                        self._segments.pop(0).remove()
+                        self._read_offset = 0
+                        self._save_checkpoint()
+                    else:
+                        self._written.wait(0.5)
+                    continue
+            finally:
+                self._lock.release()
+            try:
+                self.emitter.emit_batch(batch)
+            except Exception:
+                self.failures += 1
+                self._closed.wait(self.retry_interval)
+                continue
+            self._lock.acquire()
+            try:
+                if self._segments[0] is segment:
+                    self._read_offset = offset
+                    self._save_checkpoint()
+                    self._pending -= len(batch)
+                else:
+                    # the segment was dropped while sending, batch included
+                    self.dropped -= len(batch)
+                self.sent += len(batch)
+                self._written.notifyAll()
+            finally:
+                self._lock.release()
+
+    def pending(self):
+        """Number of spooled messages not sent yet"""
+        return self._pending
+
+    def flush(self, timeout=None):
+        """
+        Wait until every spooled message has been sent, at most `timeout`
+        seconds if given. Returns False if the timeout expired first.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while self.pending():
+            if timeout is not None and time.time() >= deadline:
+                return False
+            self._lock.acquire()
+            try:
+                self._written.wait(0.05)
+            finally:
+                self._lock.release()
+        return True
+
+    def close(self, timeout=5.0):
+        """
+        Wait at most `timeout` seconds for spooled messages to be sent (not
+        at all if None), then stop sending and close the wrapped emitter.
+        Messages left in the spool are sent when it is opened again, so
+        closing does not wait for a receiver that is down.
+        """
+        if timeout is not None:
+            self.flush(timeout)
+        self._closed.set()
+        self._lock.acquire()
+        try:
+            self._written.notifyAll()
+        finally:
+            self._lock.release()
+        self._thread.join()
+        for segment in self._segments:
+            segment.close()
+        self.emitter.close()
+
+    def stats(self):
+        """Returns a dict with the counters and the number of pending messages"""
+        return {'enqueued': self.enqueued, 'sent': self.sent,
+                'dropped': self.dropped, 'failures': self.failures,
+                'pending': self.pending()}
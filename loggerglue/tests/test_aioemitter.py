@@ -0,0 +1,191 @@
+import errno
+import os
+import shutil
+import ssl
+import socket
+import tempfile
+import unittest
+
+from loggerglue.constants import LOG_INFO
+from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.tests.test_server import key_data, cert_data
+from loggerglue.util.ssl_context import make_ssl_context
+
+try:
+    import trollius as asyncio
+    from trollius import From
+    from loggerglue.aioemitter import *
+except ImportError:
+    asyncio = None
+
+def entries(count):
+    return [SyslogEntry(prival=LOG_INFO, hostname='host', app_name='app',
+                        msg='message %i' % i) for i in range(count)]
+
+class FlakySocket(object):
+    """A datagram socket that fails once, when sending datagram `fail_at`"""
+    def __init__(self, fail_at):
+        self.fail_at = fail_at
+        self.datagrams = []
+
+    def send(self, data):
+        if len(self.datagrams) == self.fail_at:
+            self.fail_at = None
+            raise socket.error(errno.ECONNREFUSED, 'Connection refused')
+        self.datagrams.append(data)
+
+    def close(self):
+        pass
+
+if asyncio is not None:
+    class FlakyEmitter(AsyncSyslogEmitter):
+        def __init__(self, sock, **kwargs):
+            AsyncSyslogEmitter.__init__(self, **kwargs)
+            self.sock = sock
+
+        @asyncio.coroutine
+        def _connect(self):
+            self._socket = self.sock
+
+@unittest.skipIf(asyncio is None, 'requires trollius')
+class TestAsyncEmitters(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(None)
+        self.lines = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_until(self, coro, timeout=5):
+        return self.loop.run_until_complete(
+            asyncio.wait_for(coro, timeout, loop=self.loop))
+
+    @asyncio.coroutine
+    def handle_lines(self, reader, writer):
+        while True:
+            line = yield From(reader.readline())
+            if not line:
+                break
+            self.lines.append(line.rstrip('\n'))
+
+    def start_server(self, port=0, ssl=None):
+        server = self.run_until(asyncio.start_server(
+            self.handle_lines, '127.0.0.1', port, ssl=ssl, loop=self.loop))
+        return server, server.sockets[0].getsockname()
+
+    def wait_lines(self, count):
+        for i in range(100):
+            if len(self.lines) == count:
+                break
+            self.run_until(asyncio.sleep(0.01, loop=self.loop))
+
+    def test_tcp(self):
+        server, address = self.start_server()
+        emitter = AsyncTCPSyslogEmitter(address, octet_based_framing=False,
+                                        loop=self.loop)
+        for e in entries(1000):
+            emitter.emit(e)
+        self.run_until(emitter.drain())
+        self.assertEqual(1000, emitter.sent)
+        emitter.close()
+        server.close()
+        self.run_until(server.wait_closed())
+        self.wait_lines(1000)
+        self.assertEqual([str(e) for e in entries(1000)], self.lines)
+
+    def test_tls(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        keyfile = os.path.join(tmp, 'keyfile')
+        certfile = os.path.join(tmp, 'certfile')
+        for (path, data) in ((keyfile, key_data), (certfile, cert_data)):
+            with open(path, 'w') as f:
+                f.write(data)
+        server, address = self.start_server(ssl=make_ssl_context(
+            server_side=True, keyfile=keyfile, certfile=certfile))
+        emitter = AsyncTCPSyslogEmitter(address, octet_based_framing=False,
+                                        loop=self.loop, cert_reqs=ssl.CERT_REQUIRED,
+                                        ca_certs=certfile)
+        for e in entries(100):
+            emitter.emit(e)
+        self.run_until(emitter.drain())
+        self.assertEqual((100, 0), (emitter.sent, emitter.failures))
+        self.wait_lines(100)
+        emitter.close()
+        server.close()
+        self.run_until(server.wait_closed())
+        self.assertEqual([str(e) for e in entries(100)], self.lines)
+
+    def test_reconnect(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        address = sock.getsockname()
+        sock.close()
+        emitter = AsyncTCPSyslogEmitter(address, octet_based_framing=False,
+                                        loop=self.loop, min_backoff=0.01)
+        emitter.emit('before')
+        self.run_until(asyncio.sleep(0.05, loop=self.loop))
+        self.assertTrue(emitter.failures > 0)
+        server, address = self.start_server(address[1])
+        emitter.emit('after')
+        self.run_until(emitter.drain())
+        self.run_until(asyncio.sleep(0.05, loop=self.loop))
+        self.assertEqual(['before', 'after'], self.lines)
+        emitter.close()
+        server.close()
+
+    def test_max_pending(self):
+        emitter = AsyncTCPSyslogEmitter(('127.0.0.1', 9), loop=self.loop,
+                                        max_pending=2)
+        for i in range(5):
+            emitter.emit(str(i))
+        self.assertEqual(3, emitter.dropped)
+        emitter.close()
+        self.assertEqual(5, emitter.dropped)
+        self.run_until(emitter.drain())
+
+    def test_udp(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(5)
+        emitter = AsyncUDPSyslogEmitter(receiver.getsockname(), loop=self.loop)
+        for e in entries(10):
+            emitter.emit(e)
+        self.run_until(emitter.drain())
+        self.assertEqual([str(e) for e in entries(10)],
+                         [receiver.recv(65536) for i in range(10)])
+        emitter.close()
+        receiver.close()
+
+    def test_datagram_retry(self):
+        # the datagrams sent before the failure are not sent again
+        sock = FlakySocket(fail_at=2)
+        emitter = FlakyEmitter(sock, loop=self.loop, min_backoff=0.01)
+        for i in range(5):
+            emitter.emit(str(i))
+        self.run_until(emitter.drain())
+        self.assertEqual(['0', '1', '2', '3', '4'], sock.datagrams)
+        self.assertEqual((5, 1), (emitter.sent, emitter.failures))
+        emitter.close()
+
+    def test_unix(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'log')
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            receiver.settimeout(5)
+            emitter = AsyncUNIXSyslogEmitter(path, loop=self.loop)
+            emitter.emit('one')
+            emitter.emit('two')
+            self.run_until(emitter.drain())
+            self.assertEqual(['one\000', 'two\000'],
+                             [receiver.recv(65536) for i in range(2)])
+            emitter.close()
+            receiver.close()
+        finally:
+            shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    unittest.main()
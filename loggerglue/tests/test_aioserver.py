@@ -0,0 +1,192 @@
+import os
+import resource
+import shutil
+import socket
+import tempfile
+import unittest
+
+from loggerglue.constants import LOG_INFO
+from loggerglue.emitter import UDPSyslogEmitter, UNIXSyslogEmitter
+from loggerglue.rfc5424 import SyslogEntry, FRAMING_OCTET
+from loggerglue.tests.test_server import key_data, cert_data
+
+try:
+    import trollius as asyncio
+    from trollius import From
+    from loggerglue.aioemitter import AsyncTCPSyslogEmitter
+    from loggerglue.aioserver import *
+except ImportError:
+    asyncio = None
+
+CONNECTIONS = 5000
+
+def entries(count):
+    return [SyslogEntry(prival=LOG_INFO, hostname='host', app_name='app',
+                        msg='message %i' % i) for i in range(count)]
+
+if asyncio is not None:
+    class ListHandler(AsyncSyslogHandler):
+        def handle_entry(self, syslog_entry):
+            self.server.received.append(syslog_entry.msg)
+
+        def handle_error(self, data):
+            self.server.invalid.append(data)
+
+    class CoroutineHandler(ListHandler):
+        @asyncio.coroutine
+        def handle_entry(self, syslog_entry):
+            yield From(asyncio.sleep(0, loop=self.server.loop))
+            self.server.received.append(syslog_entry.msg)
+
+    class RaisingHandler(ListHandler):
+        def handle_entry(self, syslog_entry):
+            if syslog_entry.msg == 'message 0':
+                raise ValueError(syslog_entry.msg)
+            ListHandler.handle_entry(self, syslog_entry)
+
+    @asyncio.coroutine
+    def wait_for(loop, predicate):
+        while not predicate():
+            yield From(asyncio.sleep(0.01, loop=loop))
+
+@unittest.skipIf(asyncio is None, 'requires trollius')
+class TestAsyncSyslogServer(unittest.TestCase):
+    def setUp(self):
+        # cleanups run last in, first out: close the servers before the loop
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(None)
+        self.addCleanup(self.loop.close)
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def run_until(self, coro, timeout=10):
+        return self.loop.run_until_complete(
+            asyncio.wait_for(coro, timeout, loop=self.loop))
+
+    def server(self, handler_class=ListHandler, **kwargs):
+        server = AsyncSyslogServer(handler_class, loop=self.loop, **kwargs)
+        server.received = []
+        server.invalid = []
+        self.addCleanup(self.run_until, server.wait_closed())
+        self.addCleanup(server.close)
+        return server
+
+    def send_tcp(self, handler_class=ListHandler, count=100, octet_based_framing=False,
+                 **ssl_args):
+        server = self.server(handler_class)
+        listener = self.run_until(server.start_tcp('127.0.0.1', 0, **ssl_args))
+        emitter = AsyncTCPSyslogEmitter(listener.sockets[0].getsockname(),
+                                        octet_based_framing=octet_based_framing,
+                                        loop=self.loop, **ssl_args and {'keyfile': None})
+        for e in entries(count):
+            emitter.emit(e)
+        self.run_until(emitter.drain())
+        self.run_until(wait_for(self.loop, lambda: len(server.received) == count))
+        emitter.close()
+        self.assertEqual([e.msg for e in entries(count)], server.received)
+        return server
+
+    def test_tcp_lf(self):
+        self.send_tcp()
+
+    def test_tcp_octet(self):
+        self.send_tcp(octet_based_framing=True)
+
+    def test_tcp_coroutine(self):
+        # messages of a connection are handled in order
+        self.send_tcp(CoroutineHandler, count=1000)
+
+    def test_tls(self):
+        for name, data in (('keyfile', key_data), ('certfile', cert_data)):
+            with open(os.path.join(self.path, name), 'w') as f:
+                f.write(data)
+        self.send_tcp(octet_based_framing=True,
+                      keyfile=os.path.join(self.path, 'keyfile'),
+                      certfile=os.path.join(self.path, 'certfile'))
+
+    def test_framing_error(self):
+        server = self.server()
+        listener = self.run_until(server.start_tcp('127.0.0.1', 0, framing=FRAMING_OCTET))
+        sock = socket.create_connection(listener.sockets[0].getsockname())
+        sock.sendall('%s\n' % entries(1)[0])
+        sock.settimeout(5)
+        self.run_until(wait_for(self.loop, lambda: server.invalid))
+        self.assertEqual(0, len(server))
+        sock.close()
+
+    def test_invalid(self):
+        server = self.server()
+        listener = self.run_until(server.start_tcp('127.0.0.1', 0))
+        sock = socket.create_connection(listener.sockets[0].getsockname())
+        sock.sendall('not syslog\n%s\n' % entries(1)[0])
+        self.run_until(wait_for(self.loop, lambda: server.received))
+        sock.close()
+        self.assertEqual(['not syslog'], server.invalid)
+        self.assertEqual(['message 0'], server.received)
+        self.assertEqual((1, 1), (server.entries, server.errors))
+
+    def test_handler_error(self):
+        errors = []
+        self.loop.set_exception_handler(lambda loop, context: errors.append(context))
+        server = self.server(RaisingHandler)
+        listener = self.run_until(server.start_tcp('127.0.0.1', 0))
+        sock = socket.create_connection(listener.sockets[0].getsockname())
+        sock.sendall(''.join('%s\n' % e for e in entries(2)))
+        self.run_until(wait_for(self.loop, lambda: server.received))
+        sock.close()
+        self.assertEqual(['message 1'], server.received)
+        self.assertEqual((2, 1), (server.entries, server.failures))
+        self.assertEqual(1, len(errors))
+        self.assertTrue(isinstance(errors[0]['exception'], ValueError))
+
+    def test_udp(self):
+        server = self.server(CoroutineHandler, rcvbuf=65536)
+        listener = self.run_until(server.start_udp('127.0.0.1', 0))
+        emitter = UDPSyslogEmitter(listener.socket.getsockname())
+        for e in entries(100):
+            emitter.emit(e)
+        emitter.close()
+        self.run_until(wait_for(self.loop, lambda: len(server.received) == 100))
+        self.assertEqual(sorted(e.msg for e in entries(100)), sorted(server.received))
+
+    def test_unix(self):
+        path = os.path.join(self.path, 'log')
+        server = self.server()
+        self.run_until(server.start_unix(path))
+        emitter = UNIXSyslogEmitter(path)
+        # the socket queue is short: send from a thread, while the loop runs
+        self.run_until(self.loop.run_in_executor(None, emitter.emit_batch, entries(100)))
+        emitter.close()
+        self.run_until(wait_for(self.loop, lambda: len(server.received) == 100))
+        self.assertEqual([e.msg for e in entries(100)], server.received)
+        server.close()
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipIf(resource.getrlimit(resource.RLIMIT_NOFILE)[1] < 2 * CONNECTIONS + 100,
+                     'not enough file descriptors')
+    def test_many_connections(self):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, 2 * CONNECTIONS + 100), hard))
+        self.addCleanup(resource.setrlimit, resource.RLIMIT_NOFILE, (soft, hard))
+        server = self.server()
+        listener = self.run_until(server.start_tcp('127.0.0.1', 0))
+        host, port = listener.sockets[0].getsockname()
+        writers = []
+        for i in xrange(0, CONNECTIONS, 500):
+            streams = self.run_until(asyncio.gather(
+                *[asyncio.open_connection(host, port, loop=self.loop)
+                  for j in xrange(500)], loop=self.loop), 60)
+            writers.extend(w for (r, w) in streams)
+        self.run_until(wait_for(self.loop, lambda: len(server) == CONNECTIONS), 60)
+        # every connection sends a message while the others stay open
+        line = '%s\n' % entries(1)[0]
+        for writer in writers:
+            writer.write(line)
+        self.run_until(wait_for(self.loop, lambda: server.entries == CONNECTIONS), 60)
+        self.assertEqual(CONNECTIONS, len(server))
+        for writer in writers:
+            writer.close()
+        self.run_until(wait_for(self.loop, lambda: len(server) == 0), 60)
+
+if __name__ == '__main__':
+    unittest.main()
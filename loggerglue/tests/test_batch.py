@@ -0,0 +1,47 @@
+import unittest
+
+from loggerglue.constants import LOG_ERR, LOG_USER, LOG_LOCAL4
+from loggerglue.rfc5424 import SyslogEntry
+from loggerglue.tests.test_rfc5424 import valids, invalids
+
+try:
+    import numpy
+    from loggerglue.batch import EntryBatch
+except ImportError:
+    numpy = None
+
+lines = [v.replace('\n', ' ') for v in valids] + list(invalids)
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class TestEntryBatch(unittest.TestCase):
+    def setUp(self):
+        self.batch = EntryBatch.from_lines(lines)
+
+    def test_rows(self):
+        self.assertEqual(len(valids), len(self.batch))
+        self.assertEqual(1, len(self.batch.failures))
+        for (line, entry) in zip(lines, self.batch):
+            self.assertEqual(str(SyslogEntry.from_line(line)), str(entry))
+
+    def test_columns(self):
+        self.assertEqual([34, 165, 165, 165, 165, 34, 165, 78], self.batch.prival.tolist())
+        self.assertEqual([u'su', u'myproc', u'evntslog', None], self.batch.app_name.values)
+        self.assertEqual(1065910455003000000, self.batch.timestamp[0])
+
+    def test_filter(self):
+        mask = (self.batch.severity <= LOG_ERR) & (self.batch.app_name == u'su')
+        errors = self.batch.select(mask)
+        self.assertEqual(2, len(errors))
+        self.assertEqual(u'su', errors[1].app_name)
+        self.assertEqual(0, len(self.batch.select(self.batch.app_name == u'nope')))
+        self.assertEqual(5, len(self.batch.select(self.batch.facility == LOG_LOCAL4)))
+        self.assertEqual(0, len(self.batch.select(self.batch.facility == LOG_USER)))
+        self.assertEqual(4, self.batch.app_name.isin([u'evntslog', u'nope']).sum())
+
+    def test_count_by(self):
+        self.assertEqual({u'su': 2, u'myproc': 1, u'evntslog': 4, None: 1},
+                         self.batch.count_by('app_name'))
+        self.assertEqual({2: 2, 5: 5, 6: 1}, self.batch.count_by('severity'))
+
+if __name__ == '__main__':
+    unittest.main()
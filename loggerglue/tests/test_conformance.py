@@ -0,0 +1,109 @@
+"""
+Conformance tests: every parser engine must accept and reject the same
+messages, and produce the same SyslogEntry objects.
+"""
+import unittest
+from loggerglue.rfc5424 import *
+from loggerglue.tests.test_rfc5424 import valids, invalids
+
+corpus_valids = valids + (
+        """<0>1 - - - - - -""",
+        """<191>999 - - - - - -""",
+        """<13>1 2011-03-20T12:00:01.123456-12:00 host app 1 - [a@1][b@2 x="1"][c@3]""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [origin ip="192.0.2.1" ip="192.0.2.2"] multi\nline\nmessage""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [meta escaped="a\\\\b\\"c\\]d\\e" empty=""] msg""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [meta utf8="\xc3\xa9t\xc3\xa9"] \xef\xbb\xbf\xc3\xa9t\xc3\xa9""",
+        """<13>1 2011-03-20T12:00:01Z host  1 msgid - missing app-name""",
+        """<13>1 2011-03-20T12:00:01Z  app 1 msgid - missing hostname""",
+        """<13>1 2011-03-20T12:00:01Z host app  msgid - missing procid""",
+        """<13>1 2011-03-20T12:00:01Z host app 1  [a@1] missing msgid""",
+        """<13>1 2011-03-20T12:00:01Z  app  msgid [a@1] missing hostname and procid""",
+        """<13>1 2011-03-20T12:00:01Z host  - 1 msgid - NILVALUE after a missing value""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid -  leading space""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid - \t leading tab""",
+        """<13>1 2011-03-20T12:00:01Z %s %s %s %s -""" % ('h'*255, 'a'*48, 'p'*128, 'm'*32),
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [%s %s="v"]""" % ('i'*32, 'n'*32),
+        )
+
+corpus_invalids = invalids + (
+        """""",
+        """<13>""",
+        """<1345>1 2011-03-20T12:00:01Z host app 1 msgid -""",
+        """<13>0 2011-03-20T12:00:01Z host app 1 msgid -""",
+        """<13>1 2011-13-20T12:00:01Z host app 1 msgid -""",
+        """<13>1 2011-03-20T24:00:01Z host app 1 msgid -""",
+        """<13>1 2011-03-20T12:00:01.1234567Z host app 1 msgid -""",
+        """<13>1 2011-03-20 12:00:01Z host app 1 msgid -""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid []""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id x=1]""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id x="1]""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id x="1"]msg""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid -msg""",
+        """<13>1 2011-03-20T12:00:01Z h=st app 1 msgid -""",
+        """<13>1 2011-03-20T12:00:01Z %s app 1 msgid -""" % ('h'*256,),
+        """<13>1 2011-03-20T12:00:01Z host %s 1 msgid -""" % ('a'*49,),
+        """<13>1 2011-03-20T12:00:01Z host app 1 %s -""" % ('m'*33,),
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [%s]""" % ('i'*33,),
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid - non-ascii \xc3\xa9 without BOM""",
+        """<0>1 - - - \n- - -""",
+        """<0>1 -  - - - -""",
+        """<13>1 2011-03-20T12:00:01Z host  - msgid - x""",
+        """<13>1 2011-03-20T12:00:01Z host app 1  -""",
+        """<0>1 - - - - -  -""",
+        """<0>1  - - - - - -""",
+        """<13>1 2011-03-20T12:00:01Z h\tst app 1 msgid -""",
+        """<13>1 2011-03-20T12:00:01Z h\xc3\xa9st app 1 msgid -""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id\tx]""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id x= "1"]""",
+        """<13>1 2011-03-20T12:00:01Z host app 1 msgid [id  x="1"]""",
+        )
+
+def entry_fields(se):
+    sd = se.structured_data
+    if sd is not None:
+        sd = [(e.id, list(e.sd_params.allitems())) for e in sd.elements]
+    return (se.prival, se.version, se.hostname, se.app_name, se.procid,
+            se.msgid, sd, se.msg)
+
+class TestConformance(unittest.TestCase):
+    longMessage = True
+
+    def test_valids(self):
+        for v in corpus_valids:
+            reference = SyslogEntry.from_line(v, engine=ENGINE_PYPARSING)
+            self.assertTrue(reference is not None, v)
+            for engine in ENGINES:
+                se = SyslogEntry.from_line(v, consume_error=False, engine=engine)
+                self.assertEqual(entry_fields(reference), entry_fields(se), engine)
+                if v.split(' ', 2)[1] != '-':
+                    self.assertEqual(reference.timestamp, se.timestamp, engine)
+
+    def test_invalids(self):
+        for i in corpus_invalids:
+            for engine in ENGINES:
+                self.assertRaises(Exception, SyslogEntry.from_line, i,
+                                  consume_error=False, engine=engine)
+
+    def test_round_trip(self):
+        # SDElement can only serialize ASCII PARAM-VALUEs
+        for v in [v for v in corpus_valids if 'utf8=' not in v]:
+            for engine in ENGINES:
+                se = SyslogEntry.from_line(v, engine=engine)
+                again = SyslogEntry.from_line(str(se), engine=engine)
+                self.assertEqual(entry_fields(se), entry_fields(again), engine)
+
+    def test_structured_data_from_str(self):
+        line = """[exampleSDID@32473 iut="3" eventSource="Application"][examplePriority@32473 class="high"]"""
+        for engine in ENGINES:
+            sd = StructuredData.from_str(line, engine=engine)
+            self.assertEqual(line, str(sd), engine)
+
+    def test_default_engine(self):
+        self.assertTrue(DEFAULT_ENGINE in ENGINES)
+        self.assertRaises(ValueError, SyslogEntry.from_line, valids[0], engine='nope')
+
+if __name__ == '__main__':
+    unittest.main()
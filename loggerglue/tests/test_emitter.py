@@ -0,0 +1,387 @@
+"""
+Tests for the emitters that do not need a syslog server.
+"""
+import socket
+import threading
+import time
+import unittest
+
+from loggerglue.constants import LOG_ERR, LOG_INFO, LOG_DEBUG, LOG_USER
+from loggerglue.emitter import *
+from loggerglue.rfc5424 import SyslogEntry
+
+class ListEmitter(SyslogEmitter):
+    """Records batches; blocks while `gate` is cleared"""
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.closed = False
+
+    def emit_batch(self, msgs):
+        self.gate.wait()
+        self.batches.append(list(msgs))
+
+    def close(self):
+        self.closed = True
+
+    def messages(self):
+        return [m for batch in self.batches for m in batch]
+
+class FailingEmitter(SyslogEmitter):
+    def emit(self, msg):
+        raise socket.error('unreachable')
+
+def entry(severity, msg):
+    return SyslogEntry(prival=severity|LOG_USER, msg=msg)
+
+class TestQueueSyslogEmitter(unittest.TestCase):
+    def blocked(self, **kwargs):
+        """A queue whose background thread holds message 0 in emit_batch"""
+        target = ListEmitter()
+        target.gate.clear()
+        q = QueueSyslogEmitter(target, maxsize=2, **kwargs)
+        q.emit('0')
+        while len(q):
+            time.sleep(0.001)
+        return target, q
+
+    def test_send(self):
+        target = ListEmitter()
+        q = QueueSyslogEmitter(target)
+        for i in range(100):
+            q.emit(i)
+        self.assertTrue(q.flush(5))
+        self.assertEqual(range(100), target.messages())
+        q.close()
+        self.assertTrue(target.closed)
+        self.assertEqual({'enqueued': 100, 'sent': 100, 'dropped': 0,
+                          'failed': 0, 'queued': 0}, q.stats())
+
+    def test_batches(self):
+        target, q = self.blocked(batch_size=2)
+        q.maxsize = 10
+        for i in range(1, 6):
+            q.emit(str(i))
+        target.gate.set()
+        q.close()
+        self.assertEqual([['0'], ['1', '2'], ['3', '4'], ['5']], target.batches)
+
+    def test_drop_newest(self):
+        target, q = self.blocked(overflow=OVERFLOW_DROP_NEWEST)
+        for i in range(1, 5):
+            q.emit(str(i))
+        self.assertFalse(q.flush(0.05))
+        target.gate.set()
+        q.close()
+        self.assertEqual(['0', '1', '2'], target.messages())
+        self.assertEqual(2, q.dropped)
+
+    def test_drop_oldest(self):
+        target, q = self.blocked(overflow=OVERFLOW_DROP_OLDEST)
+        for i in range(1, 5):
+            q.emit(str(i))
+        target.gate.set()
+        q.close()
+        self.assertEqual(['0', '3', '4'], target.messages())
+        self.assertEqual(2, q.dropped)
+        self.assertEqual(3, q.sent)
+
+    def test_drop_below_severity(self):
+        target, q = self.blocked(overflow=OVERFLOW_DROP_BELOW_SEVERITY,
+                                 min_severity=LOG_INFO)
+        q.emit(entry(LOG_INFO, 'info'))
+        q.emit(entry(LOG_DEBUG, 'debug'))
+        q.emit(entry(LOG_DEBUG, 'dropped'))
+        q.emit(entry(LOG_ERR, 'error'))
+        target.gate.set()
+        q.close()
+        self.assertEqual(['0', 'info', 'error'],
+                         [getattr(m, 'msg', m) for m in target.messages()])
+        self.assertEqual(2, q.dropped)
+
+    def test_block(self):
+        target, q = self.blocked()
+        q.emit('1')
+        q.emit('2')
+        t = threading.Thread(target=q.emit, args=('3',))
+        t.start()
+        t.join(0.05)
+        self.assertTrue(t.isAlive())
+        target.gate.set()
+        t.join()
+        q.close()
+        self.assertEqual(['0', '1', '2', '3'], target.messages())
+
+    def test_close(self):
+        target, q = self.blocked()
+        q.emit('1')
+        target.gate.set()
+        self.assertTrue(q.close())
+        q.emit('2')
+        self.assertEqual(['0', '1'], target.messages())
+        self.assertEqual(1, q.dropped)
+
+    def test_close_timeout(self):
+        target, q = self.blocked()
+        q.emit('1')
+        start = time.time()
+        self.assertFalse(q.close(0.1))
+        self.assertTrue(time.time() - start < 1)
+        # the background thread still uses the wrapped emitter
+        self.assertFalse(target.closed)
+        self.assertEqual(1, q.dropped)
+        target.gate.set()
+        q._thread.join(5)
+        self.assertTrue(target.closed)
+        self.assertEqual(['0'], target.messages())
+
+    def test_failure(self):
+        errors = []
+        q = QueueSyslogEmitter(FailingEmitter())
+        q.handle_error = lambda batch, exc: errors.append((batch, exc))
+        q.emit('lost')
+        q.close()
+        self.assertEqual(1, q.failed)
+        self.assertEqual([['lost']], [batch for (batch, exc) in errors])
+
+class TestUDPSyslogEmitter(unittest.TestCase):
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.receiver.settimeout(5)
+        self.address = ('localhost', self.receiver.getsockname()[1])
+
+    def tearDown(self):
+        self.receiver.close()
+
+    def receive(self, count):
+        return [self.receiver.recv(65536) for i in range(count)]
+
+    def test_unconnected(self):
+        emitter = UDPSyslogEmitter(('127.0.0.1', self.address[1]))
+        emitter.emit('one')
+        emitter.emit_batch(['two', 'three'])
+        self.assertEqual(['one', 'two', 'three'], self.receive(3))
+
+    def test_connected(self):
+        emitter = UDPSyslogEmitter(self.address, connected=True)
+        emitter.emit(entry(LOG_INFO, 'one'))
+        emitter.emit_batch(['msg %i' % i for i in range(100)])
+        self.assertEqual(str(entry(LOG_INFO, 'one')), self.receive(1)[0])
+        self.assertEqual(['msg %i' % i for i in range(100)], self.receive(100))
+
+    def test_mtu(self):
+        emitter = UDPSyslogEmitter(self.address, connected=True, mtu=576)
+        emitter.emit('x' * 1000)
+        emitter.emit_batch(['y' * 548, 'z' * 549])
+        self.assertEqual(['x' * 548, 'y' * 548, 'z' * 548], self.receive(3))
+        self.assertEqual(2, emitter.truncated)
+
+class Sink(object):
+    """A TCP receiver recording the lines it reads"""
+    def __init__(self, port=0):
+        self.lines = []
+        self.connections = []
+        self.readers = []
+        self.closed = False
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(('127.0.0.1', port))
+        self.listener.listen(5)
+        self.address = self.listener.getsockname()
+        self.acceptor = threading.Thread(target=self.accept)
+        self.acceptor.setDaemon(True)
+        self.acceptor.start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except socket.error:
+                return
+            self.connections.append(conn)
+            t = threading.Thread(target=self.read, args=(conn,))
+            t.setDaemon(True)
+            t.start()
+            self.readers.append(t)
+
+    def read(self, conn):
+        f = conn.makefile()
+        try:
+            for line in f:
+                self.lines.append(line.rstrip('\n'))
+        except socket.error:
+            pass
+        f.close()
+        conn.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # wakes up accept(), which holds the listening socket open
+        self.listener.shutdown(socket.SHUT_RDWR)
+        self.listener.close()
+        self.acceptor.join()
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                # already closed by the sender
+                pass
+        for t in self.readers:
+            t.join()
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+class BrokenSocket(object):
+    """A connection that writes `limit` bytes at most, then fails"""
+    def __init__(self, limit):
+        self.limit = limit
+        self.data = ''
+
+    def send(self, data):
+        if not self.limit:
+            raise socket.error('connection reset')
+        data = str(data)[:self.limit]
+        self.data += data
+        self.limit -= len(data)
+        return len(data)
+
+    def close(self):
+        pass
+
+class TestTCPSyslogEmitter(unittest.TestCase):
+    def setUp(self):
+        self.sink = Sink()
+
+    def tearDown(self):
+        self.sink.close()
+
+    def test_resend(self):
+        for limit in (4, 5):
+            emitter = TCPSyslogEmitter(self.sink.address, octet_based_framing=False)
+            emitter.socket.close()
+            broken = emitter.socket = BrokenSocket(limit)
+            emitter.emit_batch(['one', 'two', 'six'])
+            emitter.close()
+            self.assertEqual('one\ntwo'[:limit], broken.data)
+        # the message cut by the failure is written again as a whole, and
+        # the ones written before it are not
+        self.assertTrue(wait_for(lambda: len(self.sink.lines) == 4))
+        self.assertEqual(['two', 'six', 'two', 'six'], self.sink.lines)
+
+    def test_message_start(self):
+        emitter = TCPSyslogEmitter.__new__(TCPSyslogEmitter)
+        emitter._framing = FRAMING_OCTET
+        buf = bytearray('3 one3 two5 three')
+        self.assertEqual([0, 0, 5, 5, 10, 10],
+                         [emitter._message_start(buf, i) for i in (0, 4, 5, 9, 10, 16)])
+        emitter._framing = FRAMING_LF
+        buf = bytearray('one\ntwo\n')
+        self.assertEqual([0, 0, 4, 4],
+                         [emitter._message_start(buf, i) for i in (0, 3, 4, 7)])
+
+class TestPooledTCPSyslogEmitter(unittest.TestCase):
+    def setUp(self):
+        self.sinks = [Sink(), Sink(), Sink()]
+
+    def tearDown(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def pool(self, **kwargs):
+        return PooledTCPSyslogEmitter([sink.address for sink in self.sinks],
+                                      octet_based_framing=False, **kwargs)
+
+    def received(self, count):
+        self.assertTrue(wait_for(lambda: sum([len(s.lines) for s in self.sinks]) >= count))
+        return [s.lines for s in self.sinks]
+
+    def test_round_robin(self):
+        pool = self.pool()
+        for i in range(6):
+            pool.emit(str(i))
+        pool.emit_batch(['a', 'b'])
+        pool.close()
+        lines = self.received(8)
+        self.assertEqual(sorted(['0', '1', '2', '3', '4', '5', 'a', 'b']),
+                         sorted(sum(lines, [])))
+        # the batch goes to a single receiver
+        self.assertEqual([2, 2, 4], sorted([len(l) for l in lines]))
+
+    def test_hash(self):
+        pool = self.pool(routing=ROUTING_HASH)
+        entries = [SyslogEntry(app_name='app%i' % (i % 4), hostname='host', msg=str(i))
+                   for i in range(40)]
+        pool.emit_batch(entries[:20])
+        for e in entries[20:]:
+            pool.emit(e)
+        pool.close()
+        lines = self.received(40)
+        # every app_name went to a single receiver
+        apps = [set([SyslogEntry.from_line(l).app_name for l in sink_lines])
+                for sink_lines in lines]
+        self.assertEqual(4, sum([len(a) for a in apps]))
+
+    def test_eject_and_probe(self):
+        pool = self.pool(probe_interval=0.05)
+        address = self.sinks[0].address
+        self.sinks[0].close()
+        # the dead receiver is ejected and messages go to the others
+        for i in range(10):
+            pool.emit(str(i))
+        self.assertFalse(pool.stats()[address]['up'])
+        self.assertEqual(1, pool.stats()[address]['ejections'])
+        self.sinks[0] = Sink(address[1])
+        self.assertTrue(wait_for(lambda: pool.stats()[address]['up']))
+        for i in range(3):
+            pool.emit(str(i))
+        pool.close()
+        self.assertTrue(self.received(1) and wait_for(lambda: self.sinks[0].lines))
+
+    def test_connect_timeout(self):
+        pool = self.pool(connect_timeout=1.5)
+        for receiver in pool.receivers:
+            self.assertEqual(1.5, receiver.emitter.connect_timeout)
+            # the timeout only applies to connecting
+            self.assertEqual(None, receiver.emitter.socket.gettimeout())
+        pool.close()
+
+    def test_round_robin_threads(self):
+        pool = self.pool()
+        counts = [0] * len(self.sinks)
+        lock = threading.Lock()
+        def route():
+            for i in range(3000):
+                index = pool._route(None)
+                lock.acquire()
+                counts[index] += 1
+                lock.release()
+        threads = [threading.Thread(target=route) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        pool.close()
+        self.assertEqual([4000] * len(self.sinks), counts)
+
+    def test_none_available(self):
+        pool = self.pool(probe_interval=60)
+        for sink in self.sinks:
+            sink.close()
+        def send():
+            # writes after the peer closed only fail once it has reset
+            for i in range(10):
+                pool.emit_batch(['x'] * 10)
+        self.assertRaises(socket.error, send)
+        self.assertFalse(True in [s['up'] for s in pool.stats().values()])
+        pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
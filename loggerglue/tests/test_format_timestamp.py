@@ -0,0 +1,35 @@
+import unittest
+import datetime
+
+from loggerglue.util.format_timestamp import format_timestamp, format_timestamp_float
+from loggerglue.util.parse_timestamp import parse_timestamp
+
+
+class TestFormatTimestamp(unittest.TestCase):
+    longMessage = True
+
+    dt = datetime.datetime(2003, 10, 11, 22, 14, 15, 3000)
+    # the same instant as datetime, epoch float and epoch nanoseconds
+    same = (dt, 1065910455.003, 1065910455003000000)
+
+    def test_format(self):
+        for ts in self.same:
+            self.assertEqual('2003-10-11T22:14:15.003000Z', format_timestamp(ts), ts)
+        self.assertEqual('2003-10-11T22:14:15.000000Z',
+                         format_timestamp(datetime.datetime(2003, 10, 11, 22, 14, 15)))
+        self.assertEqual('1970-01-01T00:00:00.000001Z', format_timestamp(1000))
+        self.assertEqual('2003-10-11T22:14:16.000000Z', format_timestamp(1065910455.9999999))
+
+    def test_cached(self):
+        for i in range(1000):
+            ns = 1065910455003000000 + i * 1700000001
+            dt = datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=ns // 1000)
+            self.assertEqual(dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"), format_timestamp(ns))
+            self.assertEqual(dt, parse_timestamp(format_timestamp(dt)))
+
+    def test_float(self):
+        for ts in self.same:
+            self.assertEqual('1065910455.003', format_timestamp_float(ts), ts)
+
+if __name__ == '__main__':
+    unittest.main()
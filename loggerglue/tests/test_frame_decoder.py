@@ -0,0 +1,75 @@
+"""
+Tests for the octet-counting frame decoder.
+"""
+import unittest
+
+from loggerglue.util.frame_decoder import OctetFrameDecoder, LineFrameDecoder, FrameError
+
+def frame(msg):
+    return '%i %s' % (len(msg), msg)
+
+class TestOctetFrameDecoder(unittest.TestCase):
+    msgs = ['<34>1 - - - - - - first', '<34>1 - - - - - - second message',
+            'x' * 1000, 'a b c']
+
+    def test_whole(self):
+        decoder = OctetFrameDecoder()
+        self.assertEqual(self.msgs, decoder.feed(''.join(map(frame, self.msgs))))
+        self.assertEqual(0, len(decoder))
+
+    def test_split(self):
+        data = ''.join(map(frame, self.msgs))
+        for size in (1, 2, 3, 7, 100):
+            decoder = OctetFrameDecoder()
+            frames = []
+            for i in xrange(0, len(data), size):
+                frames.extend(decoder.feed(data[i:i + size]))
+            self.assertEqual(self.msgs, frames)
+            self.assertEqual(0, len(decoder))
+
+    def test_partial(self):
+        decoder = OctetFrameDecoder()
+        self.assertEqual(['first'], decoder.feed('5 first12 sec'))
+        self.assertEqual(6, len(decoder))
+        self.assertEqual([], decoder.feed('ond '))
+        self.assertEqual(['second frame'], decoder.feed('frame'))
+
+    def test_invalid_length(self):
+        for data in ('abc def', '-1 x', '05 hello', '1234567890'):
+            self.assertRaises(FrameError, OctetFrameDecoder().feed, data)
+
+    def test_max_frame_size(self):
+        decoder = OctetFrameDecoder(max_frame_size=10)
+        self.assertEqual(['0123456789'], decoder.feed(frame('0123456789')))
+        self.assertRaises(FrameError, decoder.feed, frame('0123456789a'))
+        # a length prefix too long to be valid is rejected without its space
+        self.assertRaises(FrameError, OctetFrameDecoder(max_frame_size=10).feed, '100')
+
+class TestLineFrameDecoder(unittest.TestCase):
+    msgs = TestOctetFrameDecoder.msgs
+
+    def test_split(self):
+        data = ''.join(msg + '\n' for msg in self.msgs)
+        for size in (1, 2, 3, 7, 100, len(data)):
+            decoder = LineFrameDecoder()
+            frames = []
+            for i in xrange(0, len(data), size):
+                frames.extend(decoder.feed(data[i:i + size]))
+            self.assertEqual(self.msgs, frames)
+            self.assertEqual(0, len(decoder))
+
+    def test_partial(self):
+        decoder = LineFrameDecoder()
+        self.assertEqual(['first', 'second'], decoder.feed('first\n\nsecond\nthi'))
+        self.assertEqual(3, len(decoder))
+        self.assertEqual(['third'], decoder.feed('rd\n'))
+
+    def test_max_frame_size(self):
+        decoder = LineFrameDecoder(max_frame_size=10)
+        self.assertEqual(['0123456789'], decoder.feed('0123456789\n'))
+        self.assertRaises(FrameError, decoder.feed, '0123456789a')
+        self.assertRaises(FrameError, LineFrameDecoder(max_frame_size=10).feed,
+                          '0123456789a\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from loggerglue.util.intern_table import InternTable
+
+class TestInternTable(unittest.TestCase):
+    def test_lookup(self):
+        t = InternTable()
+        a = t.lookup(''.join(['app', 'name']))
+        b = t.lookup(''.join(['app', 'name']))
+        self.assertTrue(a is b)
+        self.assertEqual({'size': 1, 'hits': 1, 'misses': 1, 'evictions': 0}, t.stats())
+
+    def test_decode(self):
+        t = InternTable()
+        decode = lambda v: v.decode('utf-8')
+        u = t.lookup('host', decode)
+        self.assertTrue(type(u) is unicode)
+        self.assertTrue(u is t.lookup(''.join(['ho', 'st']), decode))
+        # values decoded differently are kept apart
+        self.assertTrue(type(t.lookup('host')) is str)
+
+    def test_bounded(self):
+        t = InternTable(maxsize=10)
+        for i in range(25):
+            t.lookup(str(i))
+        self.assertTrue(len(t) <= 10)
+        self.assertEqual(20, t.evictions)
+        self.assertEqual(25, t.misses)
+
+if __name__ == '__main__':
+    unittest.main()
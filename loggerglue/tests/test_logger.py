@@ -0,0 +1,86 @@
+import pickle
+import unittest
+from datetime import datetime
+
+from loggerglue.constants import LOG_DEBUG, LOG_MAIL
+from loggerglue.emitter import SyslogEmitter
+from loggerglue.logger import Logger
+from loggerglue.rfc5424 import SyslogEntry, SDElement
+
+class ListEmitter(SyslogEmitter):
+    def __init__(self):
+        self.entries = []
+
+    def emit(self, msg):
+        self.entries.append(msg)
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.emitter = ListEmitter()
+        self.logger = Logger(self.emitter, hostname='mymachine.example.com',
+                             app_name='evntslog', procid=42)
+
+    def expected(self, entry):
+        return str(SyslogEntry(
+            prival=entry.prival, timestamp=entry.timestamp,
+            hostname=entry.hostname, app_name=entry.app_name,
+            procid=entry.procid, msgid=entry.msgid,
+            structured_data=entry.structured_data, msg=entry.msg))
+
+    def test_serialization(self):
+        ts = datetime(2003, 10, 11, 22, 14, 15, 3000)
+        self.logger.log(u'An application event log entry...', timestamp=ts)
+        self.logger.log('test', msgid='ID47', prival=LOG_DEBUG|LOG_MAIL,
+                        structured_data=[SDElement('exampleSDID@32473', [('iut', '3')])])
+        self.logger.log()
+        self.assertEqual(ts, self.emitter.entries[0].timestamp)
+        self.assertEqual('<14>1 2003-10-11T22:14:15.003000Z mymachine.example.com evntslog 42 - - '
+                         '\xef\xbb\xbfAn application event log entry...',
+                         str(self.emitter.entries[0]))
+        for entry in self.emitter.entries:
+            self.assertEqual(self.expected(entry), str(entry))
+
+    def test_default_timestamp(self):
+        self.logger.log('now')
+        self.assertTrue(isinstance(self.emitter.entries[0].timestamp, float))
+        line = str(self.emitter.entries[0])
+        self.assertEqual(line, self.expected(self.emitter.entries[0]))
+        self.assertTrue(SyslogEntry.from_line(line).timestamp <= datetime.utcnow())
+
+    def test_template_reset(self):
+        self.logger.log('before')
+        self.logger.hostname = 'other.example.com'
+        self.logger.log('after')
+        self.assertTrue(' other.example.com evntslog 42 ' in str(self.emitter.entries[1]))
+
+    def test_entry_changed(self):
+        self.logger.log('x')
+        entry = self.emitter.entries[0]
+        entry.hostname = 'changed'
+        self.assertTrue(' changed evntslog 42 - - x' in str(entry))
+        entry.prival = LOG_DEBUG|LOG_MAIL
+        self.assertEqual(self.expected(entry), str(entry))
+
+    def test_timestamp_none(self):
+        self.logger.log('x')
+        entry = self.emitter.entries[0]
+        entry.timestamp = None
+        self.assertEqual('<14>1 - mymachine.example.com evntslog 42 - - x', str(entry))
+        self.assertEqual(self.expected(entry), str(entry))
+
+    def test_timestamp_as_float(self):
+        self.logger.log('x', timestamp=1065910455.003)
+        entry = self.emitter.entries[0]
+        entry.timestamp_as_float = True
+        self.assertEqual('<14>1 1065910455.003 mymachine.example.com evntslog 42 - - x',
+                         str(entry))
+
+    def test_pickle(self):
+        self.logger.log('x', msgid='ID47')
+        entry = self.emitter.entries[0]
+        for protocol in (0, 2):
+            copy = pickle.loads(pickle.dumps(entry, protocol))
+            self.assertEqual(str(entry), str(copy))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import multiprocessing
+import os
+from tempfile import NamedTemporaryFile
+
+from loggerglue.rfc5424 import SyslogEntry, ParseFailure
+from loggerglue.parallel import parse_file, split_file, compact
+from loggerglue.tests.test_rfc5424 import valids, invalids
+
+lines = [v.replace('\n', ' ') for v in valids] + list(invalids) + ['']
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        f = NamedTemporaryFile(delete=False)
+        for i in range(20):
+            f.write('\n'.join(lines) + '\n')
+        f.close()
+        self.path = f.name
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_split_file(self):
+        data = open(self.path, 'rb').read()
+        chunks = split_file(self.path, 1000)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(0, chunks[0][0])
+        self.assertEqual(len(data), chunks[-1][1])
+        for (start, end) in chunks:
+            self.assertEqual('\n', data[end - 1])
+
+    def test_parse_file(self):
+        expected = list(SyslogEntry.parse_stream(open(self.path, 'rb')))
+        results = list(parse_file(self.path, workers=2, chunk_size=1000))
+        self.assertEqual(len(expected), len(results))
+        for (e, r) in zip(expected, results):
+            if isinstance(e, ParseFailure):
+                self.assertEqual(e, r)
+            else:
+                self.assertEqual(str(e), str(r))
+
+    def test_transform(self):
+        results = list(parse_file(self.path, workers=2, chunk_size=1000,
+                                  transform=compact))
+        self.assertEqual(u'mymachine.example.com', results[0][3])
+        self.assertEqual(compact(SyslogEntry.from_line(lines[2])), results[2])
+
+    def test_close(self):
+        results = parse_file(self.path, workers=2, chunk_size=1000)
+        first = next(results)
+        self.assertTrue(multiprocessing.active_children())
+        results.close()
+        self.assertEqual([], multiprocessing.active_children())
+        self.assertEqual(str(SyslogEntry.from_line(lines[0])), str(first))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import datetime
 
-from loggerglue.util.parse_timestamp import parse_timestamp
+from loggerglue.util.parse_timestamp import parse_timestamp, parse_timestamp_strptime
 
 
 class TestParseTimestamp(unittest.TestCase):
@@ -34,5 +34,24 @@ class TestParseTimestamp(unittest.TestCase):
         for k, v in self.pairs.items():
             self.assertEqual(v, parse_timestamp(k), k)
 
+    def test_cached(self):
+        # the second is cached, fractions and offsets must still apply
+        for k, v in sorted(self.pairs.items()) * 2:
+            self.assertEqual(v, parse_timestamp(k), k)
+        self.assertEqual(datetime.datetime(2003, 10, 11, 12, 14, 15, 120000),
+                         parse_timestamp('2003-10-11T12:14:15.12Z'))
+        self.assertEqual(datetime.datetime(2003, 10, 11, 12, 14, 15, 123456),
+                         parse_timestamp('2003-10-11T12:14:15.123456Z'))
+
+    def test_same_as_strptime(self):
+        for ts in ('-', '2003-1-1T2:4:5Z', '2003-10-11T12:14:15.3Z',
+                   '2003-12-31T23:59:59.999999-12:00'):
+            self.assertEqual(parse_timestamp_strptime(ts), parse_timestamp(ts), ts)
+        for ts in ('2003-02-30T12:14:15Z', '2003-10-11T12:14:60Z',
+                   '2003-10-11T12:14:15.Z', '2003-10-11T12:14:15.1234567Z',
+                   '2003-10-11T12:14:15.12a4Z', '2003-10-11 12:14:15Z'):
+            self.assertRaises(ValueError, parse_timestamp_strptime, ts)
+            self.assertRaises(ValueError, parse_timestamp, ts)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 from pyparsing import ParseException
 from loggerglue.rfc5424 import *
+from loggerglue.scanner import ScanError
+from loggerglue.util.intern_table import InternTable
 
 valids = (
         """<34>1 2003-10-11T22:14:15.003Z mymachine.example.com su - ID47 - \xef\xbb\xbf'su root' failed for lonvick on /dev/pts/8""",
@@ -57,6 +59,29 @@ class TestSDElement(unittest.TestCase):
         self.assertEqual('exampleSDID@32473', e.id)
         self.assertEqual(OrderedMultiDict({'param1': 1, 'param2': 2}), e.sd_params)
 
+    def test_params(self):
+        e = SDElement('origin', [('ip', '192.0.2.1'), ('ip', '192.0.2.2')])
+        self.assertEqual('192.0.2.2', e.params.ip)
+        self.assertRaises(AttributeError, getattr, e.params, 'software')
+
+    def test_freeze(self):
+        import pickle
+        e = SDElement('meta', [('service', 'api'), ('escaped', 'a"b]c\\d')])
+        f = e.freeze()
+        self.assertTrue(isinstance(f, FrozenSDElement))
+        self.assertTrue(f.freeze() is f)
+        self.assertEqual(str(e), str(f))
+        self.assertEqual('[meta service="api" escaped="a\\"b\\]c\\\\d"]', str(f))
+        self.assertEqual('api', f.params.service)
+        self.assertRaises(AttributeError, setattr, f, 'id', 'other')
+        self.assertRaises(TypeError, f.sd_params.__setitem__, 'service', 'web')
+        self.assertRaises(TypeError, f.sd_params.__delitem__, 'service')
+        e.sd_params['service'] = 'web'
+        self.assertEqual('[meta service="api" escaped="a\\"b\\]c\\\\d"]', str(f))
+        again = pickle.loads(pickle.dumps(f, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(str(f), str(again))
+        self.assertEqual(f.sd_params, again.sd_params)
+
 
 class TestStructuredData(unittest.TestCase):
     def test_init_with_elements(self):
@@ -116,5 +141,177 @@ class TestSyslogEntry(unittest.TestCase):
         self.assertEqual('<14>1 1065910455.003 - - - - -', str(se))
 
 
+class TestPickle(unittest.TestCase):
+    def test_pickle(self):
+        import pickle
+        for lazy in (False, True):
+            se = SyslogEntry.from_line(valids[3], lazy=lazy)
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                self.assertEqual(str(se), str(pickle.loads(pickle.dumps(se, protocol))))
+
+
+class TestLazySyslogEntry(unittest.TestCase):
+    def test_lazy(self):
+        for v in valids:
+            se = SyslogEntry.from_line(v)
+            lazy = SyslogEntry.from_line(v, lazy=True)
+            self.assertTrue(isinstance(lazy, LazySyslogEntry))
+            self.assertEqual(se.hostname, lazy.hostname)
+            self.assertEqual(se.app_name, lazy.app_name)
+            self.assertEqual(se.msg, lazy.msg)
+            self.assertEqual(str(se.structured_data), str(lazy.structured_data))
+            self.assertEqual(str(se), str(lazy))
+
+    def test_deferred(self):
+        se = SyslogEntry.from_line(valids[3], lazy=True)
+        self.assertTrue('hostname' in se.__dict__)
+        self.assertFalse('structured_data' in se.__dict__)
+        self.assertEqual(se.prival, 165)
+        self.assertFalse('structured_data' in se.__dict__)
+        self.assertEqual(len(se.structured_data.elements), 2)
+        self.assertTrue('structured_data' in se.__dict__)
+        self.assertTrue(se.msg is None)
+
+    def test_assign(self):
+        se = SyslogEntry.from_line(valids[2], lazy=True)
+        se.msg = u'replaced'
+        se.structured_data = None
+        self.assertEqual(se.msg, u'replaced')
+        self.assertTrue(se.structured_data is None)
+
+    def test_invalid(self):
+        self.assertEqual(None, SyslogEntry.from_line(invalids[0], lazy=True))
+        self.assertRaises(ValueError, SyslogEntry.from_line, valids[0],
+                          lazy=True, engine=ENGINE_PYPARSING)
+
+
+class TestFromBuffer(unittest.TestCase):
+    def test_buffers(self):
+        frames = [valids[0], valids[2], valids[5]]
+        data = '\n'.join(frames)
+        for buf in (data, bytearray(data), buffer(data), memoryview(data)):
+            start = 0
+            for frame in frames:
+                end = start + len(frame)
+                se = SyslogEntry.from_buffer(buf, start, end)
+                self.assertEqual(str(SyslogEntry.from_line(frame)), str(se))
+                start = end + 1
+
+    def test_only_read_fields(self):
+        buf = bytearray(valids[2])
+        se = SyslogEntry.from_buffer(buf)
+        self.assertEqual(set(['_buf', '_spans']), set(se.__dict__))
+        self.assertEqual(u'evntslog', se.app_name)
+        self.assertEqual(set(['_buf', '_spans', 'app_name']), set(se.__dict__))
+        self.assertTrue(type(se.app_name) is unicode)
+        self.assertEqual('exampleSDID@32473', se.structured_data.elements[0].id)
+        self.assertTrue(type(se.structured_data.elements[0].id) is str)
+
+    def test_invalid(self):
+        self.assertRaises(ScanError, SyslogEntry.from_buffer, bytearray(invalids[0]))
+        # the end offset bounds the message
+        self.assertRaises(ScanError, SyslogEntry.from_buffer, valids[3], 0, 50)
+
+
+class TestProjection(unittest.TestCase):
+    def test_header(self):
+        p = Projection(['app_name', 'prival', 'timestamp'])
+        r = p.from_line(valids[0])
+        self.assertEqual(('app_name', 'prival', 'timestamp'), r._fields)
+        self.assertEqual(u'su', r.app_name)
+        self.assertEqual(34, r.prival)
+        self.assertEqual(datetime(2003, 10, 11, 22, 14, 15, 3000), r.timestamp)
+
+    def test_stops_early(self):
+        p = Projection(['prival'])
+        self.assertEqual(165, p.from_line('<165>1 not a valid message').prival)
+        self.assertRaises(ScanError, Projection(['hostname']).from_line,
+                          '<165>1 not a valid message')
+
+    def test_full(self):
+        p = Projection(['hostname', 'structured_data', 'msg'])
+        for v in valids:
+            se = SyslogEntry.from_line(v)
+            r = p.from_line(v)
+            self.assertEqual(se.hostname, r.hostname)
+            self.assertEqual(str(se.structured_data), str(r.structured_data))
+            self.assertEqual(se.msg, r.msg)
+
+    def test_unknown_field(self):
+        self.assertRaises(ValueError, Projection, ['severity'])
+
+
+class TestInterning(unittest.TestCase):
+    def setUp(self):
+        import loggerglue.rfc5424
+        self.module = loggerglue.rfc5424
+        self.module.INTERN_TABLE = InternTable()
+
+    def tearDown(self):
+        self.module.INTERN_TABLE = None
+
+    def test_shared_values(self):
+        a = SyslogEntry.from_line(valids[3])
+        b = SyslogEntry.from_line(valids[3])
+        self.assertEqual(u'mymachine.example.com', a.hostname)
+        self.assertTrue(a.hostname is b.hostname)
+        self.assertTrue(a.app_name is b.app_name)
+        self.assertTrue(a.structured_data.elements[0].id is b.structured_data.elements[0].id)
+        self.assertTrue(list(a.structured_data.elements[0].sd_params.allkeys())[0] is
+                        list(b.structured_data.elements[0].sd_params.allkeys())[0])
+        self.assertTrue(self.module.INTERN_TABLE.hits > 0)
+        self.assertEqual(str(a), str(b))
+
+    def test_buffer(self):
+        a = SyslogEntry.from_buffer(bytearray(valids[0]))
+        b = SyslogEntry.from_buffer(bytearray(valids[0]))
+        self.assertTrue(a.hostname is b.hostname)
+
+
+class TestParseStream(unittest.TestCase):
+    def test_stream(self):
+        lines = [valids[0] + '\n', '\n', invalids[0] + '\n', valids[1] + '\n']
+        for engine in ENGINES:
+            entries = list(SyslogEntry.parse_stream(lines, engine=engine))
+            self.assertEqual(3, len(entries))
+            self.assertEqual('mymachine.example.com', entries[0].hostname)
+            self.assertTrue(isinstance(entries[1], ParseFailure))
+            self.assertEqual(3, entries[1].lineno)
+            self.assertEqual(len(lines[0]) + 1, entries[1].offset)
+            self.assertEqual(lines[2], entries[1].line)
+            self.assertTrue(entries[1].reason)
+            self.assertEqual('192.0.2.1', entries[2].hostname)
+
+    def test_file(self):
+        from StringIO import StringIO
+        f = StringIO('\n'.join([v.replace('\n', ' ') for v in valids]))
+        entries = list(SyslogEntry.parse_stream(f, lazy=True))
+        self.assertEqual(len(valids), len(entries))
+        for entry in entries:
+            self.assertTrue(isinstance(entry, LazySyslogEntry))
+
+class TestSerializeInto(unittest.TestCase):
+    def test_framings(self):
+        se = SyslogEntry.from_line(valids[2])
+        line = str(se)
+        for framing, expected in [(FRAMING_NONE, line),
+                                  (FRAMING_OCTET, '%i %s' % (len(line), line)),
+                                  (FRAMING_LF, line + '\n'),
+                                  (FRAMING_NUL, line + '\000')]:
+            buf = bytearray('head')
+            self.assertEqual(len(expected), se.serialize_into(buf, framing))
+            self.assertEqual('head' + expected, str(buf))
+        self.assertRaises(ValueError, se.serialize_into, bytearray(), 'nope')
+
+    def test_batch(self):
+        entries = [SyslogEntry.from_line(v) for v in valids]
+        buf = serialize_batch(entries + ['raw'], FRAMING_OCTET)
+        expected = ''.join(['%i %s' % (len(str(e)), e) for e in entries + ['raw']])
+        self.assertEqual(expected, str(buf))
+        buf = bytearray()
+        self.assertTrue(serialize_batch(entries[:1], FRAMING_LF, buf) is buf)
+        self.assertEqual(str(entries[0]) + '\n', str(buf))
+
+
 if __name__ == '__main__':
     unittest.main()
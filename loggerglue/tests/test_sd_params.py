@@ -0,0 +1,45 @@
+import unittest
+
+from loggerglue.util.MultiDict import OrderedMultiDict
+from loggerglue.util.sd_params import SDParams, FrozenSDParams
+
+pairs = [('file', 'main.py'), ('line', '123'), ('file', 'pinger.py')]
+
+class TestSDParams(unittest.TestCase):
+    def test_like_ordered_multidict(self):
+        p = SDParams(pairs)
+        od = OrderedMultiDict(pairs)
+        self.assertEqual(od, p)
+        self.assertEqual(p, od)
+        self.assertEqual(len(od), len(p))
+        self.assertEqual(od['file'], p['file'])
+        self.assertEqual(od.getall('file'), p.getall('file'))
+        self.assertEqual(list(od.allitems()), list(p.allitems()))
+        self.assertEqual(list(od.allkeys()), list(p.allkeys()))
+        self.assertEqual(list(od.allvalues()), list(p.allvalues()))
+        self.assertEqual(sorted(od.items()), sorted(p.items()))
+        self.assertEqual(od.get('nope', 1), p.get('nope', 1))
+        self.assertTrue('line' in p)
+        self.assertRaises(KeyError, p.__getitem__, 'nope')
+
+    def test_from_dict_and_multidict(self):
+        self.assertEqual([('a', 1)], list(SDParams({'a': 1}).allitems()))
+        self.assertEqual(pairs, list(SDParams(OrderedMultiDict(pairs)).allitems()))
+
+    def test_mutate(self):
+        p = SDParams(pairs)
+        p['line'] = '456'
+        self.assertEqual('456', p['line'])
+        del p['file']
+        self.assertEqual([('line', '123'), ('line', '456')], list(p.allitems()))
+
+class TestFrozenSDParams(unittest.TestCase):
+    def test_frozen(self):
+        p = FrozenSDParams(pairs)
+        self.assertEqual(SDParams(pairs), p)
+        self.assertEqual('pinger.py', p['file'])
+        self.assertRaises(TypeError, p.__setitem__, 'line', '456')
+        self.assertRaises(TypeError, p.__delitem__, 'file')
+
+if __name__ == '__main__':
+    unittest.main()
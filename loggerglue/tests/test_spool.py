@@ -0,0 +1,113 @@
+"""
+Tests for the disk-backed spool emitter.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from loggerglue.spool import SpoolSyslogEmitter
+from loggerglue.tests.test_emitter import ListEmitter, FailingEmitter
+
+class TestSpoolSyslogEmitter(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def segments(self):
+        return sorted(n for n in os.listdir(self.path) if n.endswith('.seg'))
+
+    def test_send(self):
+        target = ListEmitter()
+        spool = SpoolSyslogEmitter(self.path, target, segment_size=256)
+        msgs = ['message %i' % i for i in range(100)]
+        for msg in msgs:
+            spool.emit(msg)
+        self.assertTrue(spool.flush(5))
+        self.assertEqual(msgs, target.messages())
+        spool.close()
+        self.assertTrue(target.closed)
+        self.assertEqual({'enqueued': 100, 'sent': 100, 'dropped': 0,
+                          'failures': 0, 'pending': 0}, spool.stats())
+        # sent segments are removed
+        self.assertEqual(1, len(self.segments()))
+
+    def test_empty_message(self):
+        target = ListEmitter()
+        spool = SpoolSyslogEmitter(self.path, target)
+        for msg in ('a', '', 'b'):
+            spool.emit(msg)
+        self.assertTrue(spool.flush(5))
+        self.assertEqual(['a', '', 'b'], target.messages())
+        self.assertEqual(0, spool.pending())
+        spool.close()
+
+    def test_resume(self):
+        target = ListEmitter()
+        target.gate.clear()
+        spool = SpoolSyslogEmitter(self.path, target, segment_size=256, batch_size=10)
+        msgs = ['message %i' % i for i in range(100)]
+        for msg in msgs:
+            spool.emit(msg)
+        self.assertFalse(spool.flush(0.1))
+        target.gate.set()
+        spool.close(0)
+        sent = target.messages()
+        self.assertEqual(msgs[:len(sent)], sent)
+
+        target = ListEmitter()
+        spool = SpoolSyslogEmitter(self.path, target, segment_size=256)
+        spool.emit('message 100')
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(msgs[len(sent):] + ['message 100'], target.messages())
+
+    def test_retry(self):
+        spool = SpoolSyslogEmitter(self.path, FailingEmitter(), retry_interval=0.01)
+        spool.emit('message')
+        self.assertFalse(spool.flush(0.1))
+        self.assertTrue(spool.failures > 0)
+        spool.close(0)
+
+        target = ListEmitter()
+        spool = SpoolSyslogEmitter(self.path, target)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(['message'], target.messages())
+
+    def test_close_receiver_down(self):
+        spool = SpoolSyslogEmitter(self.path, FailingEmitter(), retry_interval=0.01)
+        spool.emit('message')
+        spool.close(None)
+        spool = SpoolSyslogEmitter(self.path, FailingEmitter(), retry_interval=0.01)
+        spool.close(0.1)
+
+        target = ListEmitter()
+        spool = SpoolSyslogEmitter(self.path, target)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(['message'], target.messages())
+
+    def test_max_size(self):
+        # 3 records of 4 + 10 bytes per segment, 4 segments at most
+        spool = SpoolSyslogEmitter(self.path, FailingEmitter(), segment_size=42,
+                                   max_size=168, retry_interval=60)
+        msgs = ['message %02i' % i for i in range(30)]
+        for msg in msgs:
+            spool.emit(msg)
+        spool.emit('x' * 42)
+        self.assertEqual(4, len(self.segments()))
+        self.assertEqual(18 + 1, spool.dropped)
+        self.assertEqual(12, spool.pending())
+        spool.close(0)
+
+        target = ListEmitter()
+        spool = SpoolSyslogEmitter(self.path, target, segment_size=42, max_size=168)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(msgs[18:], target.messages())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,13 @@ def escape_param_value(s):
     '''
     Escape PARAM-VALUE. Inside PARAM-VALUE, the characters '"' (ABNF %d34), '\' (ABNF %d92),
     and ']' (ABNF %d93) MUST be escaped.
+
+    Most values contain none of these, and are returned as is without
+    running the substitution.
     '''
-    return escape_re.sub(r'\\\1', s)
+    if '"' in s or '\\' in s or ']' in s:
+        return escape_re.sub(r'\\\1', s)
+    return s
 
 def str_or_nil(s):
     '''
@@ -0,0 +1,57 @@
+
+import calendar
+import time
+
+# 'YYYY-MM-DDTHH:MM:SS' of each recently formatted second since the epoch
+_cache = {}
+CACHE_SIZE = 64
+
+def _format_second(second):
+    '''
+    Format the whole `second` since the epoch, caching the result.
+    '''
+    s = _cache.get(second)
+    if s is None:
+        s = '%04d-%02d-%02dT%02d:%02d:%02d' % time.gmtime(second)[:6]
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[second] = s
+    return s
+
+def format_timestamp(ts):
+    '''
+    Format a UTC timestamp as '2003-10-11T22:14:15.003000Z'. `ts` is one of:
+
+    - a "naive" datetime object (without timezone info, UTC),
+    - a float number of seconds since the epoch, as returned by :func:`time.time`,
+    - an integer number of nanoseconds since the epoch.
+
+    For numeric timestamps, the 'YYYY-MM-DDTHH:MM:SS' part is cached per
+    second and only the microseconds are formatted for every call.
+    '''
+    if type(ts) is float:
+        second, us = divmod(int(round(ts * 1000000)), 1000000)
+    elif isinstance(ts, (int, long)):
+        second, ns = divmod(ts, 1000000000)
+        us = ns // 1000
+    elif ts.tzinfo is None:
+        # isoformat() leaves out the fraction when it is 0
+        if ts.microsecond:
+            return ts.isoformat() + 'Z'
+        return ts.isoformat() + '.000000Z'
+    else:
+        return ts.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return '%s.%06dZ' % (_format_second(second), us)
+
+def format_timestamp_float(ts):
+    '''
+    Format a UTC timestamp, as accepted by :func:`format_timestamp`, as a
+    float number of seconds since the epoch.
+    '''
+    if type(ts) is float:
+        return repr(ts)
+    elif isinstance(ts, (int, long)):
+        return repr(ts / 1e9)
+    t = calendar.timegm(ts.utctimetuple())
+    t += ts.microsecond / 1000000.0
+    return repr(t)
@@ -0,0 +1,127 @@
+
+class FrameError(ValueError):
+    '''
+    Raised on a stream that does not follow octet-counting framing, or
+    whose frame exceeds the maximum size. The stream cannot be decoded
+    any further.
+    '''
+
+class OctetFrameDecoder(object):
+    '''
+    Incremental decoder of RFC5425/RFC6587 octet-counted frames,
+    `MSG-LEN SP SYSLOG-MSG`.
+
+    Feed it the chunks read from the stream, whatever their size: every
+    complete frame is returned, and a partial frame is kept until the
+    rest of it arrives. Chunks are only joined once enough data has been
+    received to complete the next frame, so a large frame spread over
+    many reads costs no more than a single one.
+
+    **attributes**
+        *max_frame_size*
+            Frames longer than this raise :exc:`FrameError`, rather than
+            being buffered until a bogus length is reached.
+    '''
+    def __init__(self, max_frame_size=65536):
+        self.max_frame_size = max_frame_size
+        self._max_digits = len(str(max_frame_size))
+        self._chunks = []
+        self._size = 0
+        # bytes needed before the next frame may be complete
+        self._needed = 1
+
+    def __len__(self):
+        '''Number of bytes buffered, belonging to a partial frame.'''
+        return self._size
+
+    def feed(self, data):
+        '''
+        Decode the chunk `data`, returning the list of frames it completes.
+        '''
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._size < self._needed:
+            return []
+        if len(self._chunks) == 1:
+            buf = data
+        else:
+            buf = ''.join(self._chunks)
+        frames = []
+        pos = 0
+        size = len(buf)
+        while pos < size:
+            space = buf.find(' ', pos, pos + self._max_digits + 1)
+            if space < 0:
+                if size - pos > self._max_digits:
+                    raise FrameError('invalid frame length %r' % buf[pos:pos + self._max_digits + 1])
+                self._needed = size - pos + 1
+                break
+            length = buf[pos:space]
+            if not length.isdigit() or length[0] == '0':
+                raise FrameError('invalid frame length %r' % length)
+            length = int(length)
+            if length > self.max_frame_size:
+                raise FrameError('frame of %i bytes exceeds the maximum of %i'
+                                 % (length, self.max_frame_size))
+            end = space + 1 + length
+            if end > size:
+                self._needed = end - pos
+                break
+            frames.append(buf[space + 1:end])
+            pos = end
+        else:
+            self._needed = 1
+        if pos == size:
+            self._chunks = []
+            self._size = 0
+        elif pos:
+            self._chunks = [buf[pos:]]
+            self._size = size - pos
+        else:
+            self._chunks = [buf]
+        return frames
+
+class LineFrameDecoder(object):
+    '''
+    Incremental decoder of LF-terminated frames (RFC6587 non-transparent
+    framing), the counterpart of :class:`OctetFrameDecoder`. Empty lines
+    are skipped and the LF is not part of the returned frames.
+
+    **attributes**
+        *max_frame_size*
+            A line longer than this raises :exc:`FrameError`.
+    '''
+    def __init__(self, max_frame_size=65536):
+        self.max_frame_size = max_frame_size
+        self._chunks = []
+        self._size = 0
+
+    def __len__(self):
+        '''Number of bytes buffered, belonging to a partial line.'''
+        return self._size
+
+    def feed(self, data):
+        '''
+        Decode the chunk `data`, returning the list of lines it completes.
+        '''
+        end = data.rfind('\n')
+        if end < 0:
+            self._chunks.append(data)
+            self._size += len(data)
+            if self._size > self.max_frame_size:
+                raise FrameError('line exceeds the maximum of %i bytes'
+                                 % self.max_frame_size)
+            return []
+        if self._chunks:
+            self._chunks.append(data[:end])
+            lines = ''.join(self._chunks).split('\n')
+        else:
+            lines = data[:end].split('\n')
+        rest = data[end + 1:]
+        self._chunks = rest and [rest] or []
+        self._size = len(rest)
+        frames = [line for line in lines if line]
+        if max(self._size, max(map(len, lines))) > self.max_frame_size:
+            raise FrameError('line exceeds the maximum of %i bytes'
+                             % self.max_frame_size)
+        return frames
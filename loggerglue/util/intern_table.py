@@ -0,0 +1,74 @@
+
+_missing = object()
+
+class InternTable(object):
+    '''
+    A bounded table of canonical values, so that repeated values share a
+    single object instead of each being a fresh copy.
+
+    Once `maxsize` values are held, the table is emptied before adding the
+    next one, so high-cardinality input cannot make it grow without bound
+    while a small vocabulary is quickly learnt again.
+
+    **attributes**
+        *hits*, *misses*
+            Number of lookups that found, respectively did not find, their key.
+
+        *evictions*
+            Number of values dropped to make room for new ones.
+    '''
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        # one table per decode function, so that e.g. decoded and raw
+        # values for the same key are kept apart
+        self._tables = {}
+
+    def __len__(self):
+        return self._size
+
+    def lookup(self, key, decode=None):
+        '''
+        Returns the canonical value for `key`. When `key` is not in the table,
+        the value is `decode(key)`, or `key` itself if `decode` is None, and
+        is added to the table. `key` must be hashable.
+
+        Values obtained through different `decode` functions are kept apart,
+        so pass the same function object for each kind of value.
+        '''
+        table = self._tables.get(decode)
+        if table is None:
+            table = self._tables[decode] = {}
+        value = table.get(key, _missing)
+        if value is not _missing:
+            self.hits += 1
+            return value
+        self.misses += 1
+        if decode is None:
+            value = key
+        else:
+            value = decode(key)
+        if self._size >= self.maxsize:
+            self.clear()
+            table = self._tables[decode] = {}
+        table[key] = value
+        self._size += 1
+        return value
+
+    def clear(self):
+        '''
+        Drop all values, counting them as evictions.
+        '''
+        self.evictions += self._size
+        self._size = 0
+        self._tables = {}
+
+    def stats(self):
+        '''
+        Returns a dict with the `size`, `hits`, `misses` and `evictions` counters.
+        '''
+        return {'size': self._size, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
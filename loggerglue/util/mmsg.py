@@ -0,0 +1,152 @@
+
+import ctypes
+import ctypes.util
+import os
+import socket
+import struct
+import sys
+from array import array
+
+class iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.c_void_p),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+except (OSError, TypeError):
+    _libc = None
+
+try:
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                          ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+    HAVE_SENDMMSG = True
+except AttributeError:
+    HAVE_SENDMMSG = False
+
+try:
+    _recvmmsg = _libc.recvmmsg
+    _recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                          ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    _recvmmsg.restype = ctypes.c_int
+    HAVE_RECVMMSG = True
+except AttributeError:
+    HAVE_RECVMMSG = False
+
+# The headers are built as arrays of unsigned longs, much faster than
+# filling ctypes structures field by field: every field of iovec and
+# mmsghdr takes exactly one long (with padding) on both 32 and 64-bit Linux.
+_LONG = array('L').itemsize
+if (ctypes.sizeof(iovec) != 2 * _LONG or ctypes.sizeof(mmsghdr) != 8 * _LONG
+    or msghdr.msg_iov.offset != 2 * _LONG or msghdr.msg_iovlen.offset != 3 * _LONG):
+    HAVE_SENDMMSG = HAVE_RECVMMSG = False
+_MSG_FLAGS = msghdr.msg_flags.offset
+_MSG_LEN = mmsghdr.msg_len.offset
+# mmsghdr of a datagram in a single iovec, to a connected socket
+_MMSGHDR = array('L', [0, 0, 0, 1, 0, 0, 0, 0])
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+_uint = struct.Struct('I')
+_int = struct.Struct('i')
+
+def _raise_errno():
+    errno = ctypes.get_errno()
+    raise socket.error(errno, os.strerror(errno))
+
+def sendmmsg(sock, datagrams):
+    '''
+    Send the strings `datagrams` through the connected datagram socket
+    `sock`, as many per system call as the kernel takes (Linux sendmmsg(2)).
+    Returns the number of datagrams sent. It is less than `len(datagrams)`
+    if an error (or EAGAIN on a non-blocking socket) stopped the sending
+    after some were sent; if none could be sent, :exc:`socket.error` is
+    raised.
+
+    Only available if `HAVE_SENDMMSG` is true.
+    '''
+    count = len(datagrams)
+    # point into a single joined string, instead of one buffer per datagram
+    data = ''.join(datagrams)
+    address = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+    iovecs = array('L')
+    for size in map(len, datagrams):
+        iovecs.append(address)
+        iovecs.append(size)
+        address += size
+    address = iovecs.buffer_info()[0]
+    msgs = _MMSGHDR * count
+    msgs[2::8] = array('L', xrange(address, address + 2 * _LONG * count, 2 * _LONG))
+    msgs_address = msgs.buffer_info()[0]
+    fd = sock.fileno()
+    sent = 0
+    while sent < count:
+        n = _sendmmsg(fd, msgs_address + sent * 8 * _LONG,
+                      count - sent, 0)
+        if n < 0:
+            if sent:
+                break
+            _raise_errno()
+        sent += n
+    return sent
+
+class MmsgReceiver(object):
+    '''
+    Receives up to `count` datagrams of at most `size` bytes per system call
+    (Linux recvmmsg(2)), into buffers allocated once and reused.
+
+    Only available if `HAVE_RECVMMSG` is true.
+    '''
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self._buffer = ctypes.create_string_buffer(count * size)
+        self._view = memoryview(self._buffer)
+        base = ctypes.addressof(self._buffer)
+        self._iovecs = array('L')
+        for i in xrange(count):
+            self._iovecs.append(base + i * size)
+            self._iovecs.append(size)
+        address = self._iovecs.buffer_info()[0]
+        self._msgs = _MMSGHDR * count
+        self._msgs[2::8] = array('L', xrange(address, address + 2 * _LONG * count, 2 * _LONG))
+
+    def recv(self, sock, flags=socket.MSG_DONTWAIT):
+        '''
+        Receive the datagrams waiting on `sock`, without blocking by default.
+        Returns the list of datagrams, and the number of them that were
+        truncated to `size` bytes. Raises :exc:`socket.error` if none
+        could be received (EAGAIN if none was waiting).
+        '''
+        msgs = self._msgs
+        n = _recvmmsg(sock.fileno(), msgs.buffer_info()[0], self.count, flags, None)
+        if n < 0:
+            _raise_errno()
+        if _LITTLE_ENDIAN:
+            # msg_len and msg_flags, with the zero padding after them
+            lengths = msgs[7:8 * n:8]
+            msg_flags = msgs[6:8 * n:8]
+        else:
+            header = 8 * _LONG
+            lengths = [_uint.unpack_from(msgs, i * header + _MSG_LEN)[0]
+                       for i in xrange(n)]
+            msg_flags = [_int.unpack_from(msgs, i * header + _MSG_FLAGS)[0]
+                         for i in xrange(n)]
+        view = self._view
+        size = self.size
+        datagrams = [view[offset:offset + length].tobytes()
+                     for (offset, length) in zip(xrange(0, n * size, size), lengths)]
+        truncated = len([f for f in msg_flags if f & socket.MSG_TRUNC])
+        return datagrams, truncated
@@ -1,3 +1,5 @@
+
+import re
 from datetime import datetime, timedelta
 
 def parse_date(ts):
@@ -9,17 +11,11 @@ def parse_date(ts):
     else:
         return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S")
 
-def parse_timestamp(ts):
+def parse_timestamp_strptime(ts):
     '''
-    Parse timestamps in these formats:
-    '2003-10-11T22:14:15.003000Z'
-    '2003-10-11T22:14:15.003Z'
-    '2003-10-11T22:14:15Z'
-    '2003-10-11T22:14:15.003000-07:00'
-    '2003-10-11T22:14:15.003+07:00'
-    '2003-10-11T22:14:15+07:00'
-
-    Returns "naive" datetime object (without timezone info, UTC).
+    Reference implementation of :func:`parse_timestamp`, based on
+    :meth:`datetime.strptime`. It also accepts timestamps that do not
+    follow the fixed RFC5424 layout, such as '2003-1-1T2:4:5Z'.
     '''
     if ts == '-':
         timestamp = None
@@ -33,3 +29,66 @@ def parse_timestamp(ts):
         timestamp += timedelta(seconds=sign*(hours*3600+mins*60))
 
     return timestamp
+
+_second_re = re.compile(r'([0-9]{4})-([0-9]{2})-([0-9]{2})T([0-9]{2}):([0-9]{2}):([0-9]{2})$')
+_offset_re = re.compile(r'Z$|([+-])([0-9]{2}):([0-9]{2})$')
+
+# UTC datetime of each recently seen second, keyed on the timestamp
+# without its fractional part: 'YYYY-MM-DDTHH:MM:SS' + TIME-OFFSET
+_cache = {}
+CACHE_SIZE = 64
+
+def _parse_second(ts, offset_start):
+    '''
+    Parse the fixed-layout second and offset of a timestamp, or return None.
+    '''
+    m = _second_re.match(ts, 0, 19)
+    o = _offset_re.match(ts, offset_start)
+    if m is None or o is None or offset_start < 19:
+        return None
+    timestamp = datetime(*[int(x) for x in m.groups()])
+    sign, hours, mins = o.groups()
+    if sign is not None:
+        minutes = int(hours)*60 + int(mins)
+        if sign == '+':
+            minutes = -minutes
+        timestamp += timedelta(minutes=minutes)
+    return timestamp
+
+def parse_timestamp(ts):
+    '''
+    Parse timestamps in these formats:
+    '2003-10-11T22:14:15.003000Z'
+    '2003-10-11T22:14:15.003Z'
+    '2003-10-11T22:14:15Z'
+    '2003-10-11T22:14:15.003000-07:00'
+    '2003-10-11T22:14:15.003+07:00'
+    '2003-10-11T22:14:15+07:00'
+
+    Returns "naive" datetime object (without timezone info, UTC).
+
+    Timestamps in this fixed layout are parsed without :meth:`datetime.strptime`,
+    and the second they fall in is cached, as consecutive messages mostly
+    share it. Anything else is handed to :func:`parse_timestamp_strptime`.
+    '''
+    if ts == '-':
+        return None
+    if ts[-1:] == 'Z':
+        offset_start = len(ts) - 1
+    else:
+        offset_start = len(ts) - 6
+    key = ts[:19] + ts[offset_start:]
+    timestamp = _cache.get(key)
+    if timestamp is None:
+        timestamp = _parse_second(ts, offset_start)
+        if timestamp is None:
+            return parse_timestamp_strptime(ts)
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = timestamp
+    if offset_start == 19:
+        return timestamp
+    frac = ts[20:offset_start]
+    if ts[19] != '.' or len(frac) > 6 or not frac.isdigit():
+        return parse_timestamp_strptime(ts)
+    return timestamp.replace(microsecond=int(frac.ljust(6, '0')))
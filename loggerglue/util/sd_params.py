@@ -0,0 +1,131 @@
+
+class SDParams(object):
+    '''
+    Compact, ordered multi-dictionary of SD-PARAMs.
+
+    It offers the interface of :class:`~loggerglue.util.MultiDict.OrderedMultiDict`
+    but only keeps the list of `(key, value)` pairs, without an index: an
+    SD-ELEMENT holds a handful of parameters, for which a linear search is
+    as fast as a dict lookup and takes far less memory.
+
+    >>> p = SDParams([("file", "main.py"), ("line", "123"), ("file", "pinger.py")])
+    >>> p["file"]
+    'pinger.py'
+    >>> p.getall("file")
+    ['main.py', 'pinger.py']
+    '''
+    __slots__ = ('order_data',)
+
+    def __init__(self, multidict=None):
+        if multidict is None:
+            self.order_data = []
+        elif hasattr(multidict, "allitems"):
+            self.order_data = list(multidict.allitems())
+        elif hasattr(multidict, "items"):
+            self.order_data = list(multidict.items())
+        else:
+            self.order_data = list(multidict)
+
+    def __getstate__(self):
+        return self.order_data
+
+    def __setstate__(self, state):
+        self.order_data = state
+
+    def __eq__(self, other):
+        return self.order_data == other.order_data
+
+    def __ne__(self, other):
+        return self.order_data != other.order_data
+
+    def __repr__(self):
+        return "<SDParams %s>" % (self.order_data,)
+
+    def __str__(self):
+        return str(dict(self.order_data))
+
+    def __len__(self):
+        '''the number of unique keys'''
+        return len(self.keys())
+
+    def __getitem__(self, key):
+        '''value for a given key, the one added last if there are several'''
+        for k, v in reversed(self.order_data):
+            if k == key:
+                return v
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        '''add a new key/value pair'''
+        self.order_data.append((key, value))
+
+    def __delitem__(self, key):
+        '''remove all values for the given key'''
+        if key not in self:
+            raise KeyError(key)
+        self.order_data[:] = [x for x in self.order_data if x[0] != key]
+
+    def __contains__(self, key):
+        for k, v in self.order_data:
+            if k == key:
+                return True
+        return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def getall(self, key):
+        '''all values for a given key in input order, [] if there are none'''
+        return [v for k, v in self.order_data if k == key]
+
+    def keys(self):
+        '''unique keys, in order of first appearance'''
+        seen = set()
+        keys = []
+        for k, v in self.order_data:
+            if k not in seen:
+                seen.add(k)
+                keys.append(k)
+        return keys
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def allkeys(self):
+        '''iterate over all keys in input order'''
+        for x in self.order_data:
+            yield x[0]
+
+    def allvalues(self):
+        '''iterate over all values in input order'''
+        for x in self.order_data:
+            yield x[1]
+
+    def allitems(self):
+        '''iterate over all key/value pairs in input order'''
+        return iter(self.order_data)
+
+class FrozenSDParams(SDParams):
+    '''
+    Immutable :class:`SDParams`, used by
+    :class:`~loggerglue.rfc5424.FrozenSDElement`.
+    '''
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<FrozenSDParams %s>" % (self.order_data,)
+
+    def __setitem__(self, key, value):
+        raise TypeError('frozen SD-PARAMs cannot be modified')
+
+    def __delitem__(self, key):
+        raise TypeError('frozen SD-PARAMs cannot be modified')
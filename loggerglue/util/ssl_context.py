@@ -0,0 +1,25 @@
+
+import ssl
+
+def make_ssl_context(server_side=False, keyfile=None, certfile=None,
+                     cert_reqs=ssl.CERT_NONE, ssl_version=ssl.PROTOCOL_SSLv23,
+                     ca_certs=None, ciphers=None, suppress_ragged_eofs=True):
+    '''
+    Build an :class:`ssl.SSLContext` from the arguments of :func:`ssl.wrap_socket`,
+    with the same defaults: no certificate verification unless `cert_reqs`
+    says otherwise, and no hostname check.
+
+    `server_side` is accepted (and ignored) so that the keyword arguments
+    given to the emitters and the server can be passed through as they are;
+    `suppress_ragged_eofs` is a property of each socket, not of the context,
+    and is ignored as well.
+    '''
+    context = ssl.SSLContext(ssl_version)
+    context.verify_mode = cert_reqs
+    if certfile:
+        context.load_cert_chain(certfile, keyfile)
+    if ca_certs:
+        context.load_verify_locations(ca_certs)
+    if ciphers:
+        context.set_ciphers(ciphers)
+    return context